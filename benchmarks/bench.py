@@ -0,0 +1,420 @@
+'''
+time the fetch, parse, lex, render pipeline over the corpus.
+
+    python -m benchmarks.bench                  # compare with baseline.json
+    python -m benchmarks.bench --update         # store the result as the baseline
+    python -m benchmarks.bench --output a.json  # write the result
+
+each case reports the best of its runs in seconds.
+a case slower than the baseline by the tolerance fails the run.
+a case over its target is reported but does not fail the run.
+the baseline is machine specific. update it on the machine that compares.
+'''
+from typing import Callable, Dict, List, Optional
+import argparse
+import asyncio
+import compileall
+import gc
+import json
+import pathlib
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+HERE = pathlib.Path(__file__).absolute().parent
+sys.path.append(str(HERE.parent))
+
+BASELINE = HERE / 'baseline.json'
+SCREEN_WIDTH = 80
+SCREEN_HEIGHT = 24
+# cursor positions per page for the hover case
+HOVER_POSITIONS = 50
+DISPATCH_EVENTS = 10000
+STARTUP_RUNS = 5
+
+
+def measure(func: Callable[[], object], repeat: int = 10, budget: float = 2.0) -> float:
+    '''
+    the best of up to repeat runs. a slow case stops at the time budget.
+    the garbage of the earlier cases is collected and gc is off while timing as timeit does.
+    '''
+    best = float('inf')
+    total = 0.0
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+            best = min(best, elapsed)
+            total += elapsed
+            if total >= budget:
+                break
+    finally:
+        gc.enable()
+    return best
+
+
+def calibrate() -> float:
+    '''
+    a fixed pure python workload. the cases are compared after scaling
+    by its ratio to the baseline's, so a machine that is busy as a whole
+    does not fail the run.
+    '''
+    def work():
+        d = {}
+        for i in range(100000):
+            d[str(i)] = i * 2
+        return sorted(d.items())
+    return measure(work)
+
+
+def bench_parse(name: str, body: str, results: Dict[str, float]):
+    from canoe.parser import parse_html, DEFAULT_PARSER, FAST_PARSERS, is_available
+    for parser in [DEFAULT_PARSER] + FAST_PARSERS:
+        if is_available(parser):
+            results[f'parse/{parser}/{name}'] = measure(
+                lambda: parse_html(body, parser))
+
+
+def bench_lex(name: str, body: str, results: Dict[str, float]):
+    from canoe.parser import parse_html
+    from canoe.ui.beautifulsoup_lexer import BeautifulSoupLexer
+    soup = parse_html(body)
+    results[f'lex/{name}'] = measure(
+        lambda: BeautifulSoupLexer().lex_html(soup))
+
+
+def bench_hover(name: str, body: str, results: Dict[str, float]):
+    '''
+    render a screen around the focus for each cursor position.
+    '''
+    import prompt_toolkit.document
+    import prompt_toolkit.layout.processors
+    from canoe.worker import parse_and_lex
+    from canoe.ui.beautifulsoup_lexer import BeautifulSoupLexer
+    from canoe.ui.hover_processor import HoverProcessor
+
+    result = parse_and_lex(body)
+    lexer = BeautifulSoupLexer()
+    lexer.set_result(result)
+    document = prompt_toolkit.document.Document(result.text)
+    spans = lexer.focus_index.spans
+    step = max(len(spans) // HOVER_POSITIONS, 1)
+    positions = [(span.row, span.col_start) for span in spans[::step]] or [(0, 0)]
+    cursors = [(row, prompt_toolkit.document.Document(document.text, document.translate_row_col_to_index(row, col)))
+               for row, col in positions]
+
+    def render():
+        processor = HoverProcessor(lexer)
+        for row, cursor in cursors:
+            top = max(row - SCREEN_HEIGHT // 2, 0)
+            for lineno in range(top, min(top + SCREEN_HEIGHT, len(result.lines))):
+                processor.apply_transformation(prompt_toolkit.layout.processors.TransformationInput(
+                    None, cursor, lineno, lambda i: i, lexer.get_line(lineno), SCREEN_WIDTH, SCREEN_HEIGHT))  # type: ignore
+    seconds = measure(render)
+    results[f'hover/{name}'] = seconds / len(positions)
+
+
+def bench_search(name: str, body: str, results: Dict[str, float]):
+    '''
+    build the index, then type a query a key at a time.
+    each key counts the matches, moves to the next one and highlights a screen.
+    '''
+    from canoe.worker import parse_and_lex
+    from canoe.ui.search import SearchIndex
+
+    result = parse_and_lex(body)
+    results[f'search/index/{name}'] = measure(lambda: SearchIndex(result.text))
+    index = SearchIndex(result.text)
+    # a word of the middle of the page
+    middle = len(result.text) // 2
+    query = result.text[middle:middle + 8]
+
+    def type_query():
+        for i in range(1, len(query) + 1):
+            index.count(query[:i])
+            position = index.next(query[:i], 0)
+            row = index.row_col(position)[0] if position is not None else 0
+            for lineno in range(row, row + SCREEN_HEIGHT):
+                index.matches(query[:i], lineno)
+    results[f'search/query/{name}'] = measure(type_query) / max(len(query), 1)
+
+
+def retained_bytes(build: Callable[[], object]) -> int:
+    '''
+    the memory allocated by build and still held by its result.
+    '''
+    gc.collect()
+    tracemalloc.start()
+    try:
+        kept = build()
+        gc.collect()
+        size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del kept
+    return size
+
+
+def bench_memory(name: str, body: str, memory: Dict[str, Dict[str, int]]):
+    '''
+    the lines as lists of (style, text) with the joined text, against CompactLines.
+    '''
+    from canoe.parser import parse_html
+    from canoe.ui.beautifulsoup_lexer import LazyLines
+
+    soup = parse_html(body)
+
+    def build_lists():
+        lines = list(LazyLines(soup))
+        return (lines, '\n'.join(''.join(text for _, text in line) for line in lines))
+
+    def build_compact():
+        return LazyLines(soup).compact()[0]
+
+    lists = retained_bytes(build_lists)
+    compact = retained_bytes(build_compact)
+    memory[name] = {
+        'html': len(body.encode('utf-8')),
+        'lists': lists,
+        'compact': compact,
+        'saved': lists - compact,
+    }
+
+
+def bench_fetch(name: str, body: str, results: Dict[str, float]):
+    '''
+    a local server. the cjk page is served as shift_jis without a charset in the header.
+    '''
+    import aiohttp
+    import aiohttp.web
+    from tests.server import serve
+    from canoe.limits import BodyReader
+    encoding = 'cp932' if name == 'cjk' else 'utf-8'
+    data = body.replace('charset="utf-8"', f'charset="{encoding}"').encode(
+        encoding, errors='replace')
+
+    async def page(request):
+        return aiohttp.web.Response(body=data, content_type='text/html')
+
+    async def run():
+        app = aiohttp.web.Application()
+        app.router.add_get('/', page)
+        best = float('inf')
+        async with serve(app) as base, aiohttp.ClientSession() as session:
+            for _ in range(5):
+                start = time.perf_counter()
+                async with session.get(f'{base}/') as response:
+                    await BodyReader(response).read_text_async()
+                best = min(best, time.perf_counter() - start)
+        return best
+
+    results[f'fetch/{name}'] = asyncio.run(run())
+
+
+def bench_dispatch(results: Dict[str, float]):
+    from typing import NamedTuple
+    from canoe.event import EventDispatcher, SERIAL
+
+    class Payload(NamedTuple):
+        value: int
+
+    async def run():
+        dispatcher = EventDispatcher()
+        done = asyncio.Event()
+        count = 0
+
+        def handler(payload: Payload):
+            nonlocal count
+            count += 1
+            if count == DISPATCH_EVENTS:
+                done.set()
+        dispatcher.register(Payload, handler, SERIAL)
+        dispatcher.start(asyncio.get_running_loop())
+        start = time.perf_counter()
+        for i in range(DISPATCH_EVENTS):
+            dispatcher.enqueue(Payload(i))
+        await done.wait()
+        elapsed = time.perf_counter() - start
+        await dispatcher.shutdown()
+        return elapsed
+
+    results[f'dispatch/{DISPATCH_EVENTS}'] = measure(lambda: asyncio.run(run()))
+
+
+def bench_startup(results: Dict[str, float]):
+    '''
+    the first frame of the empty browser in a fresh process, so the imports are cold.
+    bare_frame is an empty prompt_toolkit application. the runs alternate, so both see the same noise.
+    '''
+    # as installed. prompt_toolkit is loaded from the bytecode too
+    compileall.compile_dir(str(HERE.parent / 'canoe'), quiet=1)
+    best = {'startup/bare_frame': float('inf'), 'startup/first_frame': float('inf')}
+    for _ in range(STARTUP_RUNS):
+        for name, args in (('startup/bare_frame', ['--bare']), ('startup/first_frame', [])):
+            output = subprocess.run([sys.executable, '-m', 'canoe.startup', *args], cwd=HERE.parent,
+                                    capture_output=True, text=True, check=True).stdout
+            best[name] = min(best[name], float(output.split()[-1]))
+    results.update(best)
+
+
+def targets(results: Dict[str, float]) -> Dict[str, float]:
+    '''
+    the first frame is allowed FIRST_FRAME_TARGET over the bare frame.
+    '''
+    from canoe.startup import FIRST_FRAME_TARGET
+    bare = results.get('startup/bare_frame')
+    if bare is None:
+        return {}
+    return {'startup/first_frame': bare + FIRST_FRAME_TARGET}
+
+
+def run(pages: Dict[str, str], stages: List[str], memory: Optional[Dict[str, Dict[str, int]]] = None) -> Dict[str, float]:
+    import logging
+    # the handlers would dominate the dispatch case
+    logging.disable(logging.INFO)
+    results: Dict[str, float] = {}
+    for name, body in pages.items():
+        if 'memory' in stages and memory is not None:
+            bench_memory(name, body, memory)
+            print(f'memory/{name} done', file=sys.stderr)
+        for stage, func in (('fetch', bench_fetch), ('parse', bench_parse), ('lex', bench_lex), ('hover', bench_hover),
+                            ('search', bench_search)):
+            if stage in stages:
+                func(name, body, results)
+                print(f'{stage}/{name} done', file=sys.stderr)
+    if 'dispatch' in stages:
+        bench_dispatch(results)
+    if 'startup' in stages:
+        bench_startup(results)
+    return results
+
+
+def compare(results: Dict[str, float], baseline: Dict[str, float], tolerance: float, min_delta: float, scale: float = 1) -> List[str]:
+    '''
+    the names of the regressed cases.
+    min_delta ignores noise on the tiny cases.
+    '''
+    regressions = []
+    for name, seconds in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f'{name:40} {seconds:10.6f}s (new)')
+            continue
+        base *= scale
+        ratio = seconds / base if base else 1
+        regressed = ratio > 1 + tolerance and seconds - base > min_delta
+        mark = ' REGRESSION' if regressed else ''
+        print(f'{name:40} {seconds:10.6f}s {ratio:6.2f}x{mark}')
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+def merge(stored: dict, document: dict) -> dict:
+    '''
+    the results of the document on the stored baseline.
+    the stored calibration is kept, and the results are scaled to it.
+    the cases that are not run this time are kept.
+    '''
+    scale = stored['calibration'] / document['calibration']
+    return {
+        **document,
+        'calibration': stored['calibration'],
+        'results': {**stored['results'], **{name: seconds * scale for name, seconds in document['results'].items()}},
+    }
+
+
+def print_memory(memory: Dict[str, Dict[str, int]]):
+    for name, m in memory.items():
+        print(f'{"memory/" + name:40} html {m["html"] / 1024:8.0f}KB lines {m["lists"] / 1024:8.0f}KB'
+              f' -> {m["compact"] / 1024:8.0f}KB saved {m["saved"] / 1024:8.0f}KB ({m["saved"] / max(m["lists"], 1):.0%})')
+
+
+def check_targets(results: Dict[str, float]):
+    for name, target in targets(results).items():
+        seconds = results.get(name)
+        if seconds is not None:
+            mark = ' over target' if seconds > target else ''
+            print(f'{name:40} {seconds:10.6f}s target {target:.3f}s{mark}')
+
+
+STAGES = ['fetch', 'parse', 'lex', 'hover',
+          'search', 'memory', 'dispatch', 'startup']
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--baseline', default=str(BASELINE))
+    parser.add_argument('--update', action='store_true',
+                        help='store the result as the baseline')
+    parser.add_argument('--output', help='write the result as json')
+    parser.add_argument('--page', action='append',
+                        help='run only these pages')
+    parser.add_argument('--stage', action='append', choices=STAGES,
+                        help='run only these stages')
+    parser.add_argument('--tolerance', type=float, default=1.0,
+                        help='allowed slowdown. 1.0 is 2x of the baseline')
+    parser.add_argument('--min-delta', type=float, default=0.005,
+                        help='seconds of slowdown that are always allowed')
+    args = parser.parse_args(argv)
+
+    from .corpus import load
+    pages = load()
+    if args.page:
+        pages = {name: body for name, body in pages.items()
+                 if name in args.page}
+    calibration = calibrate()
+    memory: Dict[str, Dict[str, int]] = {}
+    results = run(pages, args.stage or STAGES, memory)
+    calibration = (calibration + calibrate()) / 2
+    document = {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'calibration': calibration,
+        'results': results,
+    }
+    # bytes. reported, not compared
+    if memory:
+        print_memory(memory)
+        document['memory'] = memory
+    if args.output:
+        pathlib.Path(args.output).write_text(
+            json.dumps(document, indent=2) + '\n', encoding='utf-8')
+
+    baseline_path = pathlib.Path(args.baseline)
+    if args.update:
+        # the baseline is for the timings
+        document.pop('memory', None)
+        if baseline_path.exists():
+            stored = json.loads(baseline_path.read_text(encoding='utf-8'))
+            document = merge(stored, document)
+        baseline_path.write_text(json.dumps(
+            document, indent=2, sort_keys=True) + '\n', encoding='utf-8')
+        print(f'baseline: {baseline_path}')
+        return 0
+
+    if not baseline_path.exists():
+        print(f'no baseline: {baseline_path}')
+        compare(results, {}, args.tolerance, args.min_delta)
+        check_targets(results)
+        return 0
+    baseline = json.loads(baseline_path.read_text(encoding='utf-8'))
+    scale = calibration / baseline['calibration']
+    print(f'machine speed: {1 / scale:.2f}x of the baseline')
+    regressions = compare(results, baseline['results'],
+                          args.tolerance, args.min_delta, scale)
+    check_targets(results)
+    if regressions:
+        print(f'{len(regressions)} regression(s): {", ".join(regressions)}')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,90 @@
+'''
+the pages of the benchmark.
+
+the synthetic pages are generated with a fixed seed, so every run sees the same bytes.
+the real world pages are checked in under corpus/ and picked up by the file name.
+'''
+from typing import Dict, Callable
+import pathlib
+import random
+
+HERE = pathlib.Path(__file__).absolute().parent
+CORPUS_DIR = HERE / 'corpus'
+
+WORDS = ['canoe', 'river', 'paddle', 'stream', 'current', 'rapids', 'bank', 'shore',
+         'portage', 'lake', 'camp', 'map', 'trail', 'north', 'south', 'wind']
+KANA = 'あいうえおかきくけこさしすせそたちつてとなにぬねのはひふへほまみむめもやゆよらりるれろわをん'
+KANJI = '日本語文字列漢字川舟岸流速湖地図北南東西風雨雪山谷村町市県国'
+
+
+def _sentence(rng: random.Random, n: int) -> str:
+    return ' '.join(rng.choice(WORDS) for _ in range(n))
+
+
+def _page(title: str, body: str) -> str:
+    return f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{title}</title></head><body>{body}</body></html>'
+
+
+def small() -> str:
+    rng = random.Random(1)
+    body = ''.join(
+        f'<p>{_sentence(rng, 12)} <a href="/p/{i}">{_sentence(rng, 2)}</a>.</p>' for i in range(20))
+    return _page('small', f'<h1>small</h1>{body}')
+
+
+def links() -> str:
+    rng = random.Random(2)
+    body = ''.join(
+        f'<li><a href="https://example.com/{i}">{_sentence(rng, 3)}</a> {_sentence(rng, 4)}</li>' for i in range(10000))
+    return _page('links', f'<ul>{body}</ul>')
+
+
+def nested() -> str:
+    rng = random.Random(3)
+    depth = 2000
+    body = ''.join(
+        f'<div class="d{i}"><span>{_sentence(rng, 2)}</span>' for i in range(depth))
+    body += '<a href="/deep">deep</a>' + '</div>' * depth
+    return _page('nested', body)
+
+
+def large() -> str:
+    '''
+    about 10MB
+    '''
+    rng = random.Random(4)
+    paragraphs = []
+    size = 0
+    i = 0
+    while size < 10 * 1024 * 1024:
+        p = f'<p>{_sentence(rng, 40)} <a href="/a/{i}">{_sentence(rng, 3)}</a> <b>{_sentence(rng, 5)}</b> {_sentence(rng, 30)}</p>\n'
+        paragraphs.append(p)
+        size += len(p)
+        i += 1
+    return _page('large', ''.join(paragraphs))
+
+
+def cjk() -> str:
+    rng = random.Random(5)
+
+    def text(n: int) -> str:
+        return ''.join(rng.choice(KANA if rng.random() < 0.6 else KANJI) for _ in range(n))
+    body = ''.join(
+        f'<p>{text(80)}<a href="/j/{i}">{text(6)}</a>{text(40)}。</p>\n' for i in range(3000))
+    return _page('日本語', body)
+
+
+SYNTHETIC: Dict[str, Callable[[], str]] = {
+    'small': small,
+    'links': links,
+    'nested': nested,
+    'large': large,
+    'cjk': cjk,
+}
+
+
+def load() -> Dict[str, str]:
+    pages = {name: generate() for name, generate in SYNTHETIC.items()}
+    for path in sorted(CORPUS_DIR.glob('*.html')):
+        pages[path.stem] = path.read_text(encoding='utf-8')
+    return pages
@@ -1,3 +1,10 @@
+import sys
+from .startup import ImportProfiler, StartupTiming
+# before the other imports, so that the profile sees them
+profiler = None
+if '--profile-startup' in sys.argv[1:]:
+    profiler = ImportProfiler()
+    profiler.install()
 import asyncio
 import argparse
 import logging
@@ -5,33 +12,202 @@ logger = logging.getLogger(__name__)
 
 
 async def main():
+    startup = StartupTiming()
     #
     # command line
     #
     parser = argparse.ArgumentParser(description='canoe 🛶 text browser.')
 
-    parser.add_argument('url', help='open url')
+    parser.add_argument('url', nargs='*',
+                        help='open url. with --dump, the urls to render. - reads them from stdin')
+    from .worker import EXECUTOR_TYPES
+    parser.add_argument('--executor', choices=EXECUTOR_TYPES,
+                        help='parse and lex html in a thread or process pool. default: thread, process for --dump')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='worker pool size')
+    parser.add_argument('--stream', action='store_true',
+                        help='render the first screenful while downloading')
+    from .parser import AUTO, PARSERS
+    parser.add_argument('--parser', choices=[AUTO] + PARSERS, default=AUTO,
+                        help='html parser. auto uses a fast one for a large body')
+    parser.add_argument('--lazy', action='store_true',
+                        help='show the first screenful before lexing the rest')
+    parser.add_argument('--cache-dir', help='http cache directory')
+    parser.add_argument('--cache-size', type=int, default=256,
+                        help='http cache size in MB')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='disable the http cache')
+    parser.add_argument('--snapshot-size', type=int, default=256,
+                        help='rendered page snapshots of the cached responses in MB')
+    parser.add_argument('--no-snapshot', action='store_true',
+                        help='parse a cached response again instead of mapping its snapshot')
+    parser.add_argument('--prefetch', action='store_true',
+                        help='fetch and render the links near the cursor in the background')
+    from .connection import ConnectionOptions
+    default_connection = ConnectionOptions()
+    parser.add_argument('--connections', type=int, default=default_connection.limit,
+                        help='connections in total. 0 is unlimited')
+    parser.add_argument('--connections-per-host', type=int, default=default_connection.limit_per_host,
+                        help='connections to a host. 0 is unlimited')
+    parser.add_argument('--keepalive', type=float, default=default_connection.keepalive_timeout,
+                        help='seconds an idle connection is kept')
+    parser.add_argument('--dns-ttl', type=int, default=default_connection.dns_ttl,
+                        help='seconds a resolved address is kept. 0 disables the dns cache')
+    parser.add_argument('--connect-timeout', type=float, default=default_connection.connect_timeout,
+                        help='seconds to connect')
+    parser.add_argument('--read-timeout', type=float, default=default_connection.read_timeout,
+                        help='seconds to wait for the next data')
+    from .limits import FetchLimits
+    default_limits = FetchLimits()
+    parser.add_argument('--max-body', type=int, default=default_limits.max_bytes // (1024 * 1024),
+                        help='MB of a body to show. the rest is truncated. 0 is unlimited')
+    parser.add_argument('--total-timeout', type=float, default=default_limits.total_timeout,
+                        help='seconds to receive a body. 0 is unlimited')
+    parser.add_argument('--idle-timeout', type=float, default=default_limits.idle_timeout,
+                        help='seconds without data before a body is truncated. 0 is unlimited')
+    parser.add_argument('--dump', action='store_true',
+                        help='write the text of the pages to stdout without the UI')
+    parser.add_argument('--dump-dir',
+                        help='with --dump, write a file for each page into this directory')
+    parser.add_argument('--links', action='store_true',
+                        help='with --dump, number the links and list them after the text')
+    parser.add_argument('--concurrency', type=int, default=16,
+                        help='with --dump, pages fetched at once')
+    parser.add_argument('--history-size', type=int, default=128,
+                        help='memory for rendered pages in the back/forward history in MB')
+    parser.add_argument('--timings',
+                        help='append the timing of each navigation to this file as a json line')
+    parser.add_argument('--log-capacity', type=int, default=1000,
+                        help='log records kept for the log pane')
+    parser.add_argument('--log-level', action='append', default=[],
+                        help='LEVEL or LOGGER=LEVEL. e.g. --log-level canoe.event=INFO')
+    parser.add_argument('--log-file',
+                        help='also write the log to this rotating file')
+    parser.add_argument('--profile-startup', action='store_true',
+                        help='print the time to the first frame and the import time of each module on exit')
     args = parser.parse_args()
+    startup.mark('args')
+    from .ui.request_info import parse_levels
+    try:
+        log_levels = parse_levels(args.log_level)
+    except ValueError as e:
+        parser.error(str(e))
+    from .parser import is_available
+    if args.parser != AUTO and not is_available(args.parser):
+        parser.error(f'{args.parser} is not installed')
+    if args.dump:
+        if not args.url:
+            args.url = ['-']
+    elif len(args.url) != 1:
+        parser.error('open one url. --dump renders many')
+
+    from .worker import WorkerPool
+    from .connection import ConnectionStats, create_session
+    connection = ConnectionOptions(args.connections, args.connections_per_host, args.keepalive,
+                                   args.dns_ttl, args.connect_timeout, args.read_timeout)
+    limits = FetchLimits(args.max_body * 1024 * 1024,
+                         args.total_timeout, args.idle_timeout)
+
+    if args.dump:
+        pool = WorkerPool(args.executor or 'process', args.workers)
+        # the http cache and the UI are not used
+        logging.getLogger().setLevel(logging.WARNING)
+        for name, level in log_levels.items():
+            logging.getLogger(name).setLevel(level)
+        from .dump import dump_main_async
+        session = create_session(connection, ConnectionStats())
+        try:
+            return await dump_main_async(args.url, session, pool, args.parser, args.links, args.concurrency, args.dump_dir, limits)
+        finally:
+            await session.close()
+            pool.shutdown()
 
     #
-    # UI
+    # UI. painted before the client and its imports
     #
+    from .ui.request_info import Logger
+    log = Logger(capacity=args.log_capacity, levels=log_levels)
+    if args.log_file:
+        log.spill(args.log_file)
     from .ui.root import Root
-    root = Root()
+    root = Root(args.history_size * 1024 * 1024, log)
+    startup.mark('ui')
 
     #
-    # start up
+    # client. aiohttp and bs4 load in a thread after the first frame
     #
     from . import event
-    event.enqueue(event.OpenCommand('GET', args.url))
+    pool = None
+    client = None
+
+    def import_client():
+        from . import client, snapshot
+        from .ui import beautifulsoup_lexer
+
+    async def start_client_async():
+        nonlocal pool, client
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, import_client)
+        except Exception:
+            logger.exception('start up')
+            return
+        startup.mark('imports')
+        pool = WorkerPool(args.executor or 'thread', args.workers)
+        cache = None
+        snapshots = None
+        if not args.no_cache:
+            from .cache import HttpCache, DEFAULT_CACHE_DIR
+            import pathlib
+            cache = HttpCache(pathlib.Path(args.cache_dir) if args.cache_dir else DEFAULT_CACHE_DIR,
+                              args.cache_size * 1024 * 1024)
+            if not args.no_snapshot:
+                from .snapshot import SnapshotStore, DEFAULT_SNAPSHOT_DIR
+                snapshots = SnapshotStore(pathlib.Path(args.cache_dir) / 'snapshot' if args.cache_dir else DEFAULT_SNAPSHOT_DIR,
+                                          args.snapshot_size * 1024 * 1024)
+        from .client import Client
+        client = Client(pool, args.stream, cache,
+                        args.parser, args.lazy, args.prefetch, connection, snapshots, limits)
+        if args.timings:
+            from .timing import TimingLog
+            client.on_timing.bind(TimingLog(args.timings).write)
+        client.on_response.bind(lambda _: startup.mark('response'))
+        root.attach(client)
+        startup.mark('client')
+        event.enqueue(event.OpenCommand('GET', args.url[0], 0, event.navigate(0)))
+
+    #
+    # start up
+    #
+    tasks = []
+
+    def on_render(app):
+        if not tasks:
+            logger.info(f'first frame: {startup.mark("first_frame") * 1000:.0f}ms')
+            tasks.append(asyncio.ensure_future(start_client_async()))
+    root.application.after_render += on_render
 
     def pre_run():
         assert(root.application.loop)
         event.pre_run(root.application.loop)
 
-    await root.application.run_async(pre_run=pre_run)
+    try:
+        await root.application.run_async(pre_run=pre_run)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await event.shutdown()
+        if client:
+            await client.close()
+        if pool:
+            pool.shutdown()
+        if profiler:
+            profiler.uninstall()
+            startup.report(profiler)
+        logger.info(f'startup: {startup}')
+
 
 if __name__ == '__main__':
     logging.basicConfig(level=logging.DEBUG)
     logger.debug('start')
-    asyncio.run(main())
+    sys.exit(asyncio.run(main()))
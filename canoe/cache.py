@@ -0,0 +1,236 @@
+from typing import Dict, Optional, Mapping
+import collections
+import email.utils
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = pathlib.Path.home() / '.cache' / 'canoe' / 'http'
+STORE_HEADERS = ['content-type', 'cache-control', 'expires', 'date', 'age',
+                 'etag', 'last-modified']
+
+
+def parse_cache_control(value: str) -> Dict[str, Optional[str]]:
+    directives: Dict[str, Optional[str]] = {}
+    for item in value.split(','):
+        key, sep, arg = item.strip().partition('=')
+        if key:
+            directives[key.lower()] = arg.strip('"') if sep else None
+    return directives
+
+
+def parse_http_date(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return email.utils.parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+class CacheEntry:
+    '''
+    metadata of a cached response. the body is a separate file.
+    '''
+
+    def __init__(self, key: str, url: str, status: int, headers: Dict[str, str], stored: float, size: int) -> None:
+        self.key = key
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.stored = stored
+        self.size = size
+
+    def to_json(self) -> dict:
+        return {
+            'url': self.url,
+            'status': self.status,
+            'headers': self.headers,
+            'stored': self.stored,
+            'size': self.size,
+        }
+
+    @staticmethod
+    def from_json(key: str, value: dict) -> 'CacheEntry':
+        return CacheEntry(key, value['url'], value['status'], value['headers'], value['stored'], value['size'])
+
+    @property
+    def cache_control(self) -> Dict[str, Optional[str]]:
+        return parse_cache_control(self.headers.get('cache-control', ''))
+
+    def freshness_lifetime(self) -> float:
+        cache_control = self.cache_control
+        if 'no-cache' in cache_control:
+            return 0
+        max_age = cache_control.get('max-age')
+        if max_age is not None:
+            try:
+                return int(max_age)
+            except ValueError:
+                return 0
+        expires = parse_http_date(self.headers.get('expires'))
+        if expires is not None:
+            date = parse_http_date(self.headers.get('date')) or self.stored
+            return expires - date
+        return 0
+
+    def current_age(self, now: float) -> float:
+        try:
+            age = int(self.headers.get('age', '0'))
+        except ValueError:
+            age = 0
+        return age + now - self.stored
+
+    def is_fresh(self, now: float) -> bool:
+        return self.current_age(now) < self.freshness_lifetime()
+
+    def validators(self) -> Dict[str, str]:
+        headers = {}
+        etag = self.headers.get('etag')
+        if etag:
+            headers['If-None-Match'] = etag
+        last_modified = self.headers.get('last-modified')
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        return headers
+
+
+class HttpCache:
+    '''
+    on-disk response cache with LRU eviction by total body size.
+
+    {key}.json: CacheEntry
+    {key}.body: decoded body as utf-8
+
+    the body is read and stored in a thread of the pool. the entries are locked.
+    '''
+
+    def __init__(self, directory: pathlib.Path = DEFAULT_CACHE_DIR, max_bytes: int = 256 * 1024 * 1024) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.entries: collections.OrderedDict[str, CacheEntry] = collections.OrderedDict(
+        )
+        self.total_bytes = 0
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._load()
+
+    def __str__(self) -> str:
+        return f'cache: {self.hits} hit, {self.revalidated} revalidated, {self.misses} miss, {len(self.entries)} entries, {self.total_bytes} bytes'
+
+    @staticmethod
+    def get_key(url: str) -> str:
+        return hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str, suffix: str) -> pathlib.Path:
+        return self.directory / f'{key}{suffix}'
+
+    def _load(self):
+        loaded = []
+        for path in self.directory.glob('*.json'):
+            try:
+                entry = CacheEntry.from_json(
+                    path.stem, json.loads(path.read_text(encoding='utf-8')))
+            except (OSError, ValueError, KeyError):
+                logger.warning(f'broken cache entry: {path}')
+                continue
+            loaded.append((path.stat().st_mtime, entry))
+        for _, entry in sorted(loaded, key=lambda x: x[0]):
+            self.entries[entry.key] = entry
+            self.total_bytes += entry.size
+        self._evict()
+
+    def _write(self, path: pathlib.Path, data: bytes):
+        tmp = path.with_suffix(path.suffix + '.tmp')
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+
+    def _write_entry(self, entry: CacheEntry):
+        self._write(self._path(entry.key, '.json'),
+                    json.dumps(entry.to_json()).encode('utf-8'))
+
+    def _remove(self, key: str):
+        entry = self.entries.pop(key)
+        self.total_bytes -= entry.size
+        for suffix in ('.json', '.body'):
+            try:
+                self._path(key, suffix).unlink()
+            except FileNotFoundError:
+                pass
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and self.entries:
+            key = next(iter(self.entries))
+            logger.debug(f'evict: {self.entries[key].url}')
+            self._remove(key)
+
+    def get(self, url: str) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self.entries.get(self.get_key(url))
+            if entry:
+                self.entries.move_to_end(entry.key)
+        if entry:
+            # mtime keeps the LRU order across sessions
+            os.utime(self._path(entry.key, '.json'))
+        return entry
+
+    def read_body(self, entry: CacheEntry) -> Optional[str]:
+        '''
+        None if the entry is evicted by a store in another thread.
+        '''
+        with self._lock:
+            if entry.key not in self.entries:
+                return None
+            try:
+                return self._path(entry.key, '.body').read_text(encoding='utf-8')
+            except OSError as e:
+                logger.warning(f'broken cache body: {entry.url}: {e}')
+                self._remove(entry.key)
+                return None
+
+    def store(self, url: str, status: int, headers: Mapping[str, str], body: str) -> Optional[CacheEntry]:
+        with self._lock:
+            return self._store(url, status, headers, body)
+
+    def _store(self, url: str, status: int, headers: Mapping[str, str], body: str) -> Optional[CacheEntry]:
+        key = self.get_key(url)
+        if key in self.entries:
+            self._remove(key)
+        stored = {k: headers[k] for k in STORE_HEADERS if k in headers}
+        cache_control = parse_cache_control(stored.get('cache-control', ''))
+        if status != 200 or 'no-store' in cache_control:
+            return None
+        entry = CacheEntry(key, url, status, stored, time.time(), 0)
+        if entry.freshness_lifetime() <= 0 and not entry.validators():
+            return None
+        data = body.encode('utf-8')
+        if len(data) > self.max_bytes:
+            return None
+        entry.size = len(data)
+        self._write(self._path(key, '.body'), data)
+        self._write_entry(entry)
+        self.entries[key] = entry
+        self.total_bytes += entry.size
+        self._evict()
+        return entry
+
+    def refresh(self, entry: CacheEntry, headers: Mapping[str, str]):
+        '''
+        304 Not Modified. update the freshness.
+        '''
+        entry.headers.pop('age', None)
+        for k in STORE_HEADERS:
+            if k in headers and k != 'content-type':
+                entry.headers[k] = headers[k]
+        entry.stored = time.time()
+        with self._lock:
+            self._write_entry(entry)
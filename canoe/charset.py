@@ -0,0 +1,155 @@
+'''
+decode a body while it streams in.
+
+the charset is decided from the first bytes in this order.
+
+* BOM
+* charset of the Content-Type
+* <meta charset> or <meta http-equiv> in the first SNIFF_BYTES
+* detection over SNIFF_BYTES from the first byte that is not ascii.
+  utf-8 if it decodes, then charset_normalizer if installed,
+  then the first of FALLBACK_CHARSETS that decodes
+
+without a label, the ascii bytes before are passed as they are,
+so a long ascii head of scripts and styles does not decide utf-8.
+'''
+from typing import Optional
+import codecs
+import importlib.util
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+SNIFF_BYTES = 4 * 1024
+DEFAULT_CHARSET = 'utf-8'
+
+BOMS = [
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+# the labels browsers decode as the superset
+SUPERSETS = {
+    'ascii': 'cp1252',
+    'latin-1': 'cp1252',
+    'iso8859-1': 'cp1252',
+    'shift_jis': 'cp932',
+}
+
+META_PATTERN = re.compile(
+    rb'<meta[^>]+charset\s*=\s*["\']?\s*([-\w.:]+)', re.IGNORECASE)
+# without charset_normalizer. euc-jp first, the bytes of cp932 are rarely valid euc-jp
+FALLBACK_CHARSETS = ['euc_jp', 'cp932']
+# not ascii, or the escape of iso-2022
+NOT_ASCII_PATTERN = re.compile(rb'[\x1b\x80-\xff]')
+
+
+def normalize(charset: Optional[str]) -> Optional[str]:
+    if not charset:
+        return None
+    try:
+        name = codecs.lookup(charset.strip()).name
+    except LookupError:
+        return None
+    return SUPERSETS.get(name, name)
+
+
+def sniff_charset(header_charset: Optional[str], head: bytes) -> Optional[str]:
+    for bom, charset in BOMS:
+        if head.startswith(bom):
+            return charset
+    charset = normalize(header_charset)
+    if charset:
+        return charset
+    m = META_PATTERN.search(head, 0, SNIFF_BYTES)
+    if m:
+        charset = normalize(m.group(1).decode('ascii'))
+        # the bytes are read as ascii already
+        if charset and charset.startswith('utf-16'):
+            return 'utf-8'
+        return charset
+    return None
+
+
+def decodes(head: bytes, charset: str) -> bool:
+    try:
+        # the last character may be cut
+        codecs.getincrementaldecoder(charset)().decode(head)
+        return True
+    except UnicodeDecodeError:
+        return False
+
+
+def detect_charset(head: bytes) -> str:
+    if b'\x1b$' in head:
+        # 7 bit japanese
+        return 'iso2022_jp'
+    if not re.search(rb'[\x80-\xff]', head):
+        # ascii tells nothing
+        return DEFAULT_CHARSET
+    if decodes(head, 'utf-8'):
+        return 'utf-8'
+    if importlib.util.find_spec('charset_normalizer'):
+        import charset_normalizer
+        best = charset_normalizer.from_bytes(head).best()
+        charset = normalize(best.encoding if best else None)
+        if charset:
+            return charset
+    for charset in FALLBACK_CHARSETS:
+        if decodes(head, charset):
+            return charset
+    return DEFAULT_CHARSET
+
+
+class StreamDecoder:
+    '''
+    hold the first bytes until the charset is decided.
+    then decode each chunk as it comes.
+    '''
+
+    def __init__(self, header_charset: Optional[str] = None) -> None:
+        self.header_charset = header_charset
+        self.charset: Optional[str] = None
+        self._head = b''
+        # the label is looked for
+        self._sniffed = False
+        self._decoder: Optional[codecs.IncrementalDecoder] = None
+
+    def _start(self, charset: str):
+        logger.debug(f'charset: {charset}')
+        self.charset = charset
+        self._decoder = codecs.getincrementaldecoder(
+            charset)(errors='replace')
+
+    def _pass_ascii(self, final: bool) -> str:
+        '''
+        the ascii bytes before the first other byte. decide with the bytes from it.
+        '''
+        m = NOT_ASCII_PATTERN.search(self._head)
+        end = m.start() if m else len(self._head)
+        text = self._head[:end].decode('ascii')
+        self._head = self._head[end:]
+        if final or len(self._head) >= SNIFF_BYTES:
+            self._start(detect_charset(self._head))
+        return text
+
+    def decode(self, chunk: bytes, final=False) -> str:
+        if self._decoder:
+            return self._decoder.decode(chunk, final)
+        self._head += chunk
+        if not self._sniffed:
+            charset = sniff_charset(self.header_charset, self._head)
+            if not charset and not final and len(self._head) < SNIFF_BYTES:
+                return ''
+            self._sniffed = True
+            if charset:
+                self._start(charset)
+        text = '' if self._decoder else self._pass_ascii(final)
+        if not self._decoder:
+            return text
+        head = self._head
+        self._head = b''
+        return text + self._decoder.decode(head, final)
+
@@ -1,30 +1,251 @@
+from typing import Callable, Optional, Union, List, Tuple, TYPE_CHECKING
 import aiohttp
+import collections
 import logging
+import time
 
-import bs4
 from . import event
+from .worker import WorkerPool, StreamParser, parse_and_lex_lazy, complete_lazy
+from .cache import HttpCache, CacheEntry
+from .parser import AUTO
+from .prefetch import Prefetcher, Prefetched
+from .charset import StreamDecoder
+from .connection import ConnectionOptions, ConnectionStats, create_session
+from .limits import FetchLimits, BodyReader
+from .linkcheck import LinkChecker, LinkStatus
+from .timing import NavigationTiming
+if TYPE_CHECKING:
+    from .snapshot import SnapshotStore
+    from .ui.beautifulsoup_lexer import LexResult
 
 logger = logging.getLogger(__name__)
 
+CHUNK_SIZE = 16 * 1024
+
 
 class Client:
-    def __init__(self) -> None:
-        self.session = aiohttp.ClientSession()
-        self.on_request = event.Event[str]()
-        self.on_response = event.Event[aiohttp.ClientResponse]()
+    def __init__(self, pool: WorkerPool, stream=False, cache: Optional[HttpCache] = None, parser: str = AUTO, lazy=False, prefetch=False,
+                 connection: ConnectionOptions = ConnectionOptions(), snapshots: Optional['SnapshotStore'] = None,
+                 limits: FetchLimits = FetchLimits()) -> None:
+        self.pool = pool
+        # a body over a limit is shown as received
+        self.limits = limits
+        # the rendered pages of the cached responses
+        self.snapshots = snapshots
+        self.lazy = lazy
+        # streaming always uses html.parser
+        self.parser = parser
+        self.stream = stream
+        self.cache = cache
+        self.get_viewport_height: Callable[[], int] = lambda: 24
+        self.connection_stats = ConnectionStats()
+        self.session = create_session(connection, self.connection_stats)
+        self.on_request = event.Event[event.OpenCommand]()
+        # (tab, response)
+        self.on_response = event.Event[Tuple[int, Union[aiohttp.ClientResponse, CacheEntry, Prefetched]]](
+        )
+        # the dispatcher is busy with this fetch. bypass the queue.
+        self.on_partial = event.Event[event.UpdateDocument]()
+        # the navigation is painted
+        self.on_timing = event.Event[NavigationTiming]()
+        # (tab, reader). the body stopped at a limit
+        self.on_truncated = event.Event[Tuple[int, BodyReader]]()
+        # (tab, url of the page, status). a link of the page is checked
+        self.on_link_status = event.Event[Tuple[int, str, LinkStatus]]()
         self.title = ''
         self.status = ''
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_14_4) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/75.0.3770.100 Safari/537.36',
         }
+        self.link_checker = LinkChecker(self.session, self.headers)
+        self.prefetcher: Optional[Prefetcher] = None
+        if prefetch:
+            self.prefetcher = Prefetcher(
+                self.session, pool, self.headers, parser, cache, limits=limits)
 
-        event.register(event.OpenCommand, self.open_command_async)
+        # a new navigation cancels the fetch and the parse in flight of the tab.
+        # the other tabs load at the same time
+        event.register(event.OpenCommand,
+                       self.open_command_async, event.LATEST, key=lambda command: command.tab)
+        event.register(event.CheckLinksCommand,
+                       self.check_links_async, event.LATEST, key=lambda command: command.tab)
 
     async def open_command_async(self, command: event.OpenCommand):
-        self.on_request(command.url)
+        self.on_request(command)
+        tab = command.tab
+        timing = NavigationTiming(command.url)
+
+        if self.prefetcher and command.method == 'GET':
+            prefetched = await self.prefetcher.take_async(command.url)
+            if prefetched:
+                timing.source = 'prefetch'
+                timing.status = prefetched.status
+                self.on_response((tab, prefetched))
+                event.enqueue(self._document(command, prefetched.result, timing))
+                return
+
+        entry = None
+        headers = self.headers
+        if self.cache and command.method == 'GET':
+            entry = self.cache.get(command.url)
+            if entry:
+                if entry.is_fresh(time.time()):
+                    self.cache.hits += 1
+                    logger.debug(self.cache)
+                    timing.source = 'cache'
+                    timing.status = entry.status
+                    self.on_response((tab, entry))
+                    await self._open_entry_async(command, entry, timing)
+                    return
+                headers = {**self.headers, **entry.validators()}
+
+        async with self.session.get(command.url, headers=headers, trace_request_ctx=timing) as response:
+            logger.debug(self.connection_stats)
+            timing.status = response.status
+            if self.cache and entry and response.status == 304:
+                self.cache.revalidated += 1
+                logger.debug(self.cache)
+                timing.source = 'revalidated'
+                self.cache.refresh(entry, response.headers)
+                self.on_response((tab, entry))
+                # the cached body, or its snapshot
+                body = None
+            else:
+                self.on_response((tab, response))
+                reader = BodyReader(response, self.limits, CHUNK_SIZE)
+                if self.stream:
+                    body, streamed = await self._stream_async(command, reader, self.cache is not None, timing)
+                else:
+                    with timing.measure('download'):
+                        body = await reader.read_text_async()
+                if reader.truncated:
+                    logger.warning(f'{command.url}: {reader}')
+                    timing.truncated = reader.truncated
+                    self.on_truncated((tab, reader))
+                entry = None
+                # a truncated body is not cached
+                if self.cache and body is not None and not reader.truncated:
+                    self.cache.misses += 1
+                    logger.debug(self.cache)
+                    # the body is written in the pool
+                    entry = await self.pool.run_local_async(
+                        self.cache.store, command.url, response.status, response.headers, body)
+                if self.stream:
+                    if entry:
+                        # reopened from the snapshot, not lexed again
+                        await self._store_snapshot_async(command.url, entry, streamed)
+                    return
+
+        if body is None:
+            assert entry
+            await self._open_entry_async(command, entry, timing)
+            return
+        result = await self._parse_async(command, body, timing)
+        if entry:
+            await self._store_snapshot_async(command.url, entry, result)
+
+    async def check_links_async(self, command: event.CheckLinksCommand):
+        start = time.perf_counter()
+        statuses = await self.link_checker.check_all_async(
+            command.links, lambda status: self.on_link_status((command.tab, command.url, status)))
+        kinds = collections.Counter(status.kind for status in statuses)
+        logger.info(f'{command.url}: {len(statuses)} links {dict(kinds)} {time.perf_counter() - start:.1f}s')
+        logger.debug(self.link_checker)
+
+    def _document(self, command: event.OpenCommand, result: 'LexResult', timing: NavigationTiming, partial=False) -> event.UpdateDocument:
+        return event.UpdateDocument(command.url, result, partial, timing, command.tab, command.generation)
+
+    async def _open_entry_async(self, command: event.OpenCommand, entry: CacheEntry, timing: NavigationTiming):
+        '''
+        the snapshot of the cached body, or parse the body and write the snapshot.
+        '''
+        assert self.cache
+        url = command.url
+        if self.snapshots:
+            with timing.measure('snapshot'):
+                result = await self.pool.run_local_async(self.snapshots.load, url, entry)
+            logger.debug(self.snapshots)
+            if result:
+                event.enqueue(self._document(command, result, timing))
+                return
+        with timing.measure('download'):
+            body = await self.pool.run_local_async(self.cache.read_body, entry)
+        if body is None:
+            # evicted by a store in the meantime. no snapshot for the entry
+            logger.debug(f'cache entry lost: {url}')
+            timing.source = 'network'
+            with timing.measure('download'):
+                body = await self._download_async(command)
+            await self._parse_async(command, body, timing)
+            return
+        result = await self._parse_async(command, body, timing)
+        await self._store_snapshot_async(url, entry, result)
+
+    async def _download_async(self, command: event.OpenCommand) -> str:
         async with self.session.get(command.url, headers=self.headers) as response:
-            self.on_response(response)
-            body = await response.text()
+            reader = BodyReader(response, self.limits, CHUNK_SIZE)
+            body = await reader.read_text_async()
+        if reader.truncated:
+            logger.warning(f'{command.url}: {reader}')
+            self.on_truncated((command.tab, reader))
+        return body
+
+    async def _store_snapshot_async(self, url: str, entry: CacheEntry, result: 'LexResult'):
+        if self.snapshots:
+            # after the document is sent to the view
+            await self.pool.run_local_async(self.snapshots.store, url, entry, result)
+
+    async def close(self):
+        if self.prefetcher:
+            self.prefetcher.shutdown()
+        await self.session.close()
+
+    async def _parse_async(self, command: event.OpenCommand, body: str, timing: NavigationTiming) -> 'LexResult':
+        if self.lazy:
+            # the lines share the soup. keep them in this process.
+            result = await self.pool.run_local_async(parse_and_lex_lazy, body, self.parser, self.get_viewport_height(), timing)
+            self.on_partial(self._document(command, result, timing, True))
+            with timing.measure('lex'):
+                result = await self.pool.run_local_async(complete_lazy, result)
+        else:
+            result = await self.pool.parse_and_lex_async(body, self.parser, timing)
+        event.enqueue(self._document(command, result, timing))
+        return result
+
+    async def _stream_async(self, command: event.OpenCommand, reader: BodyReader, keep_text: bool, timing: NavigationTiming) -> Tuple[Optional[str], 'LexResult']:
+        '''
+        lex the partial soup each time the received size doubles.
+        push it when it fills the viewport.
+        the text if keep_text, and the final result.
+
+        download is the whole loop. parse and lex run inside it.
+        '''
+        timing.begin('download')
+        decoder = StreamDecoder(reader.response.charset)
+        parser = StreamParser()
+        texts: List[str] = []
+        next_lex = 0
+        async for chunk in reader:
+            text = decoder.decode(chunk)
+            if keep_text:
+                texts.append(text)
+            with timing.measure('parse'):
+                await self.pool.run_local_async(parser.feed, text)
+            if reader.received >= next_lex:
+                next_lex = reader.received * 2
+                with timing.measure('lex'):
+                    result = await self.pool.run_local_async(parser.lex)
+                if len(result.lines) >= self.get_viewport_height():
+                    self.on_partial(self._document(
+                        command, result, timing, True))
 
-        soup = bs4.BeautifulSoup(body, 'html.parser')
-        event.enqueue(event.UpdateSoup(command.url, soup))
+        text = decoder.decode(b'', True)
+        if keep_text:
+            texts.append(text)
+        with timing.measure('parse'):
+            await self.pool.run_local_async(parser.feed, text)
+        timing.end('download')
+        with timing.measure('lex'):
+            result = await self.pool.run_local_async(parser.close)
+        event.enqueue(self._document(command, result, timing))
+        return (''.join(texts) if keep_text else None), result
@@ -0,0 +1,90 @@
+'''
+the connection pool of the client.
+'''
+from typing import NamedTuple, Optional, TYPE_CHECKING
+from . import timing
+if TYPE_CHECKING:
+    import aiohttp
+
+
+class ConnectionOptions(NamedTuple):
+    # connections in total. 0 is unlimited
+    limit: int = 100
+    limit_per_host: int = 8
+    # seconds an idle connection is kept
+    keepalive_timeout: float = 30
+    # seconds a resolved address is kept. None caches forever
+    dns_ttl: Optional[int] = 300
+    connect_timeout: Optional[float] = 10
+    read_timeout: Optional[float] = 30
+
+
+class ConnectionStats:
+    '''
+    counted by the trace hooks of the session.
+    '''
+
+    def __init__(self) -> None:
+        self.connector: Optional['aiohttp.TCPConnector'] = None
+        self.created = 0
+        self.reused = 0
+        self.dns_hits = 0
+        self.dns_misses = 0
+
+    def __str__(self) -> str:
+        return f'connection: {self.open} open, {self.created} created, {self.reused} reused({self.reuse_ratio:.0%}), dns {self.dns_hits} hit {self.dns_misses} miss'
+
+    @property
+    def open(self) -> int:
+        '''
+        idle and in use
+        '''
+        connector = self.connector
+        if not connector or connector.closed:
+            return 0
+        # aiohttp has no public counter
+        idle = sum(len(conns) for conns in getattr(
+            connector, '_conns', {}).values())
+        return idle + len(getattr(connector, '_acquired', ()))
+
+    @property
+    def reuse_ratio(self) -> float:
+        total = self.created + self.reused
+        return self.reused / total if total else 0
+
+    def trace_config(self) -> 'aiohttp.TraceConfig':
+        import aiohttp
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_create(session, context, params):
+            self.created += 1
+
+        async def on_reuse(session, context, params):
+            self.reused += 1
+
+        async def on_dns_hit(session, context, params):
+            self.dns_hits += 1
+
+        async def on_dns_miss(session, context, params):
+            self.dns_misses += 1
+
+        trace_config.on_connection_create_end.append(on_create)
+        trace_config.on_connection_reuseconn.append(on_reuse)
+        trace_config.on_dns_cache_hit.append(on_dns_hit)
+        trace_config.on_dns_cache_miss.append(on_dns_miss)
+        return trace_config
+
+
+def create_session(options: ConnectionOptions, stats: ConnectionStats) -> 'aiohttp.ClientSession':
+    import aiohttp
+    connector = aiohttp.TCPConnector(
+        limit=options.limit,
+        limit_per_host=options.limit_per_host,
+        keepalive_timeout=options.keepalive_timeout,
+        use_dns_cache=options.dns_ttl != 0,
+        ttl_dns_cache=options.dns_ttl or None,
+    )
+    stats.connector = connector
+    timeout = aiohttp.ClientTimeout(
+        total=None, sock_connect=options.connect_timeout, sock_read=options.read_timeout)
+    return aiohttp.ClientSession(connector=connector, timeout=timeout, trace_configs=[stats.trace_config(), timing.trace_config()])
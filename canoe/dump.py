@@ -0,0 +1,160 @@
+'''
+render pages to plain text without the UI.
+
+    python -m canoe --dump URL...
+    cat urls.txt | python -m canoe --dump -
+
+the pages are fetched concurrently over one session.
+parse and lex run in the worker pool and only the text comes back.
+'''
+from typing import AsyncIterator, Iterable, List, Optional, TextIO, Tuple
+import asyncio
+import collections
+import logging
+import pathlib
+import re
+import sys
+import urllib.parse
+import aiohttp
+from .limits import FetchLimits, BodyReader
+from .parser import DEFAULT_PARSER
+from .worker import WorkerPool, parse_and_lex
+from .ui.beautifulsoup_lexer import Anchor
+
+logger = logging.getLogger(__name__)
+
+
+def render_text(body: str, url: str, parser: str = DEFAULT_PARSER, links: bool = False) -> str:
+    '''
+    the text of the page. with links, each anchor is followed by [n]
+    and the numbered urls are listed at the end.
+    '''
+    result = parse_and_lex(body, parser)
+    if not links:
+        return result.text.strip('\n') + '\n'
+
+    # (row, col) of the end of each anchor
+    ends = {}
+    for span in result.focus_index.spans:
+        if isinstance(result.focus[span.focus_index], Anchor):
+            ends[span.focus_index] = (span.row, span.col_end)
+    refs: List[str] = []
+    inserts = collections.defaultdict(list)
+    for focus_index, (row, col) in ends.items():
+        href = result.focus[focus_index].tag.get('href')
+        if not isinstance(href, str):
+            continue
+        refs.append(urllib.parse.urljoin(url, href))
+        inserts[row].append((col, f'[{len(refs)}]'))
+
+    lines = result.text.split('\n')
+    for row, items in inserts.items():
+        line = lines[row]
+        for col, marker in sorted(items, reverse=True):
+            line = line[:col] + marker + line[col:]
+        lines[row] = line
+    text = '\n'.join(lines).strip('\n') + '\n'
+    if refs:
+        text += '\nReferences\n\n' + \
+            ''.join(f'{i:4}. {ref}\n' for i, ref in enumerate(refs, 1))
+    return text
+
+
+def file_name(index: int, url: str) -> str:
+    name = re.sub(r'[^\w.-]+', '_', url)[:120]
+    return f'{index:05}-{name}.txt'
+
+
+async def read_urls_async(urls: List[str]) -> AsyncIterator[str]:
+    '''
+    the arguments, or the lines of stdin for -
+    '''
+    loop = asyncio.get_running_loop()
+    for url in urls:
+        if url != '-':
+            yield url
+            continue
+        while True:
+            line = await loop.run_in_executor(None, sys.stdin.readline)
+            if not line:
+                break
+            line = line.strip()
+            if line and not line.startswith('#'):
+                yield line
+
+
+class Dumper:
+    def __init__(self, session: aiohttp.ClientSession, pool: WorkerPool, parser: str = DEFAULT_PARSER,
+                 links: bool = False, concurrency: int = 16, limits: FetchLimits = FetchLimits()) -> None:
+        self.session = session
+        self.limits = limits
+        self.pool = pool
+        self.parser = parser
+        self.links = links
+        self.concurrency = concurrency
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.done = 0
+        self.failed = 0
+
+    async def render_async(self, url: str) -> Tuple[str, Optional[str]]:
+        '''
+        (url, text). text is None on failure.
+        a truncated page ends with a [truncated: ...] line.
+        '''
+        async with self.semaphore:
+            try:
+                async with self.session.get(url) as response:
+                    response.raise_for_status()
+                    reader = BodyReader(response, self.limits)
+                    body = await reader.read_text_async()
+                text = await self.pool.run_async(render_text, body, url, self.parser, self.links)
+                if reader.truncated:
+                    logger.warning(f'{url}: {reader}')
+                    text += f'[{reader}]\n'
+                self.done += 1
+                return (url, text)
+            except Exception as e:
+                self.failed += 1
+                print(f'{url}: {e}', file=sys.stderr)
+                return (url, None)
+
+    async def dump_async(self, urls: AsyncIterator[str], out: TextIO = sys.stdout, directory: Optional[pathlib.Path] = None):
+        '''
+        write the pages in the input order. a page waits for the earlier ones,
+        and at most twice the concurrency is kept in memory.
+        '''
+        pending: collections.deque[asyncio.Task] = collections.deque()
+        index = 0
+
+        async def write_head():
+            nonlocal index
+            url, text = await pending.popleft()
+            index += 1
+            if text is None:
+                return
+            if directory:
+                (directory / file_name(index, url)).write_text(text, encoding='utf-8')
+            else:
+                out.write(f'==> {url} <==\n')
+                out.write(text)
+                out.flush()
+
+        async for url in urls:
+            pending.append(asyncio.create_task(self.render_async(url)))
+            if len(pending) >= self.concurrency * 2:
+                await write_head()
+        while pending:
+            await write_head()
+        logger.info(f'dump: {self.done} done, {self.failed} failed')
+
+
+async def dump_main_async(urls: Iterable[str], session: aiohttp.ClientSession, pool: WorkerPool,
+                          parser: str, links: bool, concurrency: int, directory: Optional[str],
+                          limits: FetchLimits = FetchLimits()) -> int:
+    path = None
+    if directory:
+        path = pathlib.Path(directory)
+        path.mkdir(parents=True, exist_ok=True)
+    dumper = Dumper(session, pool, parser, links, concurrency, limits)
+    await dumper.dump_async(read_urls_async(list(urls)), directory=path)
+    return 1 if dumper.failed else 0
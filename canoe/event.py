@@ -1,8 +1,10 @@
-from typing import Any, NamedTuple, Dict, TypeAlias, Callable, Type, Generic, List, TypeVar, Awaitable
+from typing import Any, NamedTuple, Dict, TypeAlias, Callable, Type, Generic, List, TypeVar, Awaitable, Optional, Set, Hashable
 import logging
 import asyncio
 import inspect
-import bs4
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    import bs4
 
 
 logger = logging.getLogger(__name__)
@@ -42,14 +44,30 @@ class Event(Generic[T]):
         return await future
 
 
+# the events of a page carry the id of its tab. 0 is the first tab
+# a navigation carries the generation of the tab. see navigate
+
+
 class OpenCommand(NamedTuple):
     method: str
     url: str
+    tab: int = 0
+    generation: int = 0
+
+
+class CheckLinksCommand(NamedTuple):
+    '''
+    check the links of the page
+    '''
+    url: str
+    links: List[str]
+    tab: int = 0
 
 
 class FocusInputCommand(NamedTuple):
     url: str
-    tag: bs4.Tag
+    tag: 'bs4.Tag'
+    tab: int = 0
 
 
 # class UpdateHtml(NamedTuple):
@@ -58,42 +76,169 @@ class FocusInputCommand(NamedTuple):
 
 class UpdateSoup(NamedTuple):
     url: str
-    soup: bs4.BeautifulSoup
+    soup: 'bs4.BeautifulSoup'
+    tab: int = 0
+
+
+class UpdateInput(NamedTuple):
+    '''
+    the value of an input changed
+    '''
+    url: str
+    tag: 'bs4.Tag'
+    tab: int = 0
+
+
+class UpdateDocument(NamedTuple):
+    '''
+    soup parsed and lexed by the worker pool
+    '''
+    url: str
+    result: Any  # ui.beautifulsoup_lexer.LexResult
+    partial: bool = False
+    timing: Any = None  # timing.NavigationTiming
+    tab: int = 0
+    # of the OpenCommand
+    generation: int = 0
 
 
 AwaitableEventHandler: TypeAlias = Callable[[Any], Awaitable]
 
+# one handler at a time, in order
+SERIAL = 'serial'
+# up to limit handlers at a time
+PARALLEL = 'parallel'
+# a new event cancels the running handler of the same key
+LATEST = 'latest'
+
+
+class HandlerEntry:
+    def __init__(self, handler: AwaitableEventHandler, policy: str, limit: int,
+                 key: Optional[Callable[[Any], Hashable]] = None) -> None:
+        self.handler = handler
+        self.policy = policy
+        self.key = key or (lambda payload: None)
+        match policy:
+            case 'serial':
+                self.semaphore = asyncio.Semaphore(1)
+            case 'parallel':
+                self.semaphore = asyncio.Semaphore(limit)
+            case 'latest':
+                self.semaphore = None
+            case _:
+                raise ValueError(f'unknown policy: {policy}')
+        # key: the running handler
+        self.latest: Dict[Hashable, asyncio.Task] = {}
+
 
 class EventDispatcher:
+    '''
+    the worker only dispatches. each handler runs in its own task
+    under the policy of its event type.
+    '''
+
     def __init__(self) -> None:
         self._queue = asyncio.Queue()
-        self._handlers: Dict[Type, AwaitableEventHandler] = {}
+        self._handlers: Dict[Type, HandlerEntry] = {}
+        self._worker_task: Optional[asyncio.Task] = None
+        self._tasks: Set[asyncio.Task] = set()
+        # tab: the generation of the last navigation
+        self._generations: Dict[int, int] = {}
 
     def start(self, loop: asyncio.events.AbstractEventLoop):
-        loop.create_task(self._worker())
+        self._worker_task = loop.create_task(self._worker())
 
-    def register(self, event_type: Type, handler: AwaitableEventHandler):
+    def register(self, event_type: Type, handler: AwaitableEventHandler, policy: str = SERIAL, limit: int = 1,
+                 key: Optional[Callable[[Any], Hashable]] = None):
         assert(event_type not in self._handlers)
-        self._handlers[event_type] = handler
+        self._handlers[event_type] = HandlerEntry(handler, policy, limit, key)
 
     async def _worker(self):
         logger.info('start worker')
         while True:
             payload = await self._queue.get()
-            logger.debug(f'dequeue: {payload}')
+            # not the payload. the log would keep it alive
+            logger.debug('dequeue: %s %s', type(payload).__name__,
+                         getattr(payload, 'url', ''))
 
-            handler = self._handlers.get(type(payload))
-            if not handler:
+            entry = self._handlers.get(type(payload))
+            if not entry:
                 logger.error(f'handler not found: {payload}')
                 continue
 
-            result = handler(payload)
-            if inspect.isawaitable(result):
-                await result
+            task = asyncio.create_task(self._run(entry, payload))
+            if entry.policy == LATEST:
+                self._replace_latest(entry, entry.key(payload), task)
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def _replace_latest(self, entry: HandlerEntry, key: Hashable, task: asyncio.Task):
+        latest = entry.latest.get(key)
+        if latest and not latest.done():
+            logger.debug('cancel: %s %s', getattr(entry.handler, '__qualname__', ''), key)
+            latest.cancel()
+        entry.latest[key] = task
+
+        def on_done(task: asyncio.Task):
+            if entry.latest.get(key) is task:
+                del entry.latest[key]
+        task.add_done_callback(on_done)
+
+    def cancel(self, event_type: Type, key: Hashable):
+        '''
+        cancel the running handler of the key. LATEST only.
+        '''
+        entry = self._handlers.get(event_type)
+        if entry:
+            latest = entry.latest.pop(key, None)
+            if latest and not latest.done():
+                logger.debug('cancel: %s %s', event_type.__name__, key)
+                latest.cancel()
+
+    def navigate(self, tab: int) -> int:
+        '''
+        a new generation of the tab. the documents of the former ones are stale.
+        '''
+        generation = self._generations.get(tab, 0) + 1
+        self._generations[tab] = generation
+        return generation
+
+    def is_stale(self, payload) -> bool:
+        '''
+        the payload of a navigation left. it may be queued before the next one starts.
+        '''
+        return payload.generation < self._generations.get(payload.tab, 0)
+
+    async def _run(self, entry: HandlerEntry, payload):
+        try:
+            if entry.semaphore:
+                async with entry.semaphore:
+                    await self._call(entry, payload)
+            else:
+                await self._call(entry, payload)
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            logger.exception(f'handler failed: {payload}')
+
+    async def _call(self, entry: HandlerEntry, payload):
+        result = entry.handler(payload)
+        if inspect.isawaitable(result):
+            await result
 
     def enqueue(self, payload):
         self._queue.put_nowait(payload)
 
+    async def shutdown(self):
+        tasks = list(self._tasks)
+        if self._worker_task:
+            tasks.append(self._worker_task)
+            self._worker_task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        logger.info('stop worker')
+
 
 DISPATCHER = EventDispatcher()
 
@@ -102,9 +247,26 @@ def enqueue(payload):
     DISPATCHER.enqueue(payload)
 
 
-def register(event_type: Type, handler):
-    DISPATCHER.register(event_type, handler)
+def register(event_type: Type, handler, policy: str = SERIAL, limit: int = 1,
+             key: Optional[Callable[[Any], Hashable]] = None):
+    DISPATCHER.register(event_type, handler, policy, limit, key)
+
+
+def cancel(event_type: Type, key: Hashable):
+    DISPATCHER.cancel(event_type, key)
+
+
+def navigate(tab: int = 0) -> int:
+    return DISPATCHER.navigate(tab)
+
+
+def is_stale(payload) -> bool:
+    return DISPATCHER.is_stale(payload)
 
 
 def pre_run(loop: asyncio.events.AbstractEventLoop):
     DISPATCHER.start(loop)
+
+
+async def shutdown():
+    await DISPATCHER.shutdown()
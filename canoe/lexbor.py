@@ -0,0 +1,44 @@
+'''
+the selectolax backend of parser.
+'''
+from typing import List, Dict
+import bs4
+import bs4.builder
+
+
+class SelectolaxTreeBuilder(bs4.builder.HTMLTreeBuilder):
+    NAME = 'selectolax'
+    features = [NAME]
+    picklable = True
+
+    def feed(self, markup):
+        from selectolax.lexbor import LexborHTMLParser
+        assert self.soup is not None
+        assert isinstance(markup, str)
+        soup = self.soup
+        tree = LexborHTMLParser(markup)
+        # node or the name of the tag to close
+        stack: List = [tree.root]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, str):
+                soup.endData()
+                soup.handle_endtag(node)
+                continue
+            match node.tag:
+                case '-text':
+                    soup.handle_data(node.text_content)
+                case '-comment':
+                    soup.endData()
+                    soup.handle_data(node.comment_content or '')
+                    soup.endData(bs4.Comment)
+                case name:
+                    attrs: Dict[str, str] = {
+                        k: v if v is not None else '' for k, v in node.attributes.items()}
+                    soup.endData()
+                    soup.handle_starttag(name, None, None, attrs)
+                    stack.append(name)
+                    stack.extend(reversed(list(node.iter(include_text=True))))
+
+    def test_fragment_to_document(self, fragment: str) -> str:
+        return fragment
@@ -0,0 +1,114 @@
+'''
+the limits of a response body. a fetch over a limit stops,
+and the part received so far is parsed and shown as truncated.
+
+* max_bytes: the decompressed body
+* total_timeout: seconds from the response headers to the end of the body
+* idle_timeout: seconds without data. the read timeout of the session also ends a body as idle
+
+only the standard library is imported here. the command line reads the defaults.
+'''
+from typing import AsyncIterator, List, NamedTuple, Optional, TYPE_CHECKING
+import asyncio
+import time
+if TYPE_CHECKING:
+    import aiohttp
+
+SIZE = 'size'
+TIME = 'time'
+IDLE = 'idle'
+
+
+class FetchLimits(NamedTuple):
+    # 0 or None is unlimited
+    max_bytes: Optional[int] = 64 * 1024 * 1024
+    total_timeout: Optional[float] = 60
+    idle_timeout: Optional[float] = 30
+
+
+class BodyReader:
+    '''
+    the chunks of the body until the end or a limit.
+    the connection of a truncated body is closed, not reused.
+    '''
+
+    def __init__(self, response: 'aiohttp.ClientResponse', limits: FetchLimits = FetchLimits(), chunk_size: int = 16 * 1024) -> None:
+        self.response = response
+        self.limits = limits
+        self.chunk_size = chunk_size
+        self.start = time.monotonic()
+        self.received = 0
+        # SIZE, TIME or IDLE
+        self.truncated: Optional[str] = None
+
+    def __str__(self) -> str:
+        if self.truncated == SIZE:
+            return f'truncated: over {self.limits.max_bytes} bytes'
+        if self.truncated == TIME:
+            return f'truncated: {self.received} bytes in {self.limits.total_timeout}s'
+        if self.truncated == IDLE:
+            return f'truncated: no data for {self.limits.idle_timeout}s after {self.received} bytes'
+        return f'{self.received} bytes'
+
+    def _truncate(self, reason: str):
+        self.truncated = reason
+        self.response.close()
+
+    def _timeout(self) -> Optional[float]:
+        '''
+        the idle timeout or the rest of the total. None waits forever.
+        '''
+        timeout = self.limits.idle_timeout or None
+        if self.limits.total_timeout:
+            remaining = self.start + self.limits.total_timeout - time.monotonic()
+            if timeout is None or remaining < timeout:
+                timeout = max(remaining, 0)
+        return timeout
+
+    def _is_over_time(self) -> bool:
+        return bool(self.limits.total_timeout) and time.monotonic() - self.start >= self.limits.total_timeout  # type: ignore
+
+    async def chunks(self) -> AsyncIterator[bytes]:
+        max_bytes = self.limits.max_bytes
+        while True:
+            if self._is_over_time():
+                self._truncate(TIME)
+                return
+            content = self.response.content
+            # the buffered data is taken without a timer
+            chunk = content.read_nowait(self.chunk_size)
+            if not chunk and not content.at_eof():
+                try:
+                    chunk = await asyncio.wait_for(content.read(self.chunk_size), self._timeout())
+                except asyncio.TimeoutError:
+                    # aiohttp.ServerTimeoutError is one too
+                    self._truncate(TIME if self._is_over_time() else IDLE)
+                    return
+            if not chunk:
+                return
+            if max_bytes and self.received + len(chunk) > max_bytes:
+                chunk = chunk[:max_bytes - self.received]
+                self.received += len(chunk)
+                if chunk:
+                    yield chunk
+                self._truncate(SIZE)
+                return
+            self.received += len(chunk)
+            yield chunk
+
+    def __aiter__(self) -> AsyncIterator[bytes]:
+        return self.chunks()
+
+    async def read_text_async(self) -> str:
+        '''
+        the text of the body within the limits.
+        the payload is decompressed chunk by chunk by aiohttp.
+        neither the compressed nor the raw body is held as a whole.
+        '''
+        from .charset import StreamDecoder
+        decoder = StreamDecoder(self.response.charset)
+        texts: List[str] = []
+        async for chunk in self.chunks():
+            texts.append(decoder.decode(chunk))
+        texts.append(decoder.decode(b'', True))
+        return ''.join(texts)
@@ -0,0 +1,143 @@
+'''
+check the links of a page.
+
+* a HEAD request. a ranged GET if HEAD is refused or fails.
+  a GET without the range if the resource is empty (416)
+* redirects are not followed. a 3xx is reported with its location
+* each url once. the results are kept for ttl seconds
+* the concurrency is limited in total and for each host
+'''
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+import asyncio
+import logging
+import time
+import urllib.parse
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+# HEAD is not allowed or not implemented. some servers refuse it
+FALLBACK_STATUS = {403, 405, 501}
+
+OK = 'ok'
+REDIRECT = 'redirect'
+DEAD = 'dead'
+
+
+class LinkStatus(NamedTuple):
+    url: str
+    # None if the request failed
+    status: Optional[int]
+    location: Optional[str] = None
+    error: str = ''
+
+    @property
+    def kind(self) -> str:
+        if self.status is None or self.status >= 400:
+            return DEAD
+        if self.status >= 300:
+            return REDIRECT
+        return OK
+
+    @property
+    def label(self) -> str:
+        return str(self.status) if self.status is not None else self.error
+
+
+class LinkChecker:
+    def __init__(self, session: aiohttp.ClientSession, headers: Dict[str, str],
+                 max_concurrency: int = 32, per_host: int = 8, timeout: float = 10, ttl: float = 600) -> None:
+        self.session = session
+        self.headers = headers
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.per_host = per_host
+        self.hosts: Dict[str, asyncio.Semaphore] = {}
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.ttl = ttl
+        # url: (status, checked)
+        self.results: Dict[str, Tuple[LinkStatus, float]] = {}
+        self.requests = 0
+
+    def __str__(self) -> str:
+        return f'linkcheck: {len(self.results)} checked, {self.requests} requests'
+
+    @staticmethod
+    def is_target(url: str) -> bool:
+        return urllib.parse.urlsplit(url).scheme in ('http', 'https')
+
+    def get(self, url: str) -> Optional[LinkStatus]:
+        '''
+        the cached result
+        '''
+        result = self.results.get(url)
+        if not result:
+            return None
+        status, checked = result
+        if time.monotonic() - checked > self.ttl:
+            del self.results[url]
+            return None
+        return status
+
+    def _host(self, url: str) -> asyncio.Semaphore:
+        host = urllib.parse.urlsplit(url).netloc
+        semaphore = self.hosts.get(host)
+        if not semaphore:
+            semaphore = asyncio.Semaphore(self.per_host)
+            self.hosts[host] = semaphore
+        return semaphore
+
+    async def check_async(self, url: str) -> LinkStatus:
+        status = self.get(url)
+        if status:
+            return status
+        async with self.semaphore, self._host(url):
+            status = await self._request_async(url)
+        self.results[url] = (status, time.monotonic())
+        return status
+
+    async def check_all_async(self, urls: Iterable[str],
+                              on_result: Optional[Callable[[LinkStatus], None]] = None) -> List[LinkStatus]:
+        '''
+        the same url is checked once. on_result is called as each one completes.
+        '''
+        async def check(url: str) -> LinkStatus:
+            status = await self.check_async(url)
+            if on_result:
+                on_result(status)
+            return status
+        return await asyncio.gather(*(check(url) for url in dict.fromkeys(urls)))
+
+    def _status(self, url: str, response: aiohttp.ClientResponse) -> LinkStatus:
+        location = response.headers.get('Location')
+        if location:
+            location = urllib.parse.urljoin(url, location)
+        return LinkStatus(url, response.status, location)
+
+    async def _request_async(self, url: str) -> LinkStatus:
+        self.requests += 1
+        try:
+            async with self.session.head(url, headers=self.headers, allow_redirects=False, timeout=self.timeout) as response:
+                status = self._status(url, response)
+            if status.status not in FALLBACK_STATUS:
+                return status
+        except asyncio.TimeoutError:
+            return LinkStatus(url, None, error='timeout')
+        except (aiohttp.ClientError, ValueError) as e:
+            logger.debug(f'HEAD {url}: {e!r}')
+
+        status = await self._get_async(url, {**self.headers, 'Range': 'bytes=0-0'})
+        if status.status == 416:
+            # no byte 0. an empty resource
+            status = await self._get_async(url, self.headers)
+        return status
+
+    async def _get_async(self, url: str, headers: Dict[str, str]) -> LinkStatus:
+        self.requests += 1
+        try:
+            # the body is not read. the connection is closed if it is not at the end
+            async with self.session.get(url, headers=headers, allow_redirects=False, timeout=self.timeout) as response:
+                return self._status(url, response)
+        except asyncio.TimeoutError:
+            return LinkStatus(url, None, error='timeout')
+        except (aiohttp.ClientError, ValueError) as e:
+            return LinkStatus(url, None, error=type(e).__name__)
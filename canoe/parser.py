@@ -0,0 +1,57 @@
+'''
+html parser backends. every backend builds a bs4 soup for BeautifulSoupLexer.
+
+* html.parser: bs4 builtin. pure python
+* lxml: bs4 + lxml
+* html5lib: bs4 + html5lib. slowest
+* selectolax: lexbor parses in C, then the tree is copied into a soup. see lexbor
+
+bs4 is imported on the first parse.
+'''
+from typing import List, TYPE_CHECKING
+import importlib.util
+if TYPE_CHECKING:
+    import bs4
+
+AUTO = 'auto'
+DEFAULT_PARSER = 'html.parser'
+PARSERS = [DEFAULT_PARSER, 'lxml', 'html5lib', 'selectolax']
+# auto picks the first available for a large body
+FAST_PARSERS = ['selectolax', 'lxml']
+AUTO_THRESHOLD = 256 * 1024
+
+_MODULES = {
+    DEFAULT_PARSER: None,
+    'lxml': 'lxml',
+    'html5lib': 'html5lib',
+    'selectolax': 'selectolax',
+}
+
+
+def is_available(parser: str) -> bool:
+    module = _MODULES[parser]
+    return module is None or importlib.util.find_spec(module) is not None
+
+
+def available_parsers() -> List[str]:
+    return [parser for parser in PARSERS if is_available(parser)]
+
+
+def select_parser(parser: str, size: int) -> str:
+    if parser != AUTO:
+        return parser
+    if size >= AUTO_THRESHOLD:
+        for fast in FAST_PARSERS:
+            if is_available(fast):
+                return fast
+    return DEFAULT_PARSER
+
+
+def parse_html(body: str, parser: str = DEFAULT_PARSER) -> 'bs4.BeautifulSoup':
+    import bs4
+    match select_parser(parser, len(body)):
+        case 'selectolax':
+            from .lexbor import SelectolaxTreeBuilder
+            return bs4.BeautifulSoup(body, builder=SelectolaxTreeBuilder)
+        case name:
+            return bs4.BeautifulSoup(body, name)
@@ -0,0 +1,180 @@
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+import asyncio
+import collections
+import logging
+import time
+import urllib.parse
+import aiohttp
+from .worker import WorkerPool
+from .cache import HttpCache
+from .limits import FetchLimits, BodyReader
+from .parser import DEFAULT_PARSER
+from .ui.beautifulsoup_lexer import LexResult
+from .ui.history import estimate_size
+
+logger = logging.getLogger(__name__)
+
+
+class Prefetched(NamedTuple):
+    url: str
+    status: int
+    result: LexResult
+
+
+class Prefetcher:
+    '''
+    fetch, parse and lex the links near the cursor in the background.
+    a link that is no longer requested is cancelled before it starts.
+    the lexed documents are kept in a LRU bounded by the estimated size.
+    '''
+
+    def __init__(self, session: aiohttp.ClientSession, pool: WorkerPool, headers: Dict[str, str],
+                 parser: str = DEFAULT_PARSER, cache: Optional[HttpCache] = None,
+                 max_concurrency: int = 4, per_host: int = 2, max_bytes: int = 32 * 1024 * 1024,
+                 limits: FetchLimits = FetchLimits()) -> None:
+        self.session = session
+        self.pool = pool
+        self.headers = headers
+        self.parser = parser
+        self.cache = cache
+        self.max_bytes = max_bytes
+        self.limits = limits
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.per_host = per_host
+        self.hosts: Dict[str, asyncio.Semaphore] = {}
+        self.documents: collections.OrderedDict[str, Tuple[Prefetched, int]] = collections.OrderedDict(
+        )
+        self.total_bytes = 0
+        self.tasks: Dict[str, asyncio.Task] = {}
+        # urls past the semaphores
+        self.running: Set[str] = set()
+        self.requested: List[str] = []
+        self.hits = 0
+        self.misses = 0
+        self.fetched = 0
+        self.failed = 0
+
+    def __str__(self) -> str:
+        return f'prefetch: {self.hits} hit, {self.misses} miss, {len(self.documents)} ready'
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0
+
+    @staticmethod
+    def is_target(url: str) -> bool:
+        return urllib.parse.urlsplit(url).scheme in ('http', 'https')
+
+    def request(self, urls: List[str]):
+        '''
+        the links to prefetch in priority order. replaces the last request.
+        '''
+        urls = [url for url in dict.fromkeys(urls) if self.is_target(url)]
+        if urls == self.requested:
+            return
+        self.requested = urls
+        for url, task in list(self.tasks.items()):
+            # a running fetch is cheaper to finish than to waste
+            if url not in urls and url not in self.running:
+                task.cancel()
+                del self.tasks[url]
+        for url in urls:
+            if url in self.documents or url in self.tasks:
+                continue
+            task = asyncio.create_task(self._prefetch_async(url))
+            self.tasks[url] = task
+
+    async def take_async(self, url: str) -> Optional[Prefetched]:
+        '''
+        the prefetched document for the navigation. wait for it if running.
+        '''
+        task = self.tasks.get(url)
+        if task:
+            if url in self.running:
+                await asyncio.wait([task])
+            else:
+                # still queued. fetching directly is faster
+                task.cancel()
+                del self.tasks[url]
+        document = self.documents.pop(url, None)
+        if not document:
+            self.misses += 1
+            logger.debug(self)
+            return None
+        prefetched, size = document
+        self.total_bytes -= size
+        self.hits += 1
+        logger.debug(self)
+        return prefetched
+
+    def _store(self, prefetched: Prefetched):
+        size = estimate_size(prefetched.result)
+        if size > self.max_bytes:
+            return
+        self.documents[prefetched.url] = (prefetched, size)
+        self.total_bytes += size
+        while self.total_bytes > self.max_bytes:
+            _, (_, evicted) = self.documents.popitem(last=False)
+            self.total_bytes -= evicted
+
+    def _host(self, url: str) -> asyncio.Semaphore:
+        host = urllib.parse.urlsplit(url).netloc
+        semaphore = self.hosts.get(host)
+        if not semaphore:
+            semaphore = asyncio.Semaphore(self.per_host)
+            self.hosts[host] = semaphore
+        return semaphore
+
+    async def _prefetch_async(self, url: str):
+        try:
+            async with self.semaphore, self._host(url):
+                self.running.add(url)
+                start = time.perf_counter()
+                fetched = await self._fetch_async(url)
+                if not fetched:
+                    return
+                status, body = fetched
+                result = await self.pool.parse_and_lex_async(body, self.parser)
+                self._store(Prefetched(url, status, result))
+                self.fetched += 1
+                logger.debug(
+                    f'prefetch: {url} {time.perf_counter() - start:.3f}s')
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failed += 1
+            logger.debug(f'prefetch failed: {url} {e}')
+        finally:
+            self.running.discard(url)
+            if self.tasks.get(url) is asyncio.current_task():
+                del self.tasks[url]
+
+    async def _fetch_async(self, url: str) -> Optional[Tuple[int, str]]:
+        if self.cache:
+            entry = self.cache.get(url)
+            if entry and entry.is_fresh(time.time()):
+                body = await self.pool.run_local_async(self.cache.read_body, entry)
+                # None if evicted in the meantime
+                if body is not None:
+                    return (entry.status, body)
+        async with self.session.get(url, headers=self.headers) as response:
+            if response.status != 200 or response.content_type != 'text/html':
+                return None
+            if (response.content_length or 0) > self.max_bytes:
+                return None
+            reader = BodyReader(response, self.limits)
+            body = await reader.read_text_async()
+            if reader.truncated:
+                # the navigation fetches it again
+                logger.debug(f'prefetch: {url} {reader}')
+                return None
+            if self.cache:
+                await self.pool.run_local_async(
+                    self.cache.store, url, response.status, response.headers, body)
+            return (response.status, body)
+
+    def shutdown(self):
+        for task in self.tasks.values():
+            task.cancel()
+        self.tasks.clear()
@@ -0,0 +1,286 @@
+'''
+binary snapshots of rendered pages. a page reopened from the http cache
+is mapped from its snapshot instead of parsed and lexed.
+
+    {key}.snapshot
+
+    magic
+    uint32 size of the header, json header
+    uint64 line starts          \\
+    uint64 line fragments        | CompactLines, offsets in characters.
+    uint64 fragment ends         | each section is aligned to 8 bytes
+    uint16 fragment styles       |
+    uint64 focus spans          /  (focus_index, row, col_start, col_end)
+    utf-8 text
+
+the header has the url, the validator, the title, the style table and the focus list
+with the hrefs as written. the view resolves them as on a live page,
+see view_window.resolve_href. the arrays are memoryviews of the mapped file.
+the focus tags are small bs4.Tags made on first access, not a soup.
+
+the key is the url and the validator of the cached response,
+so a snapshot is used only with the body it was rendered from.
+'''
+from typing import Any, Dict, List, Optional, Sequence
+import array
+import collections
+import hashlib
+import json
+import logging
+import mmap
+import os
+import pathlib
+import struct
+import sys
+import threading
+import bs4
+from .cache import CacheEntry
+from .ui.beautifulsoup_lexer import LexResult, CompactLines, Focus, Anchor, Input, FocusIndex, FocusSpan
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SNAPSHOT_DIR = pathlib.Path.home() / '.cache' / 'canoe' / 'snapshot'
+MAGIC = b'CANOESNAP1\n'
+VERSION = 1
+
+
+def get_validator(entry: CacheEntry) -> str:
+    '''
+    what identifies the cached body. a body without a validator has its stored time.
+    '''
+    return entry.headers.get('etag') or entry.headers.get('last-modified') or f'stored:{entry.stored!r}'
+
+
+def _pad(data: bytearray):
+    data.extend(b'\0' * (-len(data) % 8))
+
+
+def encode(url: str, validator: str, result: LexResult) -> Optional[bytes]:
+    '''
+    None for a result that is not complete.
+    '''
+    lines = result.lines
+    if not isinstance(lines, CompactLines):
+        return None
+    forms: Dict[int, int] = {}
+    form_attrs: List[Dict[str, Any]] = []
+    focus: List[list] = []
+    for f in result.focus:
+        match f:
+            case Input(tag, form):
+                form_id = -1
+                if form is not None:
+                    form_id = forms.get(id(form), -1)
+                    if form_id < 0:
+                        form_id = forms[id(form)] = len(form_attrs)
+                        form_attrs.append(dict(form.attrs))
+                focus.append(['input', dict(tag.attrs), form_id])
+            case Anchor(tag):
+                href = tag.get('href')
+                focus.append(['a', href if isinstance(href, str) else None])
+            case _:
+                return None
+    spans = array.array('Q')
+    for span in result.focus_index.spans:
+        spans.extend(span)
+    text = lines.text.encode('utf-8')
+    header = json.dumps({
+        'version': VERSION,
+        'byteorder': sys.byteorder,
+        'url': url,
+        'validator': validator,
+        'title': result.title,
+        'styles': lines.styles,
+        'focus': focus,
+        'forms': form_attrs,
+        'lines': len(lines.line_starts),
+        'fragments': len(lines.fragment_ends),
+        'spans': len(result.focus_index.spans),
+        'text': len(text),
+    }, default=str).encode('utf-8')
+
+    data = bytearray(MAGIC)
+    data.extend(struct.pack('<I', len(header)))
+    data.extend(header)
+    for values, typecode in ((lines.line_starts, 'Q'), (lines.line_fragments, 'Q'),
+                             (lines.fragment_ends, 'Q'), (lines.fragment_styles, 'H')):
+        _pad(data)
+        data.extend(array.array(typecode, values).tobytes())
+    _pad(data)
+    data.extend(spans.tobytes())
+    data.extend(text)
+    return bytes(data)
+
+
+class SnapshotFocus(Sequence[Focus]):
+    '''
+    the focus list of a snapshot. a focus and its tag are made on first access,
+    and the inputs of a form together, so that form.find_all('input') sees them.
+    '''
+
+    def __init__(self, records: List[list], forms: List[Dict[str, Any]]) -> None:
+        self.records = records
+        self.forms = forms
+        self._focus: Dict[int, Focus] = {}
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __getitem__(self, index: int) -> Focus:  # type: ignore
+        if index < 0:
+            index += len(self)
+        focus = self._focus.get(index)
+        if focus is None:
+            match self.records[index]:
+                case ['a', href]:
+                    focus = Anchor(bs4.Tag(name='a', attrs={'href': href} if href else {}), index)
+                    self._focus[index] = focus
+                case ['input', _, form_id] if form_id >= 0:
+                    self._build_form(form_id)
+                case ['input', attrs, _]:
+                    self._focus[index] = Input(bs4.Tag(name='input', attrs=attrs), index, None)
+            focus = self._focus[index]
+        return focus
+
+    def _build_form(self, form_id: int):
+        form = bs4.Tag(name='form', attrs=self.forms[form_id])
+        for i, record in enumerate(self.records):
+            match record:
+                case ['input', attrs, f] if f == form_id:
+                    tag = bs4.Tag(name='input', attrs=attrs)
+                    form.append(tag)
+                    self._focus[i] = Input(tag, i, form)
+
+
+def decode(buffer, url: str, validator: str) -> LexResult:
+    '''
+    the arrays stay views of the buffer.
+    '''
+    view = memoryview(buffer)
+    if bytes(view[:len(MAGIC)]) != MAGIC:
+        raise ValueError('not a snapshot')
+    position = len(MAGIC)
+    header_size, = struct.unpack_from('<I', view, position)
+    position += 4
+    header = json.loads(bytes(view[position:position + header_size]))
+    position += header_size
+    if header['version'] != VERSION or header['byteorder'] != sys.byteorder:
+        raise ValueError('incompatible snapshot')
+    if header['url'] != url or header['validator'] != validator:
+        raise ValueError('another page')
+
+    def section(count: int, typecode: str) -> memoryview:
+        nonlocal position
+        position += -position % 8
+        size = count * array.array(typecode).itemsize
+        values = view[position:position + size].cast(typecode)
+        position += size
+        return values
+
+    line_starts = section(header['lines'], 'Q')
+    line_fragments = section(header['lines'] + 1, 'Q')
+    fragment_ends = section(header['fragments'], 'Q')
+    fragment_styles = section(header['fragments'], 'H')
+    spans = section(header['spans'] * 4, 'Q').tolist()
+    text = str(view[position:position + header['text']], 'utf-8')
+
+    lines = CompactLines.from_arrays(text, header['styles'], line_starts, line_fragments,
+                                     fragment_ends, fragment_styles)
+    focus_index = FocusIndex([FocusSpan(*spans[i:i + 4])
+                             for i in range(0, len(spans), 4)])
+    focus = SnapshotFocus(header['focus'], header['forms'])
+    return LexResult(None, text, header['title'], lines, focus, focus_index)  # type: ignore
+
+
+class SnapshotStore:
+    '''
+    LRU by the total file size. the mtime keeps the order across sessions.
+    load and store run in the worker threads.
+    '''
+
+    def __init__(self, directory: pathlib.Path = DEFAULT_SNAPSHOT_DIR, max_bytes: int = 256 * 1024 * 1024) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.entries: collections.OrderedDict[str, int] = collections.OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        loaded = []
+        for path in self.directory.glob('*.snapshot'):
+            stat = path.stat()
+            loaded.append((stat.st_mtime, path.stem, stat.st_size))
+        for _, key, size in sorted(loaded):
+            self.entries[key] = size
+            self.total_bytes += size
+        self._evict()
+
+    def __str__(self) -> str:
+        return f'snapshot: {self.hits} hit, {self.misses} miss, {len(self.entries)} entries, {self.total_bytes} bytes'
+
+    @staticmethod
+    def get_key(url: str, validator: str) -> str:
+        return hashlib.sha1(f'{url}\n{validator}'.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> pathlib.Path:
+        return self.directory / f'{key}.snapshot'
+
+    def _remove(self, key: str):
+        self.total_bytes -= self.entries.pop(key)
+        try:
+            self._path(key).unlink()
+        except OSError:
+            # missing, or mapped on windows
+            pass
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and self.entries:
+            self._remove(next(iter(self.entries)))
+
+    def load(self, url: str, entry: CacheEntry) -> Optional[LexResult]:
+        validator = get_validator(entry)
+        key = self.get_key(url, validator)
+        with self._lock:
+            if key not in self.entries:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            result = decode(mapped, url, validator)
+            os.utime(path)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f'broken snapshot: {path}: {e}')
+            with self._lock:
+                if key in self.entries:
+                    self._remove(key)
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return result
+
+    def store(self, url: str, entry: CacheEntry, result: LexResult) -> bool:
+        validator = get_validator(entry)
+        data = encode(url, validator, result)
+        if data is None or len(data) > self.max_bytes:
+            return False
+        key = self.get_key(url, validator)
+        path = self._path(key)
+        tmp = path.with_suffix('.tmp')
+        try:
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning(f'snapshot not stored: {path}: {e}')
+            return False
+        with self._lock:
+            if key in self.entries:
+                self.total_bytes -= self.entries.pop(key)
+            self.entries[key] = len(data)
+            self.total_bytes += len(data)
+            self._evict()
+        return True
@@ -0,0 +1,183 @@
+'''
+the time from the start to the first frame, and the import time of each module.
+
+    python -m canoe --profile-startup URL
+
+the UI is painted before the client, aiohttp and bs4 are imported.
+the rest loads in the background after the first frame.
+only the standard library is imported here.
+'''
+from typing import Dict, List, Optional, TextIO, Tuple
+import importlib.abc
+import importlib.machinery
+import sys
+import threading
+import time
+
+START = time.perf_counter()
+# the time to the first frame over a bare prompt_toolkit application.
+# asyncio and prompt_toolkit take about 100ms to import, so the whole time has no target
+FIRST_FRAME_TARGET = 0.03
+
+
+class _TimedLoader(importlib.abc.Loader):
+    '''
+    time the exec of a module. the original loader is put back on the module.
+    '''
+
+    def __init__(self, loader: importlib.abc.Loader, profiler: 'ImportProfiler', name: str) -> None:
+        self.loader = loader
+        self.profiler = profiler
+        self.name = name
+
+    def __getattr__(self, name: str):
+        return getattr(self.loader, name)
+
+    def create_module(self, spec: importlib.machinery.ModuleSpec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        module.__loader__ = self.loader
+        if module.__spec__:
+            module.__spec__.loader = self.loader
+        self.profiler._begin(self.name)
+        try:
+            self.loader.exec_module(module)
+        finally:
+            self.profiler._end(self.name)
+
+
+class ImportProfiler(importlib.abc.MetaPathFinder):
+    '''
+    the cumulative and self time of each module imported while installed.
+    self excludes the modules imported by the module.
+    '''
+
+    def __init__(self) -> None:
+        # name: [cumulative, self]
+        self.records: Dict[str, List[float]] = {}
+        # name, begin, time of the children. for each thread
+        self._stacks: Dict[int, List[List]] = {}
+        self._finding = False
+
+    def install(self):
+        sys.meta_path.insert(0, self)
+
+    def uninstall(self):
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def find_spec(self, fullname, path, target=None):
+        if self._finding:
+            return None
+        self._finding = True
+        try:
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, 'find_spec'):
+                    continue
+                spec = finder.find_spec(fullname, path, target)
+                if spec is not None:
+                    break
+            else:
+                return None
+        finally:
+            self._finding = False
+        if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+            spec.loader = _TimedLoader(spec.loader, self, fullname)
+        return spec
+
+    def _begin(self, name: str):
+        stack = self._stacks.setdefault(threading.get_ident(), [])
+        stack.append([name, time.perf_counter(), 0.0])
+
+    def _end(self, name: str):
+        stack = self._stacks[threading.get_ident()]
+        _, begin, children = stack.pop()
+        elapsed = time.perf_counter() - begin
+        self.records[name] = [elapsed, elapsed - children]
+        if stack:
+            stack[-1][2] += elapsed
+
+    def top(self, count: int = 30) -> List[Tuple[str, float, float]]:
+        '''
+        (name, cumulative, self) in the order of the cumulative time.
+        '''
+        items = sorted(self.records.items(), key=lambda x: x[1][0], reverse=True)
+        return [(name, cumulative, self_time) for name, (cumulative, self_time) in items[:count]]
+
+    @property
+    def total(self) -> float:
+        '''
+        the time of the top level imports.
+        '''
+        return sum(self_time for cumulative, self_time in self.records.values())
+
+
+class StartupTiming:
+    '''
+    the milestones from the start of the process.
+    '''
+
+    def __init__(self, start: float = START) -> None:
+        self.start = start
+        self.marks: Dict[str, float] = {}
+
+    def mark(self, name: str) -> float:
+        return self.marks.setdefault(name, time.perf_counter() - self.start)
+
+    def __str__(self) -> str:
+        return ' '.join(f'{name}:{seconds * 1000:.0f}ms' for name, seconds in self.marks.items())
+
+    def report(self, profiler: Optional[ImportProfiler] = None, out: TextIO = sys.stderr, count: int = 30):
+        out.write(f'startup: {self}\n')
+        first_frame = self.marks.get('first_frame')
+        if first_frame is not None:
+            floor = ''
+            if profiler and 'prompt_toolkit' in profiler.records:
+                floor = f' (importing prompt_toolkit {profiler.records["prompt_toolkit"][0] * 1000:.0f}ms)'
+            out.write(f'first frame: {first_frame * 1000:.0f}ms{floor}\n')
+        if profiler:
+            out.write(
+                f'imports: {len(profiler.records)} modules {profiler.total * 1000:.0f}ms\n')
+            out.write(f'{"cumulative":>10} {"self":>8}  module\n')
+            for name, cumulative, self_time in profiler.top(count):
+                out.write(
+                    f'{cumulative * 1000:8.1f}ms {self_time * 1000:6.1f}ms  {name}\n')
+
+
+def measure_first_frame(bare: bool = False) -> float:
+    '''
+    seconds from the call to the first render of the empty browser.
+    run it in a fresh process to include the imports.
+
+    bare renders an empty prompt_toolkit application instead. it is the floor of the browser.
+    '''
+    start = time.perf_counter()
+    import asyncio
+    from prompt_toolkit.application import Application, create_app_session
+    from prompt_toolkit.input import create_pipe_input
+    from prompt_toolkit.output import DummyOutput
+
+    first_frame: Optional[float] = None
+
+    def on_render(app):
+        nonlocal first_frame
+        if first_frame is None:
+            first_frame = time.perf_counter() - start
+            app.exit()
+
+    with create_pipe_input() as input, create_app_session(input=input, output=DummyOutput()):
+        if bare:
+            from prompt_toolkit.layout import Layout, Window
+            application = Application(layout=Layout(Window()), full_screen=True)
+        else:
+            from .ui.root import Root
+            application = Root().application
+        application.after_render += on_render
+        asyncio.run(application.run_async())
+    assert first_frame is not None
+    return first_frame
+
+
+if __name__ == '__main__':
+    print(measure_first_frame('--bare' in sys.argv[1:]))
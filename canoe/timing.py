@@ -0,0 +1,124 @@
+'''
+the time of each stage of a navigation.
+
+* dns, connect, ttfb: aiohttp trace hooks. connect includes dns
+* download, parse, lex: the client and the worker
+* snapshot: map the rendered page instead of parse and lex
+* apply: set the result to the view
+* paint: from the document to the next render
+* partial: from the start to the first partial document
+'''
+from typing import Dict, Optional, TYPE_CHECKING
+import contextlib
+import json
+import time
+if TYPE_CHECKING:
+    import aiohttp
+
+STAGES = ['dns', 'connect', 'ttfb', 'download', 'snapshot',
+          'parse', 'lex', 'apply', 'paint']
+
+
+class NavigationTiming:
+    def __init__(self, url: str) -> None:
+        self.url = url
+        self.wall = time.time()
+        self.start = time.perf_counter()
+        # network, cache, revalidated or prefetch
+        self.source = 'network'
+        self.status: Optional[int] = None
+        self.reused = False
+        # the limit the body stopped at. see limits
+        self.truncated: Optional[str] = None
+        self.durations: Dict[str, float] = {}
+        self.total: Optional[float] = None
+        self._begins: Dict[str, float] = {}
+
+    def __str__(self) -> str:
+        stages = ' '.join(f'{name}:{self.durations[name] * 1000:.0f}ms'
+                          for name in STAGES if name in self.durations)
+        total = f' total:{self.total * 1000:.0f}ms' if self.total is not None else ''
+        truncated = f' truncated:{self.truncated}' if self.truncated else ''
+        return f'{self.source} {stages}{total}{truncated}'
+
+    def add(self, name: str, seconds: float):
+        self.durations[name] = self.durations.get(name, 0) + seconds
+
+    def begin(self, name: str):
+        self._begins[name] = time.perf_counter()
+
+    def end(self, name: str):
+        begin = self._begins.pop(name, None)
+        if begin is not None:
+            self.add(name, time.perf_counter() - begin)
+
+    def mark(self, name: str):
+        '''
+        the time from the start. the first mark stays.
+        '''
+        self.durations.setdefault(name, time.perf_counter() - self.start)
+
+    @contextlib.contextmanager
+    def measure(self, name: str):
+        begin = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - begin)
+
+    def finish(self):
+        self.total = time.perf_counter() - self.start
+
+    def to_json(self) -> dict:
+        return {
+            'url': self.url,
+            'time': self.wall,
+            'source': self.source,
+            'status': self.status,
+            'reused': self.reused,
+            'truncated': self.truncated,
+            'durations': self.durations,
+            'total': self.total,
+        }
+
+
+def trace_config() -> 'aiohttp.TraceConfig':
+    '''
+    pass the NavigationTiming as trace_request_ctx of the request.
+    '''
+    import aiohttp
+    trace_config = aiohttp.TraceConfig()
+
+    def hook(func):
+        async def on_trace(session, context, params):
+            timing = context.trace_request_ctx
+            if isinstance(timing, NavigationTiming):
+                func(timing)
+        return on_trace
+
+    trace_config.on_dns_resolvehost_start.append(
+        hook(lambda t: t.begin('dns')))
+    trace_config.on_dns_resolvehost_end.append(hook(lambda t: t.end('dns')))
+    trace_config.on_connection_create_start.append(
+        hook(lambda t: t.begin('connect')))
+    trace_config.on_connection_create_end.append(
+        hook(lambda t: t.end('connect')))
+    trace_config.on_connection_reuseconn.append(
+        hook(lambda t: setattr(t, 'reused', True)))
+    trace_config.on_request_headers_sent.append(
+        hook(lambda t: t.begin('ttfb')))
+    trace_config.on_request_end.append(hook(lambda t: t.end('ttfb')))
+    return trace_config
+
+
+class TimingLog:
+    '''
+    append a json line for each navigation.
+    '''
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def write(self, timing: NavigationTiming):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(timing.to_json()) + '\n')
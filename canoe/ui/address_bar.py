@@ -1,3 +1,4 @@
+from typing import Callable
 import prompt_toolkit.buffer
 import prompt_toolkit.layout
 import prompt_toolkit.filters
@@ -8,6 +9,8 @@ D = prompt_toolkit.layout.Dimension
 class AddressBar:
     def __init__(self, kb: prompt_toolkit.key_binding.KeyBindings, style="") -> None:
         self.kb = kb
+        # the tab to open the url in
+        self.get_tab: Callable[[], int] = lambda: 0
         self.buffer = prompt_toolkit.buffer.Buffer(multiline=False)
         self.has_focus = prompt_toolkit.filters.has_focus(self.buffer)
         self.control = prompt_toolkit.layout.controls.BufferControl(
@@ -38,5 +41,7 @@ class AddressBar:
 
     def enter(self, e: prompt_toolkit.key_binding.KeyPressEvent):
         from .. import event
-        event.enqueue(event.OpenCommand('GET', self.buffer.text))
+        tab = self.get_tab()
+        event.enqueue(event.OpenCommand(
+            'GET', self.buffer.text, tab, event.navigate(tab)))
         e.app.layout.focus_previous()
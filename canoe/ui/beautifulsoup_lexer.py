@@ -1,9 +1,13 @@
-from typing import List, Callable, Tuple, Optional
+from typing import List, Callable, Tuple, Optional, NamedTuple, Dict, Sequence, Iterator, Iterable
 import prompt_toolkit.lexers
 import prompt_toolkit.formatted_text
 import prompt_toolkit.document
+import array
+import bisect
 import bs4
 import io
+import sys
+import threading
 
 INPUT_KEYS = ['name', 'value']
 
@@ -14,9 +18,11 @@ class Focus:
         self.tag = tag
         self.index = index
         self.style_class = style_class
+        # shared by every focus of the class. FocusIndex tells them apart.
+        self.style = sys.intern(f'class:{style_class}')
 
     def get_style(self) -> str:
-        return f'class:{self.style_class} class:_{self.index}'
+        return self.style
 
 
 class Anchor(Focus):
@@ -34,107 +40,515 @@ class Input(Focus):
         self.form = form
 
 
+class FocusSpan(NamedTuple):
+    focus_index: int
+    row: int
+    col_start: int
+    # exclusive
+    col_end: int
+
+
+class FocusIndex:
+    '''
+    focus spans sorted by (row, col_start).
+    a focus that wraps lines has a span for each line.
+    '''
+
+    def __init__(self, spans: List[FocusSpan]) -> None:
+        self.spans = spans
+        self.keys = [(span.row, span.col_start) for span in spans]
+        # the spans of a focus are adjacent
+        self.first: Dict[int, int] = {}
+        for i, span in enumerate(spans):
+            self.first.setdefault(span.focus_index, i)
+
+    def __len__(self) -> int:
+        return len(self.spans)
+
+    def at(self, row: int, col: int) -> Optional[FocusSpan]:
+        i = bisect.bisect_right(self.keys, (row, col)) - 1
+        if i >= 0:
+            span = self.spans[i]
+            if span.row == row and col < span.col_end:
+                return span
+        return None
+
+    def spans_of(self, focus_index: int) -> List[FocusSpan]:
+        i = self.first.get(focus_index)
+        if i is None:
+            return []
+        spans = []
+        while i < len(self.spans) and self.spans[i].focus_index == focus_index:
+            spans.append(self.spans[i])
+            i += 1
+        return spans
+
+    def rows(self, first_row: int, last_row: int) -> List[FocusSpan]:
+        '''
+        the spans in [first_row, last_row]
+        '''
+        start = bisect.bisect_left(self.keys, (first_row, 0))
+        end = bisect.bisect_left(self.keys, (last_row + 1, 0))
+        return self.spans[start:end]
+
+    def next(self, row: int, col: int) -> Optional[FocusSpan]:
+        current = self.at(row, col)
+        i = bisect.bisect_right(self.keys, (row, col))
+        while current and i < len(self.spans) and self.spans[i].focus_index == current.focus_index:
+            i += 1
+        if i < len(self.spans):
+            return self.spans[i]
+        return None
+
+    def resize(self, span: FocusSpan, col_end: int) -> 'FocusIndex':
+        '''
+        a new index with the span ending at col_end.
+        the later spans of the row move by the difference.
+        '''
+        delta = col_end - span.col_end
+        spans = list(self.spans)
+        i = bisect.bisect_left(self.keys, (span.row, span.col_start))
+        spans[i] = span._replace(col_end=col_end)
+        i += 1
+        while i < len(spans) and spans[i].row == span.row:
+            spans[i] = spans[i]._replace(col_start=spans[i].col_start + delta,
+                                         col_end=spans[i].col_end + delta)
+            i += 1
+        return FocusIndex(spans)
+
+    def prev(self, row: int, col: int) -> Optional[FocusSpan]:
+        current = self.at(row, col)
+        i = bisect.bisect_left(self.keys, (row, col)) - 1
+        while current and i >= 0 and self.spans[i].focus_index == current.focus_index:
+            i -= 1
+        if i < 0:
+            return None
+        # the head of the focus
+        return self.spans[self.first[self.spans[i].focus_index]]
+
+
+class CompactLines(Sequence[prompt_toolkit.formatted_text.StyleAndTextTuples]):
+    '''
+    the lines in one text buffer, the text of the document.
+    a fragment is an end offset into the text and an interned style id, both in arrays.
+    the (style, text) tuples are made when a line is read.
+    '''
+
+    def __init__(self, lines: Iterable[prompt_toolkit.formatted_text.StyleAndTextTuples]) -> None:
+        self.styles: List[str] = []
+        style_ids: Dict[str, int] = {}
+        self.line_starts = array.array('L')
+        # the first fragment of each line and the end
+        self.line_fragments = array.array('L', [0])
+        self.fragment_ends = array.array('L')
+        self.fragment_styles = array.array('H')
+        # the lines replaced after the build. see BeautifulSoupLexer.update_input
+        self.overrides: Dict[int, prompt_toolkit.formatted_text.StyleAndTextTuples] = {}
+
+        parts: List[str] = []
+        position = 0
+        for row, line in enumerate(lines):
+            if row:
+                parts.append('\n')
+                position += 1
+            self.line_starts.append(position)
+            for style, text, *_ in line:
+                style_id = style_ids.get(style)
+                if style_id is None:
+                    style_id = style_ids[style] = len(self.styles)
+                    self.styles.append(style)
+                parts.append(text)
+                position += len(text)
+                self.fragment_ends.append(position)
+                self.fragment_styles.append(style_id)
+            self.line_fragments.append(len(self.fragment_ends))
+        self.text = ''.join(parts)
+
+    @staticmethod
+    def from_arrays(text: str, styles: List[str], line_starts: Sequence[int], line_fragments: Sequence[int],
+                    fragment_ends: Sequence[int], fragment_styles: Sequence[int]) -> 'CompactLines':
+        '''
+        lines over arrays that are already built, such as the memoryviews of a snapshot.
+        '''
+        lines = CompactLines.__new__(CompactLines)
+        lines.text = text
+        lines.styles = styles
+        lines.line_starts = line_starts  # type: ignore
+        lines.line_fragments = line_fragments  # type: ignore
+        lines.fragment_ends = fragment_ends  # type: ignore
+        lines.fragment_styles = fragment_styles  # type: ignore
+        lines.overrides = {}
+        return lines
+
+    def __len__(self) -> int:
+        return len(self.line_starts)
+
+    def __getitem__(self, index: int) -> prompt_toolkit.formatted_text.StyleAndTextTuples:  # type: ignore
+        if index < 0:
+            index += len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError(index)
+        line = self.overrides.get(index)
+        if line is not None:
+            return line
+        styles = self.styles
+        text = self.text
+        start = self.line_starts[index]
+        line = []
+        for i in range(self.line_fragments[index], self.line_fragments[index + 1]):
+            end = self.fragment_ends[i]
+            line.append((styles[self.fragment_styles[i]], text[start:end]))
+            start = end
+        return line
+
+    def __setitem__(self, index: int, line: prompt_toolkit.formatted_text.StyleAndTextTuples):
+        self.overrides[index] = line
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Sequence):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    @property
+    def nbytes(self) -> int:
+        '''
+        the arrays. the text is the document text and counted with it.
+        '''
+        return sum(a.itemsize * len(a) for a in (self.line_starts, self.line_fragments, self.fragment_ends, self.fragment_styles))
+
+
+class LexResult(NamedTuple):
+    # None for a snapshot
+    soup: Optional[bs4.BeautifulSoup]
+    text: str
+    title: str
+    lines: Sequence[prompt_toolkit.formatted_text.StyleAndTextTuples]
+    focus: List[Focus]
+    focus_index: FocusIndex
+
+    def __reduce__(self):
+        if self.soup is None:
+            return (LexResult, tuple(self))
+        # bs4 pickles the soup as markup and parses it again.
+        # keep focus tags as indices into soup.find_all().
+        tag_index = {id(tag): i for i, tag in enumerate(
+            self.soup.find_all(True))}
+        focus = [(type(f), tag_index[id(f.tag)], f.index,
+                  tag_index.get(id(f.form)) if isinstance(f, Input) else None)
+                 for f in self.focus]
+        return (_unpickle_lex_result, (self.soup, self.text, self.title, self.lines, focus, self.focus_index))
+
+
+def _unpickle_lex_result(soup, text, title, lines, focus_state, focus_index) -> LexResult:
+    tags = soup.find_all(True)
+    focus: List[Focus] = []
+    for focus_type, tag, index, form in focus_state:
+        if focus_type is Input:
+            focus.append(Input(tags[tag], index,
+                         tags[form] if form is not None else None))
+        else:
+            focus.append(focus_type(tags[tag], index))
+    return LexResult(soup, text, title, lines, focus, focus_index)
+
+
+# (tag, focus, form) of an enclosing anchor, input or form
+Context = Tuple[bs4.Tag, Optional[Focus], Optional[bs4.Tag]]
+
+
+def _next_element(e: bs4.PageElement, context: List[Context], descend: bool) -> Optional[bs4.PageElement]:
+    '''
+    document order. pop the context of the tags to leave.
+    '''
+    if descend and isinstance(e, bs4.Tag) and e.contents:
+        return e.contents[0]
+    current: Optional[bs4.PageElement] = e
+    while current is not None:
+        if context and context[-1][0] is current:
+            context.pop()
+        if current.next_sibling is not None:
+            return current.next_sibling
+        current = current.parent
+    return None
+
+
+def _input_fragment(focus: Input) -> Tuple[str, str, bool]:
+    '''
+    (style, text, focusable)
+    '''
+    tag = focus.tag
+    match tag.get('type', 'text'):
+        case 'hidden':
+            values = ','.join(f'{k}={v}' for k,
+                              v in tag.attrs.items() if k in INPUT_KEYS)
+            return ('class:input.hidden', f'({values})', False)
+
+        case 'text':
+            name = tag.get('name')
+            value = tag.get('value', '')
+            return ('class:input.text', f'{name}=[{value:20}]', True)
+
+        case 'submit':
+            values = ','.join(f'{k}={v}' for k,
+                              v in tag.attrs.items() if k in INPUT_KEYS)
+            return ('class:input.submit', f'[{values}]', True)
+
+        case _:
+            values = ','.join(f'{k}={v}' for k, v in tag.attrs.items())
+            return ('class:input.unknown', f'({values})', False)
+
+
+class LazyLines:
+    '''
+    lines produced on demand and cached.
+
+    the pre-pass walks the soup in document order to collect the title,
+    the focus list and the start element of each line.
+    it stops as soon as the requested lines are known.
+    each line is lexed from its start until the start of the next line.
+    '''
+
+    def __init__(self, soup: bs4.BeautifulSoup) -> None:
+        self.title = ''
+        self.focus: List[Focus] = []
+        self.focus_map: Dict[int, Focus] = {}
+        self.starts: List[Tuple[bs4.PageElement, Tuple[Context, ...]]] = [
+            (soup, ())]
+        # fragments and focus spans of each line
+        self.cache: Dict[int, Tuple[prompt_toolkit.formatted_text.StyleAndTextTuples, List[FocusSpan]]] = {}
+        # pre-pass position
+        self._next: Optional[bs4.PageElement] = soup
+        self._context: List[Context] = []
+        # the ui thread may read while a worker completes the lines
+        self._lock = threading.Lock()
+
+    @property
+    def is_complete(self) -> bool:
+        return self._next is None
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def _get(self, index: int) -> Tuple[prompt_toolkit.formatted_text.StyleAndTextTuples, List[FocusSpan]]:
+        line = self.cache.get(index)
+        if line is None:
+            with self._lock:
+                self._scan(index + 2)
+                line = self._lex(index)
+            self.cache[index] = line
+        return line
+
+    def __getitem__(self, index: int) -> prompt_toolkit.formatted_text.StyleAndTextTuples:
+        return self._get(index)[0]
+
+    def __setitem__(self, index: int, line: prompt_toolkit.formatted_text.StyleAndTextTuples):
+        '''
+        replace a lexed line. the spans are kept.
+        '''
+        self.cache[index] = (line, self._get(index)[1])
+
+    def focus_index(self, end: Optional[int] = None) -> FocusIndex:
+        if end is None:
+            self.scan()
+            end = len(self)
+        else:
+            self.scan(end + 1)
+            end = min(end, len(self))
+        spans: List[FocusSpan] = []
+        for i in range(end):
+            spans += self._get(i)[1]
+        return FocusIndex(spans)
+
+    def __iter__(self) -> Iterator[prompt_toolkit.formatted_text.StyleAndTextTuples]:
+        self.scan()
+        for i in range(len(self)):
+            yield self[i]
+
+    def __reduce__(self):
+        return (list, (list(self),))
+
+    def compact(self) -> Tuple[CompactLines, FocusIndex]:
+        '''
+        every line and the focus index.
+        a line that is not cached is lexed into the buffer without being kept as a list.
+        '''
+        self.scan()
+        spans: List[FocusSpan] = []
+
+        def lines():
+            for i in range(len(self)):
+                line, line_spans = self.cache.get(i) or self._lex(i)
+                spans.extend(line_spans)
+                yield line
+        return (CompactLines(lines()), FocusIndex(spans))
+
+    def text(self, end: Optional[int] = None) -> str:
+        if end is None:
+            self.scan()
+            end = len(self)
+        else:
+            self.scan(end + 1)
+            end = min(end, len(self))
+        return '\n'.join(''.join(text for _, text in self[i]) for i in range(end))
+
+    def scan(self, line_count: Optional[int] = None):
+        with self._lock:
+            self._scan(line_count)
+
+    def _scan(self, line_count: Optional[int] = None):
+        e = self._next
+        context = self._context
+        while e is not None:
+            if line_count is not None and len(self.starts) >= line_count:
+                break
+            descend = True
+            if isinstance(e, bs4.Tag):
+                current, form = (
+                    context[-1][1], context[-1][2]) if context else (None, None)
+                match e.name:
+                    case 'title':
+                        self.title = e.text
+                    case 'a':
+                        focus = Anchor(e, len(self.focus))
+                        self.focus.append(focus)
+                        self.focus_map[id(e)] = focus
+                        context.append((e, focus, form))
+                    case 'form':
+                        context.append((e, current, e))
+                    case 'input':
+                        focus = Input(e, len(self.focus), form)
+                        self.focus.append(focus)
+                        self.focus_map[id(e)] = focus
+                        context.append((e, focus, form))
+                    case 'p' | 'div':
+                        self.starts.append((e, tuple(context)))
+                    case 'script' | 'style' | 'template':
+                        descend = False
+            e = _next_element(e, context, descend)
+        self._next = e
+
+    def _lex(self, index: int) -> Tuple[prompt_toolkit.formatted_text.StyleAndTextTuples, List[FocusSpan]]:
+        e, snapshot = self.starts[index]
+        stop = self.starts[index + 1][0] if index + 1 < len(self.starts) else None
+        context = list(snapshot)
+        line: prompt_toolkit.formatted_text.StyleAndTextTuples = []
+        spans: List[FocusSpan] = []
+        col = 0
+
+        def push(style: str, text: str, focus: Optional[Focus]):
+            nonlocal col
+            line.append((style, text))
+            end = col + len(text)
+            if focus:
+                if spans and spans[-1].focus_index == focus.index and spans[-1].col_end == col:
+                    spans[-1] = spans[-1]._replace(col_end=end)
+                else:
+                    spans.append(FocusSpan(focus.index, index, col, end))
+            col = end
+
+        while e is not None and e is not stop:
+            current, form = (context[-1][1], context[-1][2]) if context else (None, None)
+            descend = True
+            match e:
+                case bs4.Tag() as tag:
+                    match tag.name:
+                        case 'a':
+                            focus = self.focus_map[id(tag)]
+                            context.append((tag, focus, form))
+                        case 'form':
+                            context.append((tag, current, tag))
+                        case 'input':
+                            focus = self.focus_map[id(tag)]
+                            assert isinstance(focus, Input)
+                            style, text, focusable = _input_fragment(focus)
+                            push(style, text, focus if focusable else None)
+                            context.append((tag, focus, form))
+                        case 'script' | 'style' | 'template':
+                            # not every parser marks these strings
+                            descend = False
+                case bs4.element.NavigableString():
+                    text = e.get_text(strip=True)
+                    if text:
+                        if current:
+                            push(current.style, text, current)
+                        else:
+                            push('', text, None)
+                case _:
+                    t = type(e)
+                    raise RuntimeError(f'unknwon: {t}')
+            e = _next_element(e, context, descend)
+        return (line, spans)
+
+
 class BeautifulSoupLexer(prompt_toolkit.lexers.Lexer):
 
     def __init__(self) -> None:
         super().__init__()
-        self.lines: List[prompt_toolkit.formatted_text.StyleAndTextTuples] = [
+        self.lines: Sequence[prompt_toolkit.formatted_text.StyleAndTextTuples] = [
             [('', '')]]
         self.title = ''
         self.focus: List[Focus] = []
+        self.focus_index = FocusIndex([])
 
     def lex_document(self, document: prompt_toolkit.document.Document) -> Callable[[int], prompt_toolkit.formatted_text.StyleAndTextTuples]:
         return self.get_line
 
     def get_line(self, index: int) -> prompt_toolkit.formatted_text.StyleAndTextTuples:
-        if index>=0 and index<len(self.lines):
+        if index >= 0 and index < len(self.lines):
             return self.lines[index]
-        retrn 
-
-    def push(self, text: str, style: str):
-        self.lines[-1].append((style, text))
-
-    def new_line(self):
-        self.lines.append([])
-
-    def traverse(self, e: bs4.PageElement):
-        match e:
-            case bs4.Tag() as tag:
-                self._process_tag(tag)
-            case bs4.element.NavigableString():
-                style = self._get_style(e)
-                self.push(e.get_text(strip=True), style)
-            case bs4.element.Doctype():
-                pass
-            case _:
-                t = type(e)
-                raise RuntimeError(f'unknwon: {t}')
-
-    def _get_style(self, e: bs4.PageElement) -> str:
-        for tag in e.parents:
-            for f in self.focus:
-                if f.tag == tag:
-                    return f.get_style()
-        return ''
-
-    def _process_tag(self, tag: bs4.Tag):
-        match tag.name:
-            case 'title':
-                self.title = tag.text
-            case 'a':
-                self._push_anchor(tag)
-            case 'form':
-                # style = self._push_form(tag)
-                pass
-            case 'input':
-                self._push_input(tag)
-            case 'p' | 'div':
-                self.new_line()
-        for child in tag.children:
-            self.traverse(child)
-
-    def _push_anchor(self, tag: bs4.Tag):
-        n = len(self.focus)
-        self.focus.append(Anchor(tag, n))
-
-    def _push_input(self, tag: bs4.Tag):
-        n = len(self.focus)
-        form = None
-        for f in tag.parents:
-            if f.name == 'form':
-                form = f
-                break
-
-        self.focus.append(Input(tag, n, form))
-
-        match tag.get('type', 'text'):
-            case 'hidden':
-                values = ','.join(f'{k}={v}' for k,
-                                  v in tag.attrs.items() if k in INPUT_KEYS)
-                self.push(f'({values})', 'class:input.hidden')
+        return []
 
-            case 'text':
-                name = tag.get('name')
-                value = tag.get('value')
-                self.push(f'{name}=[{value:20}]',
-                          f'class:input.text class:_{n}')
+    def lex_html(self, soup: bs4.BeautifulSoup) -> Tuple[str, str]:
+        lines = LazyLines(soup)
+        compact, self.focus_index = lines.compact()
+        self.lines = compact
+        self.title = lines.title
+        self.focus = lines.focus
+        return (compact.text, self.title)
 
-            case 'submit':
-                values = ','.join(f'{k}={v}' for k,
-                                  v in tag.attrs.items() if k in INPUT_KEYS)
-                self.push(f'[{values}]', f'class:input.submit class:_{n}')
+    def lex_result(self, soup: bs4.BeautifulSoup) -> LexResult:
+        text, title = self.lex_html(soup)
+        return LexResult(soup, text, title, self.lines, self.focus, self.focus_index)
 
-            case _:
-                values = ','.join(f'{k}={v}' for k, v in tag.attrs.items())
-                self.push(f'({values})', 'class:input.unknown')
+    def lex_lazy(self, soup: bs4.BeautifulSoup, line_count: int) -> LexResult:
+        '''
+        lines are produced on demand. the text holds the first line_count lines.
+        the focus list grows while the rest is scanned.
+        '''
+        lines = LazyLines(soup)
+        text = lines.text(line_count)
+        self.lines = lines
+        self.title = lines.title
+        self.focus = lines.focus
+        self.focus_index = lines.focus_index(line_count)
+        return LexResult(soup, text, self.title, self.lines, self.focus, self.focus_index)
 
-    def lex_html(self, soup: bs4.BeautifulSoup) -> Tuple[str, str]:
-        self.lines = [[]]
-        self.title = ''
-        for e in soup.children:
-            self.traverse(e)
+    def set_result(self, result: LexResult):
+        self.lines = result.lines
+        self.title = result.title
+        self.focus = result.focus
+        self.focus_index = result.focus_index
 
-        def merge_line(line):
-            return ''.join(text for style, text in line)
-        lines = [merge_line(line) for line in self.lines]
-        return ('\n'.join(lines), self.title)
+    def update_input(self, focus: Input) -> Optional[Tuple[FocusSpan, str]]:
+        '''
+        render an input again after its value changed.
+        only the fragment of the input is replaced and the spans after it on the row move.
+        (the old span, the new text). None if the input is not rendered as a span.
+        '''
+        spans = self.focus_index.spans_of(focus.index)
+        if len(spans) != 1 or spans[0].row >= len(self.lines):
+            return None
+        span = spans[0]
+        style, text, _ = _input_fragment(focus)
+        line = list(self.lines[span.row])
+        col = 0
+        for i, (_, fragment_text, *_) in enumerate(line):
+            if col == span.col_start and len(fragment_text) == span.col_end - span.col_start:
+                line[i] = (style, text)
+                break
+            col += len(fragment_text)
+        else:
+            return None
+        self.lines[span.row] = line  # type: ignore
+        self.focus_index = self.focus_index.resize(
+            span, span.col_start + len(text))
+        return (span, text)
@@ -0,0 +1,145 @@
+from typing import List, Optional, Tuple, TYPE_CHECKING
+import collections
+import logging
+import sys
+if TYPE_CHECKING:
+    from .beautifulsoup_lexer import LexResult
+
+logger = logging.getLogger(__name__)
+
+# rough per object costs. the soup dominates and is not walked.
+FRAGMENT_BYTES = 64
+FOCUS_BYTES = 512
+SOUP_FACTOR = 8
+
+
+def estimate_size(result: 'LexResult') -> int:
+    # CompactLines knows the size of its arrays
+    fragment_bytes = getattr(result.lines, 'nbytes', None)
+    if fragment_bytes is None:
+        fragment_bytes = sum(len(line) for line in result.lines) * FRAGMENT_BYTES
+    text = sys.getsizeof(result.text)
+    return text * (1 + SOUP_FACTOR) + fragment_bytes + len(result.focus) * FOCUS_BYTES
+
+
+class HistoryEntry:
+    def __init__(self, url: str) -> None:
+        self.url = url
+        self.cursor_position = 0
+
+    def __repr__(self) -> str:
+        return f'HistoryEntry({self.url})'
+
+
+class Documents:
+    '''
+    the rendered documents of the histories. a LRU bounded by the estimated size.
+    the histories of the tabs share one.
+    '''
+
+    def __init__(self, max_bytes: int = 128 * 1024 * 1024) -> None:
+        self.max_bytes = max_bytes
+        self.documents: collections.OrderedDict[HistoryEntry, Tuple['LexResult', int]] = collections.OrderedDict(
+        )
+        self.total_bytes = 0
+
+    def get(self, entry: HistoryEntry) -> Optional['LexResult']:
+        document = self.documents.get(entry)
+        if not document:
+            return None
+        self.documents.move_to_end(entry)
+        return document[0]
+
+    def store(self, entry: HistoryEntry, result: 'LexResult'):
+        self.drop(entry)
+        size = estimate_size(result)
+        self.documents[entry] = (result, size)
+        self.total_bytes += size
+        while self.total_bytes > self.max_bytes and len(self.documents) > 1:
+            evicted = next(iter(self.documents))
+            logger.debug(f'evict: {evicted}')
+            self.drop(evicted)
+
+    def drop(self, entry: HistoryEntry):
+        if entry in self.documents:
+            _, size = self.documents.pop(entry)
+            self.total_bytes -= size
+
+
+class History:
+    '''
+    back/forward list. an entry evicted from the documents is fetched again.
+    '''
+
+    def __init__(self, max_bytes: int = 128 * 1024 * 1024, documents: Optional[Documents] = None) -> None:
+        self.documents = documents or Documents(max_bytes)
+        self.entries: List[HistoryEntry] = []
+        self.index = -1
+        # index of the entry that is fetched again
+        self.pending: Optional[int] = None
+
+    @property
+    def current(self) -> Optional[HistoryEntry]:
+        if self.index < 0:
+            return None
+        return self.entries[self.index]
+
+    def save_cursor(self, cursor_position: int):
+        current = self.current
+        if current:
+            current.cursor_position = cursor_position
+
+    def visit(self, url: str, result: 'LexResult') -> Tuple[HistoryEntry, bool]:
+        '''
+        a document arrived. complete a pending back/forward or push a new entry.
+        True if a back/forward is completed. the cursor of the entry is restored then.
+        '''
+        pending = self.pending
+        self.pending = None
+        moved = pending is not None and self.entries[pending].url == url
+        if moved:
+            self.index = pending  # type: ignore
+        else:
+            for entry in self.entries[self.index+1:]:
+                self.documents.drop(entry)
+            del self.entries[self.index+1:]
+            self.entries.append(HistoryEntry(url))
+            self.index = len(self.entries) - 1
+        entry = self.entries[self.index]
+        self.documents.store(entry, result)
+        return entry, moved
+
+    def update(self, result: 'LexResult'):
+        '''
+        the current document is lexed again.
+        '''
+        current = self.current
+        if current:
+            self.documents.store(current, result)
+
+    def go(self, delta: int) -> Optional[Tuple[HistoryEntry, Optional['LexResult']]]:
+        '''
+        move to the entry. the document is None if it is evicted,
+        then the caller fetches it and visit() completes the move.
+        '''
+        index = self.index + delta
+        if index < 0 or index >= len(self.entries):
+            return None
+        entry = self.entries[index]
+        document = self.documents.get(entry)
+        if document:
+            self.index = index
+            self.pending = None
+            return (entry, document)
+        self.pending = index
+        return (entry, None)
+
+    def clear(self):
+        '''
+        the tab is closed.
+        '''
+        for entry in self.entries:
+            self.documents.drop(entry)
+        self.entries.clear()
+        self.index = -1
+        self.pending = None
@@ -0,0 +1,100 @@
+'''
+the status of the checked links after each anchor. see linkcheck.
+'''
+from typing import Dict, List, Optional, Tuple, TYPE_CHECKING
+import bisect
+import prompt_toolkit.formatted_text
+import prompt_toolkit.layout.processors
+if TYPE_CHECKING:
+    from .beautifulsoup_lexer import BeautifulSoupLexer
+    from ..linkcheck import LinkStatus
+
+
+def insert_fragment(fragments: prompt_toolkit.formatted_text.StyleAndTextTuples, position: int, style: str, text: str) -> prompt_toolkit.formatted_text.StyleAndTextTuples:
+    '''
+    insert (style, text) before the character at position.
+    '''
+    result: prompt_toolkit.formatted_text.StyleAndTextTuples = []
+    col = 0
+    inserted = False
+    for fragment in fragments:
+        fragment_style, fragment_text, *rest = fragment
+        size = len(fragment_text)
+        if not inserted and position < col + size:
+            s = position - col
+            if s > 0:
+                result.append((fragment_style, fragment_text[:s], *rest))  # type: ignore
+            result.append((style, text))
+            result.append((fragment_style, fragment_text[s:], *rest))  # type: ignore
+            inserted = True
+        else:
+            result.append(fragment)
+        col += size
+    if not inserted:
+        result.append((style, text))
+    return result
+
+
+class LinkStatusProcessor(prompt_toolkit.layout.processors.Processor):
+    '''
+    [status] after the last span of each checked anchor.
+    the inserted text moves the later columns of the line.
+    '''
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.lexer: Optional['BeautifulSoupLexer'] = None
+        # focus index: url
+        self.urls: Dict[int, str] = {}
+        # url: status
+        self.results: Dict[str, 'LinkStatus'] = {}
+
+    def clear(self):
+        self.urls = {}
+        self.results = {}
+
+    def get_status(self, focus_index: int) -> Optional['LinkStatus']:
+        url = self.urls.get(focus_index)
+        return self.results.get(url) if url else None
+
+    def apply_transformation(
+        self, transformation_input: prompt_toolkit.layout.processors.
+        TransformationInput
+    ) -> prompt_toolkit.layout.processors.Transformation:
+        fragments = transformation_input.fragments
+        if not self.lexer or not self.results:
+            return prompt_toolkit.layout.processors.Transformation(fragments)
+        source_to_display = transformation_input.source_to_display
+        focus_index = self.lexer.focus_index
+        # (position, size) in the order of the line
+        inserts: List[Tuple[int, int]] = []
+        for span in focus_index.rows(transformation_input.lineno, transformation_input.lineno):
+            status = self.get_status(span.focus_index)
+            if not status or focus_index.spans_of(span.focus_index)[-1] != span:
+                continue
+            text = f'[{status.label}]'
+            position = source_to_display(span.col_end)
+            shift = sum(size for _, size in inserts)
+            fragments = insert_fragment(
+                fragments, position + shift, f'class:link.{status.kind}', text)
+            inserts.append((position, len(text)))
+        if not inserts:
+            return prompt_toolkit.layout.processors.Transformation(fragments)
+
+        positions = [position for position, _ in inserts]
+
+        def to_display(i: int) -> int:
+            return i + sum(size for _, size in inserts[:bisect.bisect_right(positions, i)])
+
+        def to_source(i: int) -> int:
+            shift = 0
+            for position, size in inserts:
+                if i < position + shift:
+                    break
+                if i < position + shift + size:
+                    # in the status
+                    return position
+                shift += size
+            return i - shift
+
+        return prompt_toolkit.layout.processors.Transformation(fragments, to_display, to_source)
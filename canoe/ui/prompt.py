@@ -1,5 +1,4 @@
-from typing import Callable, cast
-import bs4
+from typing import Callable, Optional
 from prompt_toolkit.application.current import get_app
 import prompt_toolkit.layout.containers
 import prompt_toolkit.layout.controls
@@ -97,5 +96,69 @@ class InputPrompt(prompt_toolkit.layout.containers.ConditionalContainer):
         command.tag['value'] = text
         get_app().layout.focus_last()
 
-        soup = cast(bs4.BeautifulSoup, [p for p in command.tag.parents][-1])
-        event.enqueue(event.UpdateSoup(command.url, soup))
+        event.enqueue(event.UpdateInput(command.url, command.tag, command.tab))
+
+
+class SearchPrompt(prompt_toolkit.layout.containers.ConditionalContainer):
+    '''
+    /query. on_change follows the typing. escape cancels.
+    '''
+
+    def __init__(self) -> None:
+        # the matches of the query
+        self.count: Optional[int] = None
+
+        self.buffer = prompt_toolkit.buffer.Buffer(name="Search",
+                                                   accept_handler=self._accept,
+                                                   on_text_changed=self._changed,
+                                                   multiline=False,
+                                                   )
+
+        kb = prompt_toolkit.key_binding.KeyBindings()
+        kb.add('escape', eager=True)(self._cancel)
+        kb.add('c-c')(self._cancel)
+
+        self.control = prompt_toolkit.layout.controls.BufferControl(
+            buffer=self.buffer,
+            lexer=prompt_toolkit.lexers.SimpleLexer(
+                style="class:system-toolbar.text"),
+            input_processors=[
+                prompt_toolkit.layout.processors.BeforeInput(
+                    "/", style="class:system-toolbar"),
+                prompt_toolkit.layout.processors.AfterInput(
+                    self._get_count, style="class:system-toolbar"),
+            ],
+            key_bindings=kb,
+        )
+
+        super().__init__(
+            content=prompt_toolkit.layout.containers.Window(
+                self.control, height=1,
+            ),
+            filter=prompt_toolkit.filters.has_focus(self.buffer),
+        )
+
+        self.on_change = event.Event[str]()
+        self.on_cancel = event.Event[str]()
+
+    def _get_count(self) -> str:
+        if self.count is None or not self.buffer.text:
+            return ''
+        return f'  ({self.count} matches)'
+
+    def _changed(self, buffer: prompt_toolkit.buffer.Buffer):
+        self.on_change(buffer.text)
+
+    def _accept(self, buffer: prompt_toolkit.buffer.Buffer) -> bool:
+        get_app().layout.focus_last()
+        # keep the query for the next search
+        return True
+
+    def _cancel(self, e: prompt_toolkit.key_binding.KeyPressEvent):
+        self.on_cancel(self.buffer.text)
+        e.app.layout.focus_last()
+
+    def focus(self, e: prompt_toolkit.key_binding.KeyPressEvent):
+        self.count = None
+        self.buffer.reset()
+        e.app.layout.focus(self.buffer)
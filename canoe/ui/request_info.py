@@ -1,8 +1,17 @@
 import io
+import collections
+import itertools
 import prompt_toolkit.layout
 import prompt_toolkit.buffer
-import aiohttp
+import prompt_toolkit.formatted_text
+from typing import Union, Dict, List, Optional, Deque, TYPE_CHECKING
 import logging
+from ..timing import NavigationTiming
+if TYPE_CHECKING:
+    import aiohttp
+    from ..cache import CacheEntry
+    from ..prefetch import Prefetched
+    from ..limits import BodyReader
 
 
 class RequestInfo:
@@ -17,6 +26,10 @@ class RequestInfo:
         return self.container
 
     def set_url(self, url: str):
+        if not url:
+            # a new tab
+            self.text = ''
+            return
         text = []
         text.append(('reverse', 'GET'))
         # text.append(('', url))
@@ -26,31 +39,123 @@ class RequestInfo:
 class ResponseInfo:
     def __init__(self) -> None:
         self.text = ''
+        self.timing: Optional[NavigationTiming] = None
+        self.show_timing = False
         self.control = prompt_toolkit.layout.controls.FormattedTextControl(
-            lambda: self.text)
+            self.get_text)
         self.container = prompt_toolkit.layout.containers.Window(self.control)
 
     def __pt_container__(self) -> prompt_toolkit.layout.containers.Container:
         return self.container
 
-    def set_response(self, response: aiohttp.ClientResponse):
+    def set_response(self, response: Union['aiohttp.ClientResponse', 'CacheEntry', 'Prefetched']):
+        from ..cache import CacheEntry
+        from ..prefetch import Prefetched
         text = []
         height = 1
-        text.append(('reverse', f'{response.status}\n'))
+        if isinstance(response, Prefetched):
+            text.append(('reverse', f'{response.status} (prefetch)\n'))
+        elif isinstance(response, CacheEntry):
+            text.append(('reverse', f'{response.status} (cache)\n'))
+        else:
+            text.append(('reverse', f'{response.status}\n'))
         # for key in response.headers.keys():
         #     v = response.headers[key]
         #     text.append(('', f'{key}: {v}\n'))
         #     height += 1
+        if self.show_timing:
+            height += 1
         self.container.height = height
         self.text = text
+        self.timing = None
+
+    def set_truncated(self, reader: 'BodyReader'):
+        '''
+        the page is the part received before a limit.
+        '''
+        self.text = [*self.text, ('class:truncated', f'{reader}\n')]
+        self.container.height = (self.container.height or 1) + 1
+
+    def set_timing(self, timing: NavigationTiming):
+        self.timing = timing
+
+    def toggle_timing(self):
+        self.show_timing = not self.show_timing
+        height = self.container.height or 1
+        self.container.height = height + 1 if self.show_timing else height - 1
+
+    def get_text(self):
+        if self.show_timing:
+            timing = str(self.timing) if self.timing else 'loading'
+            return [*self.text, ('', f'{timing}\n')]
+        return self.text
+
+
+def parse_levels(values: List[str]) -> Dict[str, int]:
+    '''
+    ['INFO', 'canoe.event=WARNING'] => {'': INFO, 'canoe.event': WARNING}
+    '''
+    levels = {}
+    for value in values:
+        name, sep, level = value.rpartition('=')
+        levelno = logging.getLevelName(level.upper())
+        if not isinstance(levelno, int):
+            raise ValueError(f'unknown level: {level}')
+        levels[name if sep else ''] = levelno
+    return levels
+
+
+class LevelFilter(logging.Filter):
+    '''
+    the level of the most specific logger name in levels applies.
+    '''
+
+    def __init__(self, levels: Dict[str, int]) -> None:
+        super().__init__()
+        self.levels = levels
+        self._cache: Dict[str, int] = {}
+
+    def get_level(self, name: str) -> int:
+        level = self._cache.get(name)
+        if level is None:
+            key = name
+            while key not in self.levels and key:
+                key = key.rpartition('.')[0]
+            level = self.levels.get(key, logging.NOTSET)
+            self._cache[name] = level
+        return level
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= self.get_level(record.name)
+
+
+# the args kept as they are. they do not keep a large object alive
+SCALAR_TYPES = (str, int, float, bool, type(None))
 
 
 class Logger(logging.Handler):
-    def __init__(self, height=6) -> None:
+    '''
+    keep the last capacity records. only the visible ones are formatted,
+    once for each new record.
+
+    a kept record has the msg and the args to format later, if the args are scalars.
+    other args and the exc_info would keep the logged objects, a payload with its soup,
+    alive. the message of such a record is formatted when it arrives.
+    '''
+
+    def __init__(self, height=6, capacity=1000, levels: Optional[Dict[str, int]] = None) -> None:
         super().__init__()
-        self.text = []
+        self.height = height
+        self.records: Deque[logging.LogRecord] = collections.deque(
+            maxlen=capacity)
+        # emitted in total
+        self.count = 0
+        self._count = -1
+        self._text: prompt_toolkit.formatted_text.StyleAndTextTuples = []
+        if levels:
+            self.addFilter(LevelFilter(levels))
         self.control = prompt_toolkit.layout.controls.FormattedTextControl(
-            lambda: self.text)
+            self.get_text)
         self.container = prompt_toolkit.layout.containers.Window(
             self.control, height=height)
         self.register_root()
@@ -59,16 +164,57 @@ class Logger(logging.Handler):
         return self.container
 
     def emit(self, record: logging.LogRecord):
-        msg = self.format(record)
-        match record.levelno:
-            case 0:
-                style = '#888888'
-            case _:
-                style = ''
-        self.text.append((style, msg+'\n'))
+        # under the handler lock
+        msg, args = record.msg, record.args
+        if not isinstance(msg, str) or (args and not (
+                isinstance(args, tuple) and all(isinstance(arg, SCALAR_TYPES) for arg in args))):
+            msg, args = record.getMessage(), None
+        kept = logging.makeLogRecord({
+            'name': record.name,
+            'levelno': record.levelno,
+            'levelname': record.levelname,
+            'created': record.created,
+            'msg': msg,
+            'args': args,
+        })
+        if record.exc_info:
+            kept.exc_text = logging.Formatter().formatException(record.exc_info)
+        self.records.append(kept)
+        self.count += 1
+
+    def get_text(self) -> prompt_toolkit.formatted_text.StyleAndTextTuples:
+        if self._count != self.count:
+            with self.lock:  # type: ignore
+                self._count = self.count
+                start = max(len(self.records) - self.height, 0)
+                visible = list(itertools.islice(
+                    self.records, start, None))
+            text = []
+            for record in visible:
+                match record.levelno:
+                    case 0:
+                        style = '#888888'
+                    case _:
+                        style = ''
+                text.append((style, self.format(record)+'\n'))
+            self._text = text
+        return self._text
 
     def write(self, m):
         pass
 
     def register_root(self):
         logging.getLogger().handlers = [self]
+
+    def spill(self, path: str, max_bytes: int = 1024 * 1024, backup_count: int = 3):
+        '''
+        also write the records to a rotating file.
+        '''
+        import logging.handlers
+        handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+        handler.setFormatter(logging.Formatter(
+            '%(asctime)s %(levelname)s %(name)s: %(message)s'))
+        for f in self.filters:
+            handler.addFilter(f)
+        logging.getLogger().addHandler(handler)
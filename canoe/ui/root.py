@@ -1,5 +1,6 @@
-from typing import Callable, Union, Coroutine, Any, Optional
-import bs4
+from typing import Callable, Union, Coroutine, Any, Dict, Optional, Tuple, TYPE_CHECKING
+import logging
+import time
 import prompt_toolkit.application
 import prompt_toolkit.styles
 import prompt_toolkit.layout
@@ -15,15 +16,46 @@ import prompt_toolkit.keys
 import prompt_toolkit.cursor_shapes
 from prompt_toolkit.layout.dimension import LayoutDimension as D
 from .. import event
+from ..timing import NavigationTiming
+from .request_info import Logger
+if TYPE_CHECKING:
+    from ..client import Client
+    from ..worker import WorkerPool
+    from .tab import Tab
+    from .view_window import ViewWindow
+    from .history import History
+    from .request_info import ResponseInfo
 
+logger = logging.getLogger(__name__)
 
 class Root:
-    def __init__(self) -> None:
+    '''
+    the layout is built without the client, so the first frame does not wait for
+    aiohttp and bs4. attach the client when it is ready.
 
-        from ..client import Client
-        self.client = Client()
+    view, history and response are of the current tab.
+    '''
+
+    def __init__(self, history_bytes: int = 128 * 1024 * 1024, logger: Optional[Logger] = None) -> None:
+        self.logger = logger or Logger()
+
+        self.client: Optional['Client'] = None
+        self.pool: Optional['WorkerPool'] = None
+
+        from .history import Documents
+        # the back/forward documents of all tabs
+        self.documents = Documents(history_bytes)
+        # in the order of the tab bar
+        self.tabs: Dict[int, 'Tab'] = {}
+        self._next_tab = 0
+        self.tab = self._new_tab()
+        # the document waiting for the render
+        self._painting: Optional[Tuple['Tab', NavigationTiming, float]] = None
 
         self.key_bindings = prompt_toolkit.key_binding.KeyBindings()
+        from prompt_toolkit.application.current import get_app
+        self.view_has_focus = prompt_toolkit.filters.Condition(
+            lambda: get_app().layout.current_buffer is self.view.buffer)
         browser_layout = self._browser_layout()
 
         self.root = prompt_toolkit.layout.containers.FloatContainer(
@@ -51,15 +83,244 @@ class Root:
                 self.root, focused_element=self.view.container),
             full_screen=True,
             style=CLIENT_STYLE,
-            key_bindings=self.key_bindings,
+            key_bindings=prompt_toolkit.key_binding.merge_key_bindings([
+                self.key_bindings,
+                prompt_toolkit.key_binding.DynamicKeyBindings(
+                    lambda: self.tab.key_bindings),
+            ]),
             # editing_mode=prompt_toolkit.enums.EditingMode.VI,
             enable_page_navigation_bindings=False,
             cursor=prompt_toolkit.cursor_shapes.CursorShape.BLOCK,
         )
 
-        self.view._keybind(self.quit_prompt, 'q')
+        self._keybind(self.quit_prompt, 'q')
         # shift-tab
-        self.view._keybind(self.address_bar.focus, 'U')
+        self._keybind(self.address_bar.focus, 'U')
+        self._keybind(self.back, 'B')
+        self._keybind(self.forward, 'F')
+        self._keybind(self.toggle_timing, 'T')
+        self._keybind(self.search, '/')
+        self._keybind(self.open_tab, 't')
+        self._keybind(self.next_tab, ']')
+        self._keybind(self.prev_tab, '[')
+        self._keybind(self.close_tab, 'x')
+        self._keybind(self.check_links, 'L')
+
+        def on_paint(app):
+            if self._painting:
+                tab, timing, start = self._painting
+                self._painting = None
+                timing.add('paint', time.perf_counter() - start)
+                self._finish(tab, timing)
+        self.application.after_render += on_paint
+
+    @property
+    def view(self) -> 'ViewWindow':
+        return self.tab.view
+
+    @property
+    def history(self) -> 'History':
+        return self.tab.history
+
+    @property
+    def response(self) -> 'ResponseInfo':
+        return self.tab.response
+
+    def _keybind(self, callback, *args):
+        self.key_bindings.add(*args, filter=self.view_has_focus,
+                              eager=True)(callback)
+
+    def _new_tab(self) -> 'Tab':
+        from .tab import Tab
+        tab = Tab(self._next_tab, self.documents)
+        self._next_tab += 1
+        tab.view.on_buffer_callbacks.append(self._on_buffer_changed)
+        if self.tabs and self.response.show_timing:
+            tab.response.toggle_timing()
+        self.tabs[tab.id] = tab
+        return tab
+
+    def _switch(self, tab: 'Tab'):
+        '''
+        the containers of the tab are shown as they are.
+        '''
+        self.tab = tab
+        self.tab_bar.current = tab.id
+        self.title_bar.text = tab.title
+        self.address_bar.set_text(tab.url)
+        self.request.set_url(tab.url)
+        self._on_buffer_changed(tab.view.buffer)
+        self.application.layout.focus(tab.view.buffer)
+
+    def _finish(self, tab: 'Tab', timing: NavigationTiming):
+        timing.finish()
+        tab.response.set_timing(timing)
+        if self.client:
+            self.client.on_timing(timing)
+
+    def _on_buffer_changed(self, buffer: prompt_toolkit.buffer.Buffer):
+        if buffer is not self.view.buffer:
+            return
+        doc = buffer.document
+        self.status_bar.row = doc.cursor_position_row + 1
+        self.status_bar.col = doc.cursor_position_col + 1
+        self.status_bar.lines = len(doc.lines)
+
+    def attach(self, client: 'Client'):
+        self.client = client
+        self.pool = client.pool
+
+        client.get_viewport_height = lambda: self.view.get_height()
+
+        def on_partial(payload: event.UpdateDocument):
+            tab = self.tabs.get(payload.tab)
+            if not tab or event.is_stale(payload):
+                return
+            tab.title = tab.view.set_lex_result(payload.url, payload.result)
+            if not tab.partial:
+                # the first part. not the position in the page left
+                tab.partial = True
+                tab.view.set_cursor_position(0)
+            if tab is self.tab:
+                self.title_bar.text = tab.title
+            if payload.timing:
+                payload.timing.mark('partial')
+        client.on_partial.bind(on_partial)
+
+        def on_request(command: event.OpenCommand):
+            tab = self.tabs.get(command.tab)
+            if not tab:
+                return
+            # leave the current page. a partial one is not in the history yet
+            if not tab.partial:
+                tab.history.save_cursor(tab.view.buffer.cursor_position)
+            tab.partial = False
+            tab.url = command.url
+            tab.loading = True
+            if tab is self.tab:
+                self.address_bar.set_text(command.url)
+                self.request.set_url(command.url)
+            self.application.invalidate()
+        client.on_request.bind(on_request)
+
+        def on_response(value):
+            tab = self.tabs.get(value[0])
+            if tab:
+                tab.response.set_response(value[1])
+        client.on_response.bind(on_response)
+
+        def on_truncated(value):
+            tab = self.tabs.get(value[0])
+            if tab:
+                tab.response.set_truncated(value[1])
+        client.on_truncated.bind(on_truncated)
+
+        def on_link_status(value):
+            tab_id, url, status = value
+            tab = self.tabs.get(tab_id)
+            # the check of a page left
+            if tab and tab.view.url == url:
+                tab.view.links.results[status.url] = status
+                if tab is self.tab:
+                    self.application.invalidate()
+        client.on_link_status.bind(on_link_status)
+
+        self.status_bar.prefetcher = client.prefetcher
+        self.status_bar.connection = client.connection_stats
+
+        if client.prefetcher:
+            prefetcher = client.prefetcher
+
+            def on_render(app):
+                # the hover and the visible lines are fresh after a render
+                if self.view.url:
+                    prefetcher.request(self.view.get_prefetch_urls())
+            self.application.after_render += on_render
+        self.application.invalidate()
+
+    def search(self, e: prompt_toolkit.key_binding.KeyPressEvent):
+        self._search_origin = self.view.buffer.cursor_position
+        self._search_prompt.focus(e)
+
+    def toggle_timing(self, e: prompt_toolkit.key_binding.KeyPressEvent):
+        for tab in self.tabs.values():
+            tab.response.toggle_timing()
+
+    def open_tab(self, e: prompt_toolkit.key_binding.KeyPressEvent):
+        '''
+        open the anchor under the cursor in a new tab. it loads in the background.
+        no tab for a link that can not be opened.
+        '''
+        url = self.view.get_href_under_cursor()
+        if url:
+            tab = self._new_tab()
+            event.enqueue(event.OpenCommand(
+                'GET', url, tab.id, event.navigate(tab.id)))
+
+    def check_links(self, e: prompt_toolkit.key_binding.KeyPressEvent):
+        '''
+        the status of each link is shown after it as it is checked.
+        '''
+        urls = self.view.get_link_urls()
+        if urls and self.view.url:
+            self.view.links.clear()
+            self.view.links.urls = urls
+            event.enqueue(event.CheckLinksCommand(
+                self.view.url, list(urls.values()), self.tab.id))
+
+    def next_tab(self, e: prompt_toolkit.key_binding.KeyPressEvent):
+        self._switch_by(1)
+
+    def prev_tab(self, e: prompt_toolkit.key_binding.KeyPressEvent):
+        self._switch_by(-1)
+
+    def _switch_by(self, delta: int):
+        tabs = list(self.tabs.values())
+        self._switch(tabs[(tabs.index(self.tab) + delta) % len(tabs)])
+
+    def close_tab(self, e: prompt_toolkit.key_binding.KeyPressEvent):
+        '''
+        the last tab stays. the load and the link check of the tab are cancelled.
+        '''
+        if len(self.tabs) < 2:
+            return
+        tabs = list(self.tabs.values())
+        index = tabs.index(self.tab)
+        del self.tabs[self.tab.id]
+        event.cancel(event.OpenCommand, self.tab.id)
+        event.cancel(event.CheckLinksCommand, self.tab.id)
+        self.tab.history.clear()
+        if self._painting and self._painting[0] is self.tab:
+            self._painting = None
+        self._switch(tabs[index + 1] if index + 1 < len(tabs) else tabs[index - 1])
+
+    def back(self, e: prompt_toolkit.key_binding.KeyPressEvent):
+        self._go(-1)
+
+    def forward(self, e: prompt_toolkit.key_binding.KeyPressEvent):
+        self._go(1)
+
+    def _go(self, delta: int):
+        tab = self.tab
+        if not tab.partial:
+            tab.history.save_cursor(tab.view.buffer.cursor_position)
+        match tab.history.go(delta):
+            case entry, None:
+                # evicted
+                event.enqueue(event.OpenCommand(
+                    'GET', entry.url, tab.id, event.navigate(tab.id)))
+            case entry, result:
+                # the load and the links of the page left
+                event.navigate(tab.id)
+                event.cancel(event.OpenCommand, tab.id)
+                event.cancel(event.CheckLinksCommand, tab.id)
+                tab.loading = False
+                tab.partial = False
+                tab.url = entry.url
+                self.address_bar.set_text(entry.url)
+                tab.title = tab.view.set_lex_result(entry.url, result)
+                self.title_bar.text = tab.title
+                tab.view.set_cursor_position(entry.cursor_position)
 
     def quit_prompt(self, event: prompt_toolkit.key_binding.KeyPressEvent):
         " Quit. "
@@ -72,6 +333,7 @@ class Root:
 
     def _browser_layout(self) -> prompt_toolkit.layout.containers.Container:
         '''
+        [tabs] # more than one
         [title]
         [address] # reverse
         [content]
@@ -80,55 +342,112 @@ class Root:
         '''
         from .address_bar import AddressBar
         self.address_bar = AddressBar(self.key_bindings, style="class:status")
-        self.client.on_request.bind(self.address_bar.set_text)
+        self.address_bar.get_tab = lambda: self.tab.id
 
-        from .view_window import ViewWindow
-        self.view = ViewWindow(self.key_bindings)
+        from .tab import TabBar
+        self.tab_bar = TabBar(self.tabs)
 
         from .bar import Bar
         self.title_bar = Bar()
 
-        def on_soup(payload: event.UpdateSoup):
-            title = self.view.set_html_soup(payload.url, payload.soup)
-            self.title_bar.text = title
+        async def on_soup(payload: event.UpdateSoup):
+            assert self.pool
+            result = await self.pool.lex_soup_async(payload.soup)
+            tab = self.tabs.get(payload.tab)
+            if not tab:
+                return
+            tab.title = tab.view.set_lex_result(payload.url, result)
+            if tab is self.tab:
+                self.title_bar.text = tab.title
+            tab.history.update(result)
         event.register(event.UpdateSoup, on_soup)
 
-        from .status_bar import StatusBar
+        def on_input(payload: event.UpdateInput):
+            tab = self.tabs.get(payload.tab)
+            if not tab:
+                return
+            if payload.url == tab.view.url and tab.view.update_input(payload.tag):
+                tab.history.update(tab.view.get_lex_result())
+            elif tab.view.soup is None:
+                # a snapshot. the root of its tag is the form, not the page
+                logger.warning(f'input not updated: {payload.url}')
+            else:
+                # not rendered as a span. lex the whole soup again
+                parents = list(payload.tag.parents)
+                if parents:
+                    event.enqueue(event.UpdateSoup(
+                        payload.url, parents[-1], payload.tab))  # type: ignore
+        event.register(event.UpdateInput, on_input)
 
-        self.status_bar = StatusBar()
+        def on_document(payload: event.UpdateDocument):
+            tab = self.tabs.get(payload.tab)
+            if not tab:
+                # closed
+                return
+            if event.is_stale(payload):
+                # queued before the next navigation
+                return
+            # the links of the page left
+            event.cancel(event.CheckLinksCommand, tab.id)
+            timing = payload.timing
+            start = time.perf_counter()
+            tab.title = tab.view.set_lex_result(payload.url, payload.result)
+            tab.loading = False
+            entry, moved = tab.history.visit(payload.url, payload.result)
+            if moved or not tab.partial:
+                tab.view.set_cursor_position(entry.cursor_position)
+            # else the position moved in the partial document
+            tab.partial = False
+            if tab is self.tab:
+                self.title_bar.text = tab.title
+            if timing:
+                applied = time.perf_counter()
+                timing.add('apply', applied - start)
+                if tab is self.tab:
+                    # paint starts after apply
+                    self._painting = (tab, timing, applied)
+                else:
+                    # painted on a switch. not a part of the navigation
+                    self._finish(tab, timing)
+            self.application.invalidate()
+        event.register(event.UpdateDocument, on_document)
 
-        def on_buffer_changed(buffer: prompt_toolkit.buffer.Buffer):
-            doc = buffer.document
-            self.status_bar.row = doc.cursor_position_row + 1
-            self.status_bar.col = doc.cursor_position_col + 1
-            self.status_bar.lines = len(doc.lines)
-        self.view.on_buffer_callbacks.append(on_buffer_changed)
+        from .status_bar import StatusBar
+        self.status_bar = StatusBar()
 
-        from .prompt import YesNoPrompt, InputPrompt
+        from .prompt import YesNoPrompt, InputPrompt, SearchPrompt
         self._quit_prompt = YesNoPrompt()
         self._input_prompt = InputPrompt()
 
-        from .request_info import RequestInfo, ResponseInfo, Logger
+        self._search_origin = 0
+        self._search_prompt = SearchPrompt()
 
-        self.request = RequestInfo()
-        self.client.on_request.bind(self.request.set_url)
+        def on_search(query: str):
+            self._search_prompt.count = self.view.find(
+                query, self._search_origin)
+        self._search_prompt.on_change.bind(on_search)
+        self._search_prompt.on_cancel.bind(
+            lambda _: self.view.find('', self._search_origin))
 
-        self.response = ResponseInfo()
-        self.client.on_response.bind(self.response.set_response)
+        from .request_info import RequestInfo
 
-        self.logger = Logger()
+        self.request = RequestInfo()
 
         splitter = prompt_toolkit.layout.containers.HSplit(
             [
+                self.tab_bar,
                 self.title_bar,
                 self.address_bar,
                 self.request,
-                self.response,
-                self.view,
+                prompt_toolkit.layout.containers.DynamicContainer(
+                    lambda: self.tab.response),
+                prompt_toolkit.layout.containers.DynamicContainer(
+                    lambda: self.tab.view),
                 self.status_bar,
                 self.logger,
                 self._quit_prompt,
                 self._input_prompt,
+                self._search_prompt,
             ]
         )
 
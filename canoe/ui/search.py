@@ -0,0 +1,108 @@
+'''
+in-page search.
+
+the index is built once per document from the text of the lexer:
+the case folded text and the start of each line.
+a match is looked up with str.find on the folded text, so the scan runs in C
+and nothing is kept per match. only the visible lines are searched for the highlight.
+'''
+from typing import List, Optional, Tuple
+import bisect
+import itertools
+import prompt_toolkit.layout.processors
+from .hover_processor import style_range
+
+SEARCH_STYLE = ' class:search'
+
+
+def fold(text: str) -> str:
+    '''
+    lower case of the same length, so the offsets stay.
+    '''
+    folded = text.lower()
+    if len(folded) != len(text):
+        folded = ''.join(c.lower() if len(c.lower()) == 1 else c for c in text)
+    return folded
+
+
+class SearchIndex:
+    def __init__(self, text: str) -> None:
+        self.text = fold(text)
+        lines = self.text.split('\n')
+        # the start of each line and the end of the text
+        self.line_starts: List[int] = list(itertools.accumulate(
+            map((1).__add__, map(len, lines)), initial=0))
+        self.line_starts[-1] = len(self.text)
+
+    def __len__(self) -> int:
+        return len(self.line_starts) - 1
+
+    def row_col(self, offset: int) -> Tuple[int, int]:
+        row = bisect.bisect_right(self.line_starts, offset, hi=len(self)) - 1
+        return (row, offset - self.line_starts[row])
+
+    def count(self, query: str) -> int:
+        return self.text.count(fold(query)) if query else 0
+
+    def next(self, query: str, offset: int) -> Optional[int]:
+        '''
+        the first match at or after offset. wraps around.
+        '''
+        if not query:
+            return None
+        query = fold(query)
+        i = self.text.find(query, offset)
+        if i < 0:
+            i = self.text.find(query)
+        return i if i >= 0 else None
+
+    def prev(self, query: str, offset: int) -> Optional[int]:
+        '''
+        the last match before offset. wraps around.
+        '''
+        if not query:
+            return None
+        query = fold(query)
+        i = self.text.rfind(query, 0, offset + len(query) - 1)
+        if i < 0:
+            i = self.text.rfind(query)
+        return i if i >= 0 else None
+
+    def matches(self, query: str, row: int) -> List[Tuple[int, int]]:
+        '''
+        (col_start, col_end) of the matches in the row
+        '''
+        if not query or row < 0 or row >= len(self):
+            return []
+        query = fold(query)
+        start = self.line_starts[row]
+        end = self.line_starts[row + 1]
+        cols = []
+        i = self.text.find(query, start, end)
+        while i >= 0:
+            cols.append((i - start, i - start + len(query)))
+            i = self.text.find(query, i + len(query), end)
+        return cols
+
+
+class SearchProcessor(prompt_toolkit.layout.processors.Processor):
+    '''
+    highlight the matches of the visible lines.
+    '''
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.index: Optional[SearchIndex] = None
+        self.query = ''
+
+    def apply_transformation(
+        self, transformation_input: prompt_toolkit.layout.processors.
+        TransformationInput
+    ) -> prompt_toolkit.layout.processors.Transformation:
+        fragments = transformation_input.fragments
+        if self.index and self.query:
+            source_to_display = transformation_input.source_to_display
+            for col_start, col_end in self.index.matches(self.query, transformation_input.lineno):
+                fragments = style_range(fragments, source_to_display(
+                    col_start), source_to_display(col_end), SEARCH_STYLE)
+        return prompt_toolkit.layout.processors.Transformation(fragments)
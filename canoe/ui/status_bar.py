@@ -1,21 +1,34 @@
-import prompt_toolkit.layout
-D = prompt_toolkit.layout.Dimension
-
-
-class StatusBar:
-    def __init__(self) -> None:
-        self.row = 0
-        self.col = 0
-        self.lines = 0
-
-        def get_text() -> str:
-            return f'row:{self.row}/{self.lines},col:{self.col}'
-        self.container = prompt_toolkit.layout.containers.Window(
-            content=prompt_toolkit.layout.controls.FormattedTextControl(
-                get_text),
-            height=D.exact(1),
-            style='class:status',
-        )
-
-    def __pt_container__(self) -> prompt_toolkit.layout.containers.Container:
-        return self.container
+from typing import Optional, TYPE_CHECKING
+import prompt_toolkit.layout
+if TYPE_CHECKING:
+    from ..prefetch import Prefetcher
+    from ..connection import ConnectionStats
+D = prompt_toolkit.layout.Dimension
+
+
+class StatusBar:
+    def __init__(self, prefetcher: Optional['Prefetcher'] = None, connection: Optional['ConnectionStats'] = None) -> None:
+        self.row = 0
+        self.col = 0
+        self.lines = 0
+        self.prefetcher = prefetcher
+        self.connection = connection
+
+        def get_text() -> str:
+            text = f'row:{self.row}/{self.lines},col:{self.col}'
+            if self.connection:
+                c = self.connection
+                text += f',conn:{c.open} reuse:{c.reuse_ratio:.0%} dns:{c.dns_hits}/{c.dns_hits + c.dns_misses}'
+            if self.prefetcher:
+                p = self.prefetcher
+                text += f',prefetch:{p.hits}/{p.hits + p.misses}({p.hit_rate:.0%}) ready:{len(p.documents)}'
+            return text
+        self.container = prompt_toolkit.layout.containers.Window(
+            content=prompt_toolkit.layout.controls.FormattedTextControl(
+                get_text),
+            height=D.exact(1),
+            style='class:status',
+        )
+
+    def __pt_container__(self) -> prompt_toolkit.layout.containers.Container:
+        return self.container
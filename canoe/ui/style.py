@@ -5,6 +5,13 @@ CLIENT_STYLE = prompt_toolkit.styles.Style.from_dict({
     "status.position": "#aaaa00",
     "status.key": "#ffaa00",
     "not-searching": "#888888",
+    "search": "bg:#aaaa00 #000000",
+    "truncated": "bg:#aa4400 #ffffff",
+    "tab": "#888888",
+    "tab.current": "reverse",
+    "link.ok": "#00aa00",
+    "link.redirect": "#aaaa00",
+    "link.dead": "bg:#aa0000 #ffffff",
     #
     'anchor': '#0044ff underline',
 
@@ -0,0 +1,64 @@
+'''
+tabs. each tab has its own view, lexer, history and response.
+the root shows the containers of the current tab, so a switch does not lex again.
+a tab in the background loads at the same time, see event.OpenCommand.
+'''
+from typing import Dict, List, Tuple
+import prompt_toolkit.filters
+import prompt_toolkit.key_binding
+import prompt_toolkit.layout
+from .view_window import ViewWindow
+from .history import History, Documents
+from .request_info import ResponseInfo
+
+TITLE_WIDTH = 16
+
+
+class Tab:
+    def __init__(self, id: int, documents: Documents) -> None:
+        self.id = id
+        # the bindings of the view. active while the tab is current
+        self.key_bindings = prompt_toolkit.key_binding.KeyBindings()
+        self.view = ViewWindow(self.key_bindings, id)
+        self.history = History(documents=documents)
+        self.response = ResponseInfo()
+        self.title = ''
+        # the url of the last request
+        self.url = ''
+        self.loading = False
+        # a partial document of the load is shown. the cursor moved in it stays
+        self.partial = False
+
+    def __repr__(self) -> str:
+        return f'Tab({self.id}, {self.url})'
+
+    def get_label(self) -> str:
+        title = self.title or self.url or 'new tab'
+        if len(title) > TITLE_WIDTH:
+            title = title[:TITLE_WIDTH - 1] + '…'
+        return f'{title}*' if self.loading else title
+
+
+class TabBar:
+    '''
+    the labels of the tabs. hidden with one tab.
+    '''
+
+    def __init__(self, tabs: Dict[int, Tab]) -> None:
+        self.tabs = tabs
+        self.current = 0
+        self.control = prompt_toolkit.layout.controls.FormattedTextControl(
+            self.get_text)
+        self.container = prompt_toolkit.layout.containers.ConditionalContainer(
+            prompt_toolkit.layout.containers.Window(self.control, height=1),
+            filter=prompt_toolkit.filters.Condition(lambda: len(self.tabs) > 1))
+
+    def __pt_container__(self) -> prompt_toolkit.layout.containers.Container:
+        return self.container
+
+    def get_text(self) -> List[Tuple[str, str]]:
+        text = []
+        for i, tab in enumerate(self.tabs.values()):
+            style = 'class:tab.current' if tab.id == self.current else 'class:tab'
+            text.append((style, f' {i + 1}:{tab.get_label()} '))
+        return text
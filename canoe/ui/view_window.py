@@ -1,15 +1,20 @@
-from typing import Optional, Callable, List, Tuple
-import bs4
+from typing import Optional, Callable, Dict, List, Tuple, TYPE_CHECKING
 import prompt_toolkit.layout
 import prompt_toolkit.buffer
+import prompt_toolkit.document
 import prompt_toolkit.filters
 import prompt_toolkit.key_binding
 import prompt_toolkit.key_binding.bindings.named_commands
+import prompt_toolkit.lexers
 import urllib.parse
 from .. import event
+if TYPE_CHECKING:
+    import bs4
+    from .beautifulsoup_lexer import BeautifulSoupLexer, LexResult
+    from .search import SearchIndex
 
 
-def create_form_url(form: bs4.Tag, base_url) -> Tuple[str, str]:
+def create_form_url(form: 'bs4.Tag', base_url) -> Tuple[str, str]:
     method = form.get('method', 'GET')
     assert(isinstance(method, str))
     action = form.get('action', '')
@@ -37,11 +42,28 @@ def create_form_url(form: bs4.Tag, base_url) -> Tuple[str, str]:
     return (method, action + '?' + query)
 
 
+def resolve_href(base_url: Optional[str], href) -> Optional[str]:
+    '''
+    the url to open for the href of an anchor. absolute, without the fragment.
+    None if it is not http or https.
+    the navigation, the prefetch and the link check share it, so a prefetched url is hit.
+    '''
+    if not isinstance(href, str):
+        return None
+    url = urllib.parse.urldefrag(
+        urllib.parse.urljoin(base_url or '', href.strip())).url
+    if urllib.parse.urlsplit(url).scheme not in ('http', 'https'):
+        return None
+    return url
+
+
 class ViewWindow:
-    def __init__(self, kb: prompt_toolkit.key_binding.KeyBindings) -> None:
+    def __init__(self, kb: prompt_toolkit.key_binding.KeyBindings, tab: int = 0) -> None:
         self.kb = kb
+        # the id of the tab. carried by the events of the page
+        self.tab = tab
         self.url = None
-        self.soup = bs4.BeautifulSoup
+        self.soup: Optional['bs4.BeautifulSoup'] = None
         self.read_only = True
         self.on_buffer_callbacks: List[Callable[[
             prompt_toolkit.buffer.Buffer], None]] = []
@@ -55,20 +77,25 @@ class ViewWindow:
             on_cursor_position_changed=on_buffer_changed)
         self.has_focus = prompt_toolkit.filters.has_focus(self.buffer)
 
-        from .hover_processor import AnchorProcessor, HoverProcessor
-        self.anchor = AnchorProcessor()
+        # bs4 is loaded with the first document. the empty view paints without it
+        self.lexer: Optional['BeautifulSoupLexer'] = None
+
+        from .hover_processor import HoverProcessor
         self.hover = HoverProcessor()
+        from .search import SearchProcessor
+        self.highlight = SearchProcessor()
+        from .link_status import LinkStatusProcessor
+        # inserts text. after the processors that style the source columns
+        self.links = LinkStatusProcessor()
         input_processors = [
-            self.anchor,
             self.hover,
+            self.highlight,
+            self.links,
         ]
 
-        from .beautifulsoup_lexer import BeautifulSoupLexer
-        self.lexer = BeautifulSoupLexer()
-
         self.control = prompt_toolkit.layout.controls.BufferControl(
             buffer=self.buffer,
-            lexer=self.lexer,
+            lexer=prompt_toolkit.lexers.DynamicLexer(lambda: self.lexer),
             input_processors=input_processors,  # type: ignore
             include_default_input_processors=False,
             # preview_search=True,
@@ -103,6 +130,8 @@ class ViewWindow:
         self._keybind(self.enter, 'enter')
         self._keybind(self.focus_next, 'tab')
         self._keybind(self.focus_prev, 's-tab')
+        self._keybind(self.search_next, 'n')
+        self._keybind(self.search_prev, 'N')
 
     @property
     def base_urL(self) -> str:
@@ -117,24 +146,178 @@ class ViewWindow:
     def __pt_container__(self) -> prompt_toolkit.layout.containers.Container:
         return self.container
 
-    def set_html_soup(self, url: str, soup: bs4.BeautifulSoup) -> str:
+    def get_height(self) -> int:
+        info = self.container.render_info
+        if info:
+            return info.window_height
+        from prompt_toolkit.application.current import get_app
+        return get_app().output.get_size().rows
+
+    def set_lex_result(self, url: str, result: 'LexResult') -> str:
         self.url = url
-        self.soup = soup
-        text, title = self.lexer.lex_html(soup)
+        self.soup = result.soup
+        if not self.lexer:
+            from .beautifulsoup_lexer import BeautifulSoupLexer
+            self.lexer = BeautifulSoupLexer()
+            self.hover.lexer = self.lexer
+            self.links.lexer = self.lexer
+        self.lexer.set_result(result)
+        self.links.clear()
         self.read_only = False
-        self.buffer.text = text
+        self.buffer.text = result.text
         self.read_only = True
-        return title
+        self.highlight.index = None
+        return result.title
+
+    def get_lex_result(self) -> 'LexResult':
+        from .beautifulsoup_lexer import LexResult
+        assert self.lexer
+        return LexResult(self.soup, self.buffer.text, self.lexer.title, self.lexer.lines,
+                         self.lexer.focus, self.lexer.focus_index)
+
+    def update_input(self, tag: 'bs4.Tag') -> bool:
+        '''
+        patch the line of the input and the buffer text in place.
+        the cursor and the scroll stay. False if the input is not on the page.
+        '''
+        if not self.lexer:
+            return False
+        from .beautifulsoup_lexer import Input
+        for focus in self.lexer.focus:
+            if focus.tag is tag and isinstance(focus, Input):
+                break
+        else:
+            return False
+        patch = self.lexer.update_input(focus)
+        if not patch:
+            return False
+        span, text = patch
+        doc = self.buffer.document
+        if span.row < doc.line_count:
+            start = doc.translate_row_col_to_index(span.row, span.col_start)
+            end = start + span.col_end - span.col_start
+            cursor_position = doc.cursor_position
+            if cursor_position >= end:
+                cursor_position += len(text) - (end - start)
+            else:
+                cursor_position = min(cursor_position, start + len(text))
+            self.read_only = False
+            self.buffer.document = prompt_toolkit.document.Document(
+                doc.text[:start] + text + doc.text[end:], cursor_position)
+            self.read_only = True
+            self.highlight.index = None
+        return True
+
+    def get_search_index(self) -> 'SearchIndex':
+        '''
+        built on the first search of the document
+        '''
+        if not self.highlight.index:
+            from .search import SearchIndex
+            self.highlight.index = SearchIndex(self.buffer.text)
+        return self.highlight.index
+
+    def find(self, query: str, origin: int) -> int:
+        '''
+        move the cursor to the first match from origin, or back to origin.
+        the count of the matches.
+        '''
+        index = self.get_search_index()
+        self.highlight.query = query
+        position = index.next(query, origin)
+        self.set_cursor_position(origin if position is None else position)
+        return index.count(query)
+
+    def search_next(self, e: prompt_toolkit.key_binding.KeyPressEvent):
+        position = self.get_search_index().next(
+            self.highlight.query, self.buffer.cursor_position + 1)
+        if position is not None:
+            self.set_cursor_position(position)
+
+    def search_prev(self, e: prompt_toolkit.key_binding.KeyPressEvent):
+        position = self.get_search_index().prev(
+            self.highlight.query, self.buffer.cursor_position)
+        if position is not None:
+            self.set_cursor_position(position)
+
+    def set_cursor_position(self, cursor_position: int):
+        self.buffer.cursor_position = min(
+            cursor_position, len(self.buffer.text))
+
+    def get_prefetch_urls(self, max_links: int = 16) -> List[str]:
+        '''
+        the hovered anchor, then the visible anchors in document order.
+        '''
+        if not self.lexer:
+            return []
+        from .beautifulsoup_lexer import Anchor
+        focus_index = self.lexer.focus_index
+        indices = []
+        if self.hover.anchor_index is not None:
+            indices.append(self.hover.anchor_index)
+        info = self.container.render_info
+        if info:
+            first_row = info.first_visible_line()
+            last_row = info.last_visible_line()
+        else:
+            first_row = self.buffer.document.cursor_position_row
+            last_row = first_row + self.get_height()
+        indices.extend(span.focus_index for span in focus_index.rows(first_row, last_row))
+
+        urls = []
+        for index in dict.fromkeys(indices):
+            match self.lexer.focus[index]:
+                case Anchor(tag):
+                    url = resolve_href(self.url, tag.get('href'))
+                    if url:
+                        urls.append(url)
+                        if len(urls) >= max_links:
+                            break
+        return urls
+
+    def get_link_urls(self) -> Dict[int, str]:
+        '''
+        the absolute url of each anchor. http and https without the fragment.
+        '''
+        if not self.lexer or not self.url:
+            return {}
+        from .beautifulsoup_lexer import Anchor
+        urls = {}
+        for i, focus in enumerate(self.lexer.focus):
+            match focus:
+                case Anchor(tag):
+                    url = resolve_href(self.url, tag.get('href'))
+                    if url:
+                        urls[i] = url
+        return urls
+
+    def get_href_under_cursor(self) -> Optional[str]:
+        '''
+        the url of the anchor under the cursor. see resolve_href
+        '''
+        if not self.lexer:
+            return None
+        from .beautifulsoup_lexer import Anchor, FocusSpan
+        doc = self.buffer.document
+        match self.lexer.focus_index.at(doc.cursor_position_row, doc.cursor_position_col):
+            case FocusSpan(anchor_index):
+                match self.lexer.focus[anchor_index]:
+                    case Anchor(tag):
+                        return resolve_href(self.url, tag.get('href'))
+        return None
 
     def get_url_under_cursor(self) -> Optional[Tuple[str, str]]:
+        if not self.lexer:
+            return None
         assert(self.url)
-        from .beautifulsoup_lexer import Anchor, Input
-        match self.hover.anchor_index:
-            case int() as anchor_index:
+        from .beautifulsoup_lexer import Anchor, Input, FocusSpan
+        doc = self.buffer.document
+        match self.lexer.focus_index.at(doc.cursor_position_row, doc.cursor_position_col):
+            case FocusSpan(anchor_index):
                 match self.lexer.focus[anchor_index]:
                     case Anchor(tag):
-                        href = tag['href']
-                        return ('GET', href)  # type: ignore
+                        url = resolve_href(self.url, tag.get('href'))
+                        return ('GET', url) if url else None
 
                     case Input(tag, form):
                         if form:
@@ -143,7 +326,7 @@ class ViewWindow:
                                     return create_form_url(form, self.base_urL)
                                 case 'text':
                                     event.enqueue(
-                                        event.FocusInputCommand(self.url, tag))
+                                        event.FocusInputCommand(self.url, tag, self.tab))
 
             case _:
                 return None
@@ -152,15 +335,23 @@ class ViewWindow:
         e.app.layout.focus(self.buffer)
 
     def focus_next(self, e: prompt_toolkit.key_binding.KeyPressEvent):
-        focus = self.anchor.get_focus_next(self.buffer.document)
+        if not self.lexer:
+            return
+        doc = self.buffer.document
+        focus = self.lexer.focus_index.next(
+            doc.cursor_position_row, doc.cursor_position_col)
         if focus:
-            self.buffer.cursor_position = self.buffer.document.translate_row_col_to_index(
+            self.buffer.cursor_position = doc.translate_row_col_to_index(
                 focus.row, focus.col_start)
 
     def focus_prev(self, e: prompt_toolkit.key_binding.KeyPressEvent):
-        focus = self.anchor.get_focus_prev(self.buffer.document)
+        if not self.lexer:
+            return
+        doc = self.buffer.document
+        focus = self.lexer.focus_index.prev(
+            doc.cursor_position_row, doc.cursor_position_col)
         if focus:
-            self.buffer.cursor_position = self.buffer.document.translate_row_col_to_index(
+            self.buffer.cursor_position = doc.translate_row_col_to_index(
                 focus.row, focus.col_start)
 
     def up(self, event: prompt_toolkit.key_binding.KeyPressEvent) -> None:
@@ -176,4 +367,5 @@ class ViewWindow:
         match self.get_url_under_cursor():
             case method, url:
                 from .. import event
-                event.enqueue(event.OpenCommand(method, url))
+                event.enqueue(event.OpenCommand(
+                    method, url, self.tab, event.navigate(self.tab)))
@@ -0,0 +1,156 @@
+from typing import Optional, Callable, TypeVar, Tuple, Union, TYPE_CHECKING
+import asyncio
+import concurrent.futures
+import functools
+import logging
+import time
+from .parser import parse_html, DEFAULT_PARSER
+from .timing import NavigationTiming
+if TYPE_CHECKING:
+    # bs4 and the lexer are imported on the first use. see startup
+    import bs4
+    from .ui.beautifulsoup_lexer import LexResult
+
+logger = logging.getLogger(__name__)
+
+EXECUTOR_TYPES = ['thread', 'process']
+
+T = TypeVar('T')
+
+
+def lex_soup(soup: 'bs4.BeautifulSoup') -> 'LexResult':
+    from .ui.beautifulsoup_lexer import BeautifulSoupLexer
+    return BeautifulSoupLexer().lex_result(soup)
+
+
+def parse_and_lex(body: str, parser: str = DEFAULT_PARSER) -> 'LexResult':
+    return lex_soup(parse_html(body, parser))
+
+
+def parse_and_lex_timed(body: str, parser: str = DEFAULT_PARSER) -> Tuple['LexResult', float, float]:
+    '''
+    the result, the parse time and the lex time
+    '''
+    start = time.perf_counter()
+    soup = parse_html(body, parser)
+    parsed = time.perf_counter()
+    result = lex_soup(soup)
+    return (result, parsed - start, time.perf_counter() - parsed)
+
+
+def parse_and_lex_detached(body: str, parser: str = DEFAULT_PARSER) -> Tuple[Union[bytes, 'LexResult'], float, float]:
+    '''
+    for the process executor. the result encoded as a snapshot, without the soup.
+    a pickled soup is parsed again from its markup in the main process.
+    the result itself if it can not be encoded.
+    '''
+    from .snapshot import encode
+    result, parse_time, lex_time = parse_and_lex_timed(body, parser)
+    return (encode('', '', result) or result, parse_time, lex_time)
+
+
+def parse_and_lex_lazy(body: str, parser: str, line_count: int, timing: Optional[NavigationTiming] = None) -> 'LexResult':
+    from .ui.beautifulsoup_lexer import BeautifulSoupLexer
+    start = time.perf_counter()
+    soup = parse_html(body, parser)
+    parsed = time.perf_counter()
+    result = BeautifulSoupLexer().lex_lazy(soup, line_count)
+    if timing:
+        timing.add('parse', parsed - start)
+        timing.add('lex', time.perf_counter() - parsed)
+    return result
+
+
+def complete_lazy(result: 'LexResult') -> 'LexResult':
+    '''
+    produce the rest of the lines and the whole text.
+    '''
+    from .ui.beautifulsoup_lexer import LazyLines
+    assert isinstance(result.lines, LazyLines)
+    lines, focus_index = result.lines.compact()
+    return result._replace(text=lines.text, title=result.lines.title, lines=lines, focus_index=focus_index)
+
+
+class StreamParser:
+    '''
+    feed decoded chunks to html.parser. the soup grows while parsing,
+    so it can be lexed before the body is complete.
+    '''
+
+    def __init__(self) -> None:
+        import bs4
+        import bs4.builder._htmlparser
+        self.soup = bs4.BeautifulSoup('', 'html.parser')
+        self.soup.reset()
+        args, kwargs = self.soup.builder.parser_args
+        self.parser = bs4.builder._htmlparser.BeautifulSoupHTMLParser(
+            self.soup, *args, **kwargs)
+
+    def feed(self, text: str):
+        self.parser.feed(text)
+
+    def lex(self) -> 'LexResult':
+        return lex_soup(self.soup)
+
+    def close(self) -> 'LexResult':
+        self.parser.close()
+        self.soup.endData()
+        while self.soup.currentTag is not None and self.soup.currentTag.name != self.soup.ROOT_TAG_NAME:
+            self.soup.popTag()
+        return self.lex()
+
+
+class WorkerPool:
+    '''
+    run parse and lex outside the event loop.
+
+    thread: share the soup with the loop. cheap to submit.
+    process: no GIL contention. the body is pickled, and the result comes back
+    as a snapshot without the soup. see snapshot.
+    '''
+
+    def __init__(self, executor_type: str = 'thread', max_workers: Optional[int] = None) -> None:
+        self.executor_type = executor_type
+        self.executor: concurrent.futures.Executor
+        match executor_type:
+            case 'thread':
+                self.executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers, thread_name_prefix='canoe')
+            case 'process':
+                self.executor = concurrent.futures.ProcessPoolExecutor(
+                    max_workers)
+            case _:
+                raise ValueError(f'unknown executor: {executor_type}')
+        logger.info(f'worker pool: {executor_type}({max_workers})')
+
+    async def run_async(self, func: Callable[..., T], *args) -> T:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args))
+
+    async def run_local_async(self, func: Callable[..., T], *args) -> T:
+        '''
+        for stateful work that can not be sent to another process.
+        '''
+        if self.executor_type == 'thread':
+            return await self.run_async(func, *args)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(func, *args))
+
+    async def parse_and_lex_async(self, body: str, parser: str = DEFAULT_PARSER, timing: Optional[NavigationTiming] = None) -> 'LexResult':
+        if self.executor_type == 'process':
+            from .snapshot import decode
+            data, parse_time, lex_time = await self.run_async(parse_and_lex_detached, body, parser)
+            # the arrays are views of the bytes
+            result = decode(data, '', '') if isinstance(data, bytes) else data
+        else:
+            result, parse_time, lex_time = await self.run_async(parse_and_lex_timed, body, parser)
+        if timing:
+            timing.add('parse', parse_time)
+            timing.add('lex', lex_time)
+        return result
+
+    async def lex_soup_async(self, soup: 'bs4.BeautifulSoup') -> 'LexResult':
+        return await self.run_async(lex_soup, soup)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
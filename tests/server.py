@@ -0,0 +1,22 @@
+'''
+a local server for the tests and the benchmarks.
+'''
+from typing import AsyncIterator
+import contextlib
+import aiohttp.web
+
+
+@contextlib.asynccontextmanager
+async def serve(app: aiohttp.web.Application, host: str = '127.0.0.1', **kw) -> AsyncIterator[str]:
+    '''
+    the base url of the app on a free port. kw goes to the AppRunner.
+    '''
+    runner = aiohttp.web.AppRunner(app, **kw)
+    await runner.setup()
+    try:
+        site = aiohttp.web.TCPSite(runner, host, 0)
+        await site.start()
+        port = runner.addresses[0][1]
+        yield f'http://{host}:{port}'
+    finally:
+        await runner.cleanup()
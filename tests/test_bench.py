@@ -0,0 +1,40 @@
+import unittest
+import contextlib
+import io
+import pathlib
+import sys
+
+HERE = pathlib.Path(__file__).absolute().parent
+sys.path.append(str(HERE.parent))
+
+
+class TestBench(unittest.TestCase):
+
+    def test_compare(self):
+        from benchmarks.bench import compare
+        baseline = {'slow': 1.0, 'tiny': 0.001, 'noise': 1.0}
+        results = {'slow': 2.5, 'tiny': 0.003, 'noise': 1.5, 'new': 9.0}
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            # tiny is 3x but under min_delta. new has no baseline
+            self.assertEqual(compare(results, baseline, 1.0, 0.005), ['slow'])
+            # on a machine 2x slower than the baseline
+            self.assertEqual(compare(results, baseline, 1.0, 0.005, 2), [])
+            self.assertEqual(compare(results, baseline, 0.4, 0.005), ['slow', 'noise'])
+        self.assertIn('REGRESSION', out.getvalue())
+        self.assertIn('(new)', out.getvalue())
+
+    def test_merge(self):
+        from benchmarks.bench import merge
+        stored = {'calibration': 1.0, 'python': '3.10', 'results': {'a': 1.0, 'b': 2.0}}
+        # measured on a machine 2x slower than the baseline
+        document = {'calibration': 2.0, 'python': '3.11', 'results': {'b': 6.0, 'c': 4.0}}
+        merged = merge(stored, document)
+        self.assertEqual(merged['calibration'], 1.0)
+        self.assertEqual(merged['python'], '3.11')
+        self.assertEqual(merged['results'], {'a': 1.0, 'b': 3.0, 'c': 2.0})
+        # the stored baseline is not changed
+        self.assertEqual(stored['results'], {'a': 1.0, 'b': 2.0})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+import pathlib
+import sys
+import tempfile
+import time
+
+HERE = pathlib.Path(__file__).absolute().parent
+sys.path.append(str(HERE.parent))
+
+
+class TestHttpCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = pathlib.Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_freshness(self):
+        from canoe.cache import HttpCache
+        cache = HttpCache(self.directory)
+        entry = cache.store('http://a/', 200, {'cache-control': 'max-age=60'}, 'a')
+        assert entry
+        self.assertTrue(entry.is_fresh(time.time()))
+        self.assertFalse(entry.is_fresh(time.time() + 120))
+        self.assertIsNone(cache.store('http://b/', 200, {'cache-control': 'no-store'}, 'b'))
+        # nothing to revalidate with
+        self.assertIsNone(cache.store('http://c/', 200, {}, 'c'))
+
+        entry = cache.store('http://d/', 200, {'etag': '"x"'}, 'd')
+        assert entry
+        self.assertFalse(entry.is_fresh(time.time()))
+        self.assertEqual(entry.validators(), {'If-None-Match': '"x"'})
+
+    def test_persistent_lru(self):
+        from canoe.cache import HttpCache
+        cache = HttpCache(self.directory, 10)
+        cache.store('http://a/', 200, {'etag': 'a'}, 'aaaa')
+        cache.store('http://b/', 200, {'etag': 'b'}, 'bbbb')
+        self.assertIsNotNone(cache.get('http://a/'))
+        cache.store('http://c/', 200, {'etag': 'c'}, 'cccc')
+        self.assertIsNone(cache.get('http://b/'))
+
+        cache = HttpCache(self.directory, 10)
+        self.assertEqual(list(e.url for e in cache.entries.values()), ['http://a/', 'http://c/'])
+        entry = cache.get('http://a/')
+        assert entry
+        self.assertEqual(cache.read_body(entry), 'aaaa')
+
+        # evicted after the get
+        cache.store('http://d/', 200, {'etag': 'd'}, 'dddddddd')
+        self.assertIsNone(cache.read_body(entry))
+
+
+if __name__ == '__main__':
+    unittest.main()
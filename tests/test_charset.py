@@ -0,0 +1,96 @@
+import unittest
+import asyncio
+import pathlib
+import sys
+
+HERE = pathlib.Path(__file__).absolute().parent
+sys.path.append(str(HERE.parent))
+
+
+class TestCharset(unittest.TestCase):
+
+    def test_sniff(self):
+        from canoe.charset import sniff_charset, detect_charset
+        self.assertEqual(sniff_charset(
+            'Shift_JIS', b'<meta charset="euc-jp">'), 'cp932')
+        self.assertEqual(sniff_charset(
+            'Shift_JIS', b'\xef\xbb\xbf<p>'), 'utf-8-sig')
+        self.assertEqual(sniff_charset(
+            None, b'<meta http-equiv="Content-Type" content="text/html; charset=EUC-JP">'), 'euc_jp')
+        self.assertEqual(sniff_charset('unknown', b'<p>a</p>'), None)
+        self.assertEqual(detect_charset('あいう'.encode('utf-8')[:-1]), 'utf-8')
+        self.assertEqual(detect_charset('あいう'.encode('iso2022_jp')), 'iso2022_jp')
+        text = '日本語のテキスト、カタカナとひらがな。' * 20
+        self.assertEqual(detect_charset(text.encode('euc_jp')), 'euc_jp')
+        self.assertEqual(detect_charset(text.encode('cp932')), 'cp932')
+
+    def test_stream(self):
+        from canoe.charset import StreamDecoder, SNIFF_BYTES
+        text = '<html><head><meta charset="shift_jis"></head><body>' + \
+            '日本語' * 2000 + '</body></html>'
+        body = text.encode('cp932')
+        for size in (1, 7, SNIFF_BYTES + 1):
+            decoder = StreamDecoder()
+            decoded = ''.join(decoder.decode(body[i:i+size])
+                              for i in range(0, len(body), size))
+            decoded += decoder.decode(b'', True)
+            self.assertEqual(decoded, text)
+            self.assertEqual(decoder.charset, 'cp932')
+
+        # no label
+        body = ('<p>' + 'é' * SNIFF_BYTES + '</p>').encode('utf-8')
+        decoder = StreamDecoder()
+        self.assertEqual(decoder.decode(body[:100]), '')
+        decoded = decoder.decode(body[100:]) + decoder.decode(b'', True)
+        self.assertEqual(decoded.encode('utf-8'), body)
+
+    def test_ascii_head(self):
+        from canoe.charset import StreamDecoder, SNIFF_BYTES
+        # a long head of scripts without a label
+        text = '<script>' + 'var a = 1;' * SNIFF_BYTES + '</script><p>' + \
+            '日本語' * 2000 + '</p>'
+        for encoding in ('utf-8', 'iso2022_jp', 'euc_jp', 'cp932'):
+            body = text.encode(encoding)
+            for size in (1000, SNIFF_BYTES + 1):
+                decoder = StreamDecoder()
+                decoded = ''.join(decoder.decode(body[i:i+size])
+                                  for i in range(0, len(body), size))
+                decoded += decoder.decode(b'', True)
+                self.assertTrue(decoded == text, (encoding, size))
+            if encoding in ('utf-8', 'iso2022_jp'):
+                self.assertEqual(decoder.charset, encoding)
+
+        # the ascii is passed before the charset is decided
+        decoder = StreamDecoder()
+        self.assertEqual(decoder.decode(b'a' * SNIFF_BYTES), 'a' * SNIFF_BYTES)
+        self.assertIsNone(decoder.charset)
+        self.assertEqual(decoder.decode(b'', True), '')
+        self.assertEqual(decoder.charset, 'utf-8')
+
+    def test_gzip(self):
+        import gzip
+        import aiohttp
+        import aiohttp.web
+        from tests.server import serve
+        from canoe.limits import BodyReader
+
+        text = '<meta charset="euc-jp"><p>' + 'かな' * 10000 + '</p>'
+
+        async def page(request):
+            return aiohttp.web.Response(body=gzip.compress(text.encode('euc-jp')), headers={
+                'Content-Type': 'text/html',
+                'Content-Encoding': 'gzip',
+            })
+
+        async def run():
+            app = aiohttp.web.Application()
+            app.router.add_get('/', page)
+            async with serve(app) as base, aiohttp.ClientSession() as session:
+                async with session.get(f'{base}/') as response:
+                    return await BodyReader(response, chunk_size=1024).read_text_async()
+
+        self.assertEqual(asyncio.run(run()), text)
+
+
+if __name__ == '__main__':
+    unittest.main()
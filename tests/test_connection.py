@@ -0,0 +1,43 @@
+import unittest
+import asyncio
+import pathlib
+import sys
+
+HERE = pathlib.Path(__file__).absolute().parent
+sys.path.append(str(HERE.parent))
+
+
+class TestConnection(unittest.TestCase):
+
+    def test_reuse(self):
+        import aiohttp.web
+        from tests.server import serve
+        from canoe.connection import ConnectionOptions, ConnectionStats, create_session
+
+        async def page(request):
+            return aiohttp.web.Response(text='<p>a</p>', content_type='text/html')
+
+        async def run():
+            app = aiohttp.web.Application()
+            app.router.add_get('/{name}', page)
+            async with serve(app, 'localhost') as base:
+                stats = ConnectionStats()
+                session = create_session(ConnectionOptions(), stats)
+                for name in ('a', 'b', 'c'):
+                    async with session.get(f'{base}/{name}') as response:
+                        await response.text()
+                self.assertEqual(stats.open, 1)
+                await session.close()
+                self.assertEqual(stats.open, 0)
+            return stats
+
+        stats = asyncio.run(run())
+        # back-to-back requests share the connection
+        self.assertEqual(stats.created, 1)
+        self.assertEqual(stats.reused, 2)
+        self.assertEqual(stats.dns_misses, 1)
+        self.assertEqual(stats.dns_hits, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+import asyncio
+import io
+import pathlib
+import sys
+
+HERE = pathlib.Path(__file__).absolute().parent
+sys.path.append(str(HERE.parent))
+
+
+class TestDump(unittest.TestCase):
+
+    def test_render_text(self):
+        from canoe.dump import render_text
+        body = '<p>see <a href="/a">this</a> and <a href="http://b/">that</a></p><p><a name="x">anchor</a></p>'
+        # the lexer strips the whitespace between the inline elements
+        self.assertEqual(render_text(body, 'http://host/dir/'),
+                         'seethisandthat\nanchor\n')
+        self.assertEqual(render_text(body, 'http://host/dir/', links=True), '''seethis[1]andthat[2]
+anchor
+
+References
+
+   1. http://host/a
+   2. http://b/
+''')
+
+    def test_dump(self):
+        import aiohttp.web
+        from tests.server import serve
+        from canoe.dump import Dumper
+        from canoe.limits import FetchLimits
+        from canoe.worker import WorkerPool
+
+        async def page(request: aiohttp.web.Request):
+            name = request.match_info['name']
+            if name == 'missing':
+                raise aiohttp.web.HTTPNotFound()
+            if name == 'big':
+                return aiohttp.web.Response(text='<p>' + 'x' * 1000 + '</p>', content_type='text/html')
+            # the later page answers first
+            await asyncio.sleep(0.05 if name == '0' else 0)
+            return aiohttp.web.Response(text=f'<p>{name}</p>', content_type='text/html')
+
+        async def run():
+            app = aiohttp.web.Application()
+            app.router.add_get('/{name}', page)
+            async with serve(app) as base:
+
+                async def urls():
+                    for name in ('0', 'missing', '1', '2', 'big'):
+                        yield f'{base}/{name}'
+
+                pool = WorkerPool('thread', 2)
+                out = io.StringIO()
+                async with aiohttp.ClientSession() as session:
+                    dumper = Dumper(session, pool, concurrency=2,
+                                    limits=FetchLimits(max_bytes=100))
+                    await dumper.dump_async(urls(), out)
+                pool.shutdown()
+            return base, dumper, out.getvalue()
+
+        base, dumper, text = asyncio.run(run())
+        self.assertEqual((dumper.done, dumper.failed), (4, 1))
+        self.assertEqual(text, ''.join(
+            f'==> {base}/{name} <==\n{name}\n' for name in ('0', '1', '2'))
+            + f'==> {base}/big <==\n' + 'x' * 97 + '\n[truncated: over 100 bytes]\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
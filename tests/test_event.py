@@ -0,0 +1,145 @@
+import unittest
+import asyncio
+import pathlib
+import sys
+from typing import NamedTuple
+
+HERE = pathlib.Path(__file__).absolute().parent
+sys.path.append(str(HERE.parent))
+
+
+class Slow(NamedTuple):
+    value: int
+
+
+class Fast(NamedTuple):
+    value: int
+
+
+class Open(NamedTuple):
+    value: int
+    tab: int
+
+
+class TestEventDispatcher(unittest.TestCase):
+
+    def test_policy(self):
+        from canoe.event import EventDispatcher, LATEST, PARALLEL, SERIAL
+
+        async def run():
+            dispatcher = EventDispatcher()
+            log = []
+            running = 0
+            max_running = 0
+
+            async def slow(payload: Slow):
+                nonlocal running, max_running
+                running += 1
+                max_running = max(max_running, running)
+                try:
+                    await asyncio.sleep(0.05)
+                    log.append(('slow', payload.value))
+                finally:
+                    running -= 1
+
+            def fast(payload: Fast):
+                log.append(('fast', payload.value))
+
+            dispatcher.register(Slow, slow, LATEST)
+            dispatcher.register(Fast, fast, SERIAL)
+            dispatcher.start(asyncio.get_running_loop())
+            for i in range(3):
+                dispatcher.enqueue(Slow(i))
+            dispatcher.enqueue(Fast(0))
+            await asyncio.sleep(0.1)
+            await dispatcher.shutdown()
+            return log, max_running
+
+        log, max_running = asyncio.run(run())
+        # not blocked by the slow handler. only the latest completes.
+        self.assertEqual(log, [('fast', 0), ('slow', 2)])
+        self.assertEqual(max_running, 1)
+
+        async def run_parallel(policy, limit):
+            dispatcher = EventDispatcher()
+            running = 0
+            max_running = 0
+
+            async def slow(payload: Slow):
+                nonlocal running, max_running
+                running += 1
+                max_running = max(max_running, running)
+                await asyncio.sleep(0.02)
+                running -= 1
+
+            dispatcher.register(Slow, slow, policy, limit)
+            dispatcher.start(asyncio.get_running_loop())
+            for i in range(5):
+                dispatcher.enqueue(Slow(i))
+            await asyncio.sleep(0.2)
+            await dispatcher.shutdown()
+            return max_running
+
+        self.assertEqual(asyncio.run(run_parallel(PARALLEL, 2)), 2)
+        self.assertEqual(asyncio.run(run_parallel(SERIAL, 1)), 1)
+
+    def test_latest_key(self):
+        from canoe.event import EventDispatcher, LATEST
+
+        async def run():
+            dispatcher = EventDispatcher()
+            log = []
+
+            async def open(payload: Open):
+                await asyncio.sleep(0.05)
+                log.append((payload.tab, payload.value))
+
+            dispatcher.register(Open, open, LATEST, key=lambda payload: payload.tab)
+            dispatcher.start(asyncio.get_running_loop())
+            dispatcher.enqueue(Open(0, 0))
+            dispatcher.enqueue(Open(0, 1))
+            dispatcher.enqueue(Open(1, 0))
+            await asyncio.sleep(0.1)
+            await dispatcher.shutdown()
+            return log
+
+        # another tab does not cancel
+        self.assertEqual(sorted(asyncio.run(run())), [(0, 1), (1, 0)])
+
+        async def run_cancel():
+            dispatcher = EventDispatcher()
+            log = []
+
+            async def open(payload: Open):
+                await asyncio.sleep(0.05)
+                log.append((payload.tab, payload.value))
+
+            dispatcher.register(Open, open, LATEST, key=lambda payload: payload.tab)
+            dispatcher.start(asyncio.get_running_loop())
+            dispatcher.enqueue(Open(value=0, tab=0))
+            dispatcher.enqueue(Open(value=0, tab=1))
+            await asyncio.sleep(0.01)
+            # the tab is closed
+            dispatcher.cancel(Open, 1)
+            await asyncio.sleep(0.1)
+            await dispatcher.shutdown()
+            return log
+
+        self.assertEqual(asyncio.run(run_cancel()), [(0, 0)])
+
+    def test_generation(self):
+        from canoe.event import EventDispatcher, UpdateDocument
+        dispatcher = EventDispatcher()
+        first = dispatcher.navigate(0)
+        document = UpdateDocument('http://host/', None, tab=0, generation=first)
+        self.assertFalse(dispatcher.is_stale(document))
+        # the document is queued before the next navigation
+        dispatcher.navigate(0)
+        self.assertTrue(dispatcher.is_stale(document))
+        # another tab
+        dispatcher.navigate(1)
+        self.assertFalse(dispatcher.is_stale(document._replace(tab=2)))
+
+
+if __name__ == '__main__':
+    unittest.main()
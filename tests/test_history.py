@@ -0,0 +1,64 @@
+import unittest
+import pathlib
+import sys
+
+HERE = pathlib.Path(__file__).absolute().parent
+sys.path.append(str(HERE.parent))
+
+
+class TestHistory(unittest.TestCase):
+
+    def test_back_forward(self):
+        from canoe.worker import parse_and_lex
+        from canoe.ui.history import History, estimate_size
+        a = parse_and_lex('<p>a</p>')
+        b = parse_and_lex('<p>b</p>')
+        c = parse_and_lex('<p>c</p>')
+
+        history = History(estimate_size(a) + estimate_size(b))
+        history.visit('a', a)
+        history.save_cursor(1)
+        history.visit('b', b)
+        self.assertEqual(history.go(-1), (history.entries[0], a))
+        self.assertEqual(history.entries[0].cursor_position, 1)
+        self.assertEqual(history.go(1), (history.entries[1], b))
+
+        # evict a
+        history.visit('c', c)
+        entry, document = history.go(-2)  # type: ignore
+        self.assertEqual(entry.url, 'a')
+        self.assertIsNone(document)
+        self.assertEqual(history.index, 2)
+
+        # fetched again
+        self.assertEqual(history.visit('a', a), (history.entries[0], True))
+        self.assertEqual(history.index, 0)
+        self.assertEqual(len(history.entries), 3)
+
+        # new navigation drops the forward entries
+        self.assertEqual(history.visit('d', c), (history.entries[1], False))
+        self.assertEqual([e.url for e in history.entries], ['a', 'd'])
+
+    def test_shared_documents(self):
+        from canoe.worker import parse_and_lex
+        from canoe.ui.history import History, Documents, estimate_size
+        a = parse_and_lex('<p>a</p>')
+        b = parse_and_lex('<p>b</p>')
+        c = parse_and_lex('<p>c</p>')
+
+        # the tabs share the budget
+        documents = Documents(estimate_size(a) + estimate_size(b))
+        tab0 = History(documents=documents)
+        tab1 = History(documents=documents)
+        tab0.visit('a', a)
+        tab1.visit('b', b)
+        tab0.visit('c', c)
+        self.assertEqual(tab0.go(-1), (tab0.entries[0], None))
+        self.assertEqual(tab1.documents.get(tab1.entries[0]), b)
+
+        tab1.clear()
+        self.assertEqual(documents.total_bytes, estimate_size(c))
+
+
+if __name__ == '__main__':
+    unittest.main()
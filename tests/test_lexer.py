@@ -0,0 +1,124 @@
+import unittest
+import pathlib
+import sys
+
+HERE = pathlib.Path(__file__).absolute().parent
+sys.path.append(str(HERE.parent))
+
+
+class TestBeautifulSoupLexer(unittest.TestCase):
+
+    def test_deep(self):
+        from canoe.worker import parse_and_lex
+        depth = sys.getrecursionlimit() * 2
+        result = parse_and_lex('<div>' * depth + 'deep' + '</div>' * depth)
+        self.assertEqual(result.lines[-1], [('', 'deep')])
+
+    def test_same_anchor(self):
+        from canoe.worker import parse_and_lex
+        result = parse_and_lex('<a href="x">x</a><a href="x">x</a>')
+        self.assertEqual(result.lines, [[
+            ('class:anchor', 'x'),
+            ('class:anchor', 'x'),
+        ]])
+        self.assertEqual([(span.focus_index, span.col_start, span.col_end) for span in result.focus_index.spans],
+                         [(0, 0, 1), (1, 1, 2)])
+
+    def test_focus_index(self):
+        from canoe.worker import parse_and_lex
+        result = parse_and_lex(
+            '<p>a <a href="1"><b>bb</b>cc</a> d <a href="2">e<div>f</div></a></p>'
+            '<form><input name="q"><input type="hidden"><input type="submit"></form>')
+        index = result.focus_index
+        self.assertEqual([tuple(span) for span in index.spans], [
+            (0, 1, 1, 5), (1, 1, 6, 7), (1, 2, 0, 1), (2, 2, 1, 25), (4, 2, 27, 29)])
+        self.assertEqual(index.at(1, 4), index.spans[0])
+        self.assertIsNone(index.at(1, 5))
+        self.assertEqual(index.next(0, 0), index.spans[0])
+        self.assertEqual(index.next(1, 2), index.spans[1])
+        # skip the rest of the wrapped anchor
+        self.assertEqual(index.next(1, 6), index.spans[3])
+        self.assertEqual(index.prev(2, 0), index.spans[0])
+        self.assertEqual(index.prev(2, 28), index.spans[3])
+        self.assertEqual(index.prev(2, 1), index.spans[1])
+        self.assertIsNone(index.prev(1, 1))
+
+    def test_form(self):
+        from canoe.worker import parse_and_lex
+        result = parse_and_lex(
+            '<form><p><input name="q"></p></form><input name="outside">')
+        self.assertIs(result.focus[0].form, result.soup.form)
+        self.assertIsNone(result.focus[1].form)
+
+    def test_lazy(self):
+        from canoe.worker import parse_and_lex, parse_and_lex_lazy, complete_lazy
+        body = '<title>lazy</title>' + ''.join(
+            f'<div><a href="/{i}">{i}</a><form><input name="q{i}"></form></div>' for i in range(100))
+        expected = parse_and_lex(body)
+
+        result = parse_and_lex_lazy(body, 'html.parser', 10)
+        self.assertEqual(result.text, '\n'.join(expected.text.split('\n')[:10]))
+        self.assertEqual(result.title, 'lazy')
+        self.assertLess(len(result.focus), len(expected.focus))
+
+        result = complete_lazy(result)
+        self.assertEqual(result.text, expected.text)
+        self.assertEqual(list(result.lines), expected.lines)
+        self.assertEqual(len(result.focus), len(expected.focus))
+
+    def test_compact(self):
+        from canoe.worker import parse_and_lex
+        from canoe.ui.beautifulsoup_lexer import CompactLines, LazyLines
+        body = '<title>t</title><p>a <a href="1">b</a> c</p><p></p><form><input name="q"></form>'
+        result = parse_and_lex(body)
+        self.assertIsInstance(result.lines, CompactLines)
+        expected = list(LazyLines(result.soup))
+        self.assertEqual(result.lines, expected)
+        self.assertEqual(result.lines[-1], expected[-1])
+        # the text is the buffer of the lines
+        self.assertIs(result.lines.text, result.text)
+        self.assertEqual(sorted(result.lines.styles), sorted(
+            {style for line in expected for style, _ in line}))
+        self.assertGreater(result.lines.nbytes, 0)
+        with self.assertRaises(IndexError):
+            result.lines[len(expected)]
+        result.lines[0] = [('', 'x')]
+        self.assertEqual(result.lines[0], [('', 'x')])
+
+    def test_update_input(self):
+        import prompt_toolkit.key_binding
+        from canoe.worker import parse_and_lex
+        from canoe.ui.view_window import ViewWindow
+        body = '<p>top</p><form><p>a <input name="q"> <a href="/x">x</a></p></form><p>bottom</p>'
+        view = ViewWindow(prompt_toolkit.key_binding.KeyBindings())
+        view.set_lex_result('http://host/', parse_and_lex(body))
+        lines = view.lexer.lines
+        # on the anchor after the input
+        anchor = view.lexer.focus_index.spans[1]
+        cursor = view.buffer.document.translate_row_col_to_index(
+            anchor.row, anchor.col_start)
+        view.set_cursor_position(cursor)
+
+        tag = view.soup.find('input')
+        tag['value'] = 'a longer value than the field'
+        self.assertTrue(view.update_input(tag))
+        expected = parse_and_lex(body.replace(
+            '<input name="q">', '<input name="q" value="a longer value than the field">'))
+        self.assertEqual(view.buffer.text, expected.text)
+        self.assertEqual(list(view.lexer.lines), expected.lines)
+        # patched in place
+        self.assertIs(view.lexer.lines, lines)
+        self.assertEqual(view.lexer.focus_index.spans,
+                         expected.focus_index.spans)
+        # still on the anchor
+        doc = view.buffer.document
+        self.assertEqual(view.lexer.focus_index.at(doc.cursor_position_row, doc.cursor_position_col),
+                         view.lexer.focus_index.spans[1])
+
+        # not on the page
+        other = parse_and_lex('<input name="q">').soup.find('input')
+        self.assertFalse(view.update_input(other))
+
+
+if __name__ == '__main__':
+    unittest.main()
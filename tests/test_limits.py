@@ -0,0 +1,84 @@
+import unittest
+import asyncio
+import pathlib
+import sys
+
+HERE = pathlib.Path(__file__).absolute().parent
+sys.path.append(str(HERE.parent))
+
+
+class TestLimits(unittest.TestCase):
+
+    def read(self, path: str, limits) -> tuple:
+        import aiohttp
+        import aiohttp.web
+        from tests.server import serve
+        from canoe.limits import BodyReader
+
+        released = asyncio.Event()
+
+        async def page(request: aiohttp.web.Request):
+            response = aiohttp.web.StreamResponse(
+                headers={'Content-Type': 'text/html; charset=utf-8'})
+            await response.prepare(request)
+            name = request.match_info['name']
+            for i in range(100):
+                await response.write(f'<p>{i:04}</p>\n'.encode('ascii'))
+                if name == 'stall' and i == 9:
+                    await released.wait()
+                elif name == 'slow':
+                    await asyncio.sleep(0.02)
+            await response.write_eof()
+            return response
+
+        async def run():
+            app = aiohttp.web.Application()
+            app.router.add_get('/{name}', page)
+            async with serve(app, shutdown_timeout=0) as base:
+                try:
+                    async with aiohttp.ClientSession() as session:
+                        async with session.get(f'{base}/{path}') as response:
+                            reader = BodyReader(response, limits, 16)
+                            text = await reader.read_text_async()
+                finally:
+                    # before the cleanup waits for the handler
+                    released.set()
+            return reader, text
+
+        return asyncio.run(run())
+
+    def test_complete(self):
+        from canoe.limits import FetchLimits
+        reader, text = self.read('all', FetchLimits())
+        self.assertIsNone(reader.truncated)
+        self.assertEqual(reader.received, 1200)
+        self.assertTrue(text.endswith('<p>0099</p>\n'))
+
+    def test_size(self):
+        from canoe.limits import FetchLimits, SIZE
+        reader, text = self.read('all', FetchLimits(max_bytes=100))
+        self.assertEqual(reader.truncated, SIZE)
+        self.assertEqual(reader.received, 100)
+        self.assertEqual(len(text), 100)
+        self.assertTrue(text.startswith('<p>0000</p>\n'))
+        self.assertEqual(str(reader), 'truncated: over 100 bytes')
+
+    def test_idle(self):
+        from canoe.limits import FetchLimits, IDLE
+        reader, text = self.read('stall', FetchLimits(idle_timeout=0.2))
+        self.assertEqual(reader.truncated, IDLE)
+        # the part before the stall
+        self.assertEqual(reader.received, 120)
+        self.assertTrue(text.endswith('<p>0009</p>\n'))
+
+    def test_total(self):
+        from canoe.limits import FetchLimits, TIME
+        reader, text = self.read('slow', FetchLimits(total_timeout=0.3))
+        self.assertEqual(reader.truncated, TIME)
+        self.assertGreater(reader.received, 0)
+        self.assertLess(reader.received, 1200)
+        self.assertEqual(len(text), reader.received)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import unittest
+import asyncio
+import collections
+import pathlib
+import sys
+
+HERE = pathlib.Path(__file__).absolute().parent
+sys.path.append(str(HERE.parent))
+
+
+class TestLinkCheck(unittest.TestCase):
+
+    def test_check(self):
+        import aiohttp
+        import aiohttp.web
+        from tests.server import serve
+        from canoe.linkcheck import LinkChecker, OK, REDIRECT, DEAD
+
+        requests = collections.Counter()
+        running = 0
+        max_running = 0
+
+        async def page(request: aiohttp.web.Request):
+            nonlocal running, max_running
+            name = request.match_info['name']
+            requests[(request.method, name)] += 1
+            running += 1
+            max_running = max(max_running, running)
+            try:
+                await asyncio.sleep(0.01)
+            finally:
+                running -= 1
+            if name == 'missing':
+                raise aiohttp.web.HTTPNotFound()
+            if name == 'moved':
+                raise aiohttp.web.HTTPMovedPermanently('/ok')
+            if name in ('nohead', 'empty') and request.method == 'HEAD':
+                raise aiohttp.web.HTTPMethodNotAllowed('HEAD', ['GET'])
+            if name == 'empty':
+                if request.headers.get('Range'):
+                    raise aiohttp.web.HTTPRequestRangeNotSatisfiable()
+                return aiohttp.web.Response()
+            return aiohttp.web.Response(text='ok')
+
+        async def run():
+            app = aiohttp.web.Application()
+            app.router.add_route('*', '/{name}', page)
+            names = ['ok', 'missing', 'moved', 'nohead', 'empty'] + \
+                [f'page{i}' for i in range(20)] + ['ok']
+            results = []
+            async with serve(app) as base, aiohttp.ClientSession() as session:
+                checker = LinkChecker(session, {}, per_host=4)
+                statuses = await checker.check_all_async(
+                    [f'{base}/{name}' for name in names], results.append)
+                # cached
+                await checker.check_all_async([f'{base}/ok'])
+            return base, statuses, results
+
+        base, statuses, results = asyncio.run(run())
+        by_url = {status.url: status for status in statuses}
+        self.assertEqual(len(statuses), 25)
+        self.assertEqual(len(results), 25)
+        self.assertEqual(by_url[f'{base}/ok'].kind, OK)
+        self.assertEqual(by_url[f'{base}/missing'].kind, DEAD)
+        self.assertEqual(by_url[f'{base}/missing'].label, '404')
+        moved = by_url[f'{base}/moved']
+        self.assertEqual((moved.kind, moved.location), (REDIRECT, f'{base}/ok'))
+        # ranged GET
+        self.assertEqual(by_url[f'{base}/nohead'].kind, OK)
+        self.assertEqual(requests[('GET', 'nohead')], 1)
+        # 416 for the range of an empty body
+        self.assertEqual(by_url[f'{base}/empty'].label, '200')
+        self.assertEqual(requests[('GET', 'empty')], 2)
+        # once for each url
+        self.assertEqual(requests[('HEAD', 'ok')], 1)
+        self.assertEqual(max_running, 4)
+
+    def test_processor(self):
+        import prompt_toolkit.key_binding
+        from canoe.worker import parse_and_lex
+        from canoe.linkcheck import LinkStatus
+        from canoe.ui.view_window import ViewWindow
+        view = ViewWindow(prompt_toolkit.key_binding.KeyBindings())
+        view.set_lex_result('http://host/dir/', parse_and_lex(
+            '<p><a href="a">one</a> and <a href="/b#x">two</a></p>'))
+        urls = view.get_link_urls()
+        self.assertEqual(list(urls.values()), ['http://host/dir/a', 'http://host/b'])
+
+        view.links.urls = urls
+        view.links.results['http://host/b'] = LinkStatus('http://host/b', 404)
+        row = view.buffer.text.split('\n').index('oneandtwo')
+
+        async def render():
+            # the buffer loads its history in the running loop
+            return view.control.create_content(80, 20).get_line(row)
+        line = asyncio.run(render())
+        # and the space of the cursor
+        self.assertEqual(''.join(text for _, text, *_ in line), 'oneandtwo[404] ')
+        self.assertIn(('class:link.dead', '[404]'), line)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+import logging
+import pathlib
+import sys
+
+HERE = pathlib.Path(__file__).absolute().parent
+sys.path.append(str(HERE.parent))
+
+
+class TestLogger(unittest.TestCase):
+
+    def setUp(self):
+        self.handlers = logging.getLogger().handlers
+        self.level = logging.getLogger().level
+        logging.getLogger().setLevel(logging.DEBUG)
+
+    def tearDown(self):
+        logging.getLogger().handlers = self.handlers
+        logging.getLogger().setLevel(self.level)
+
+    def test_ring(self):
+        from canoe.ui.request_info import Logger
+        log = Logger(height=3, capacity=10)
+        formatted = 0
+        format = log.format
+
+        def count_format(record):
+            nonlocal formatted
+            formatted += 1
+            return format(record)
+        log.format = count_format  # type: ignore
+
+        for i in range(100):
+            logging.getLogger('test').debug('record %d', i)
+        self.assertEqual(len(log.records), 10)
+        self.assertEqual(log.count, 100)
+        self.assertEqual(formatted, 0)
+        # the message is not formatted yet
+        self.assertEqual((log.records[0].msg, log.records[0].args), ('record %d', (90,)))
+        self.assertEqual([text for _, text in log.get_text()], [
+                         'record 97\n', 'record 98\n', 'record 99\n'])
+        self.assertEqual(formatted, 3)
+        # no new record
+        log.get_text()
+        self.assertEqual(formatted, 3)
+
+    def test_levels(self):
+        from canoe.ui.request_info import Logger, parse_levels
+        levels = parse_levels(['info', 'test.quiet=WARNING'])
+        self.assertEqual(
+            levels, {'': logging.INFO, 'test.quiet': logging.WARNING})
+        self.assertRaises(ValueError, lambda: parse_levels(['a=LOUD']))
+
+        log = Logger(capacity=10, levels=levels)
+        logging.getLogger('test').debug('drop')
+        logging.getLogger('test').info('keep')
+        logging.getLogger('test.quiet.child').info('drop')
+        logging.getLogger('test.quiet.child').warning('keep')
+        self.assertEqual([record.getMessage()
+                         for record in log.records], ['keep', 'keep'])
+
+    def test_release(self):
+        import gc
+        import weakref
+        from canoe.ui.request_info import Logger
+
+        class Payload:
+            def __str__(self) -> str:
+                return 'payload'
+
+        log = Logger(capacity=10)
+        payload = Payload()
+        ref = weakref.ref(payload)
+        logging.getLogger('test').debug('dequeue: %s', payload)
+        try:
+            raise ValueError(payload)
+        except ValueError:
+            logging.getLogger('test').exception('failed')
+        del payload
+        gc.collect()
+        self.assertIsNone(ref())
+        self.assertEqual(log.records[0].getMessage(), 'dequeue: payload')
+        self.assertIn('ValueError: payload', log.format(log.records[1]))
+
+
+if __name__ == '__main__':
+    unittest.main()
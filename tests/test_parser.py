@@ -0,0 +1,60 @@
+import unittest
+import pathlib
+import pickle
+import sys
+
+HERE = pathlib.Path(__file__).absolute().parent
+sys.path.append(str(HERE.parent))
+
+DOCUMENTS = [
+    '<!DOCTYPE html><html><head><title>title</title></head><body><p>text</p></body></html>',
+    '''<html><head><title>form</title></head><body>
+<!-- comment -->
+<form action="/search">
+<div><input name="q" value="v"><input type="hidden" name="h" value="1"></div>
+<input type="submit" value="go"><input type="checkbox" name="c" checked>
+</form>
+<div><p>a &amp; <b>b</b><br>c</p><a href="x"><span>in</span> y</a></div>
+<script>var x = '<p>';</script>
+</body></html>''',
+    '<html><body>' + ''.join(f'<div><p><a href="/{i}">link {i}</a> text {i}</p></div>' for i in range(100)) + '</body></html>',
+    '<html><body><p>日本語 <a href="/ja">リンク</a></p></body></html>',
+]
+
+
+def lex(body: str, parser: str):
+    from canoe.worker import parse_and_lex
+    result = parse_and_lex(body, parser)
+    return (result.text, result.title, result.lines,
+            [(type(f).__name__, f.index, f.tag.name) for f in result.focus])
+
+
+class TestParser(unittest.TestCase):
+
+    def test_conformance(self):
+        from canoe.parser import PARSERS, DEFAULT_PARSER, is_available
+        for parser in PARSERS:
+            if not is_available(parser):
+                continue
+            for body in DOCUMENTS:
+                with self.subTest(parser=parser, body=body[:40]):
+                    self.assertEqual(lex(body, parser),
+                                     lex(body, DEFAULT_PARSER))
+
+    @unittest.skipUnless(__import__('importlib').util.find_spec('selectolax'), 'selectolax is not installed')
+    def test_selectolax_pickle(self):
+        from canoe.worker import parse_and_lex
+        result = parse_and_lex(DOCUMENTS[1], 'selectolax')
+        copied = pickle.loads(pickle.dumps(result))
+        self.assertEqual(copied.lines, result.lines)
+        self.assertIs(copied.focus[0].form, copied.soup.form)
+
+    def test_auto(self):
+        from canoe.parser import select_parser, AUTO, AUTO_THRESHOLD, DEFAULT_PARSER, FAST_PARSERS
+        self.assertEqual(select_parser(AUTO, 0), DEFAULT_PARSER)
+        self.assertIn(select_parser(AUTO, AUTO_THRESHOLD),
+                      FAST_PARSERS + [DEFAULT_PARSER])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+import asyncio
+import pathlib
+import sys
+
+HERE = pathlib.Path(__file__).absolute().parent
+sys.path.append(str(HERE.parent))
+
+
+class TestPrefetch(unittest.TestCase):
+
+    def test_prefetch(self):
+        import aiohttp
+        import aiohttp.web
+        from tests.server import serve
+        from canoe.worker import WorkerPool
+        from canoe.prefetch import Prefetcher
+
+        running = 0
+        max_running = 0
+
+        async def page(request: aiohttp.web.Request):
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.02)
+            running -= 1
+            name = request.match_info['name']
+            return aiohttp.web.Response(text=f'<title>{name}</title><p>{name}</p>', content_type='text/html')
+
+        async def run():
+            app = aiohttp.web.Application()
+            app.router.add_get('/{name}', page)
+            pool = WorkerPool('thread', 2)
+            async with serve(app) as base, aiohttp.ClientSession() as session:
+                prefetcher = Prefetcher(session, pool, {}, per_host=2)
+                prefetcher.request(
+                    [f'{base}/{i}' for i in range(5)] + ['mailto:a@b'])
+                self.assertEqual(len(prefetcher.tasks), 5)
+                while prefetcher.tasks:
+                    await asyncio.sleep(0.01)
+
+                prefetched = await prefetcher.take_async(f'{base}/3')
+                assert prefetched
+                self.assertEqual(prefetched.status, 200)
+                self.assertEqual(prefetched.result.title, '3')
+                self.assertIsNone(await prefetcher.take_async(f'{base}/9'))
+                self.assertEqual((prefetcher.hits, prefetcher.misses), (1, 1))
+
+                # the budget holds only one document
+                prefetcher.max_bytes = prefetcher.documents[f'{base}/0'][1]
+                prefetcher.request([f'{base}/5'])
+                while prefetcher.tasks:
+                    await asyncio.sleep(0.01)
+                self.assertEqual(list(prefetcher.documents), [f'{base}/5'])
+                self.assertEqual(prefetcher.total_bytes,
+                                 prefetcher.documents[f'{base}/5'][1])
+
+            pool.shutdown()
+
+        asyncio.run(run())
+        self.assertEqual(max_running, 2)
+
+    def test_urls(self):
+        import prompt_toolkit.key_binding
+        from canoe.worker import parse_and_lex
+        from canoe.ui.view_window import ViewWindow
+        view = ViewWindow(prompt_toolkit.key_binding.KeyBindings())
+        view.set_lex_result('http://host/dir/page', parse_and_lex(
+            '<p><a href="a#top">one</a> <a href="mailto:a@b">two</a> <a href="/b">three</a></p>'))
+        # relative to the page
+        urls = view.get_prefetch_urls()
+        self.assertEqual(urls, ['http://host/dir/a', 'http://host/b'])
+        # the navigation opens the prefetched url
+        row = view.buffer.text.split('\n').index('onetwothree')
+        view.set_cursor_position(
+            view.buffer.document.translate_row_col_to_index(row, 0))
+        self.assertEqual(view.get_url_under_cursor(), ('GET', urls[0]))
+
+
+if __name__ == '__main__':
+    unittest.main()
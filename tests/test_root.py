@@ -0,0 +1,120 @@
+import unittest
+import pathlib
+import sys
+import unittest.mock
+
+HERE = pathlib.Path(__file__).absolute().parent
+sys.path.append(str(HERE.parent))
+
+
+class TestRoot(unittest.TestCase):
+
+    def setUp(self):
+        from canoe import event
+        # the commands of the test are kept in its own queue
+        self.dispatcher = event.EventDispatcher()
+        patcher = unittest.mock.patch.object(event, 'DISPATCHER', self.dispatcher)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def attach(self, root):
+        import types
+        from canoe import event
+        from canoe.connection import ConnectionStats
+        client = types.SimpleNamespace(
+            pool=None, prefetcher=None, connection_stats=ConnectionStats(),
+            on_partial=event.Event(), on_request=event.Event(), on_response=event.Event(),
+            on_truncated=event.Event(), on_link_status=event.Event())
+        root.attach(client)
+        return client
+
+    def commands(self) -> list:
+        queue = self.dispatcher._queue
+        return [queue.get_nowait() for _ in range(queue.qsize())]
+
+    def test_open_tab(self):
+        from canoe.worker import parse_and_lex
+        from canoe.ui.root import Root
+        root = Root()
+        root.view.set_lex_result('http://host/dir/page', parse_and_lex(
+            '<p><a href="/b">one</a></p><p><a href="mailto:a@b">two</a></p>'))
+        lines = root.view.buffer.text.split('\n')
+        document = root.view.buffer.document
+
+        def open_tab(text: str):
+            root.view.set_cursor_position(
+                document.translate_row_col_to_index(lines.index(text), 0))
+            root.open_tab(None)  # type: ignore
+
+        # relative to the page
+        open_tab('one')
+        self.assertEqual(len(root.tabs), 2)
+        command, = self.commands()
+        self.assertEqual(command[:3], ('GET', 'http://host/b', 1))
+        # can not be opened
+        open_tab('two')
+        self.assertEqual(len(root.tabs), 2)
+        self.assertEqual(self.commands(), [])
+
+    def test_snapshot_input(self):
+        import bs4
+        from canoe import event
+        from canoe.worker import parse_and_lex
+        from canoe.snapshot import encode, decode
+        from canoe.ui.root import Root
+        root = Root()
+        url = 'http://host/'
+        body = '<form action="/s"><p><input name="q" value="x"></p></form><p>page</p>'
+        data = encode(url, '"etag"', parse_and_lex(body))
+        assert data
+        root.view.set_lex_result(url, decode(data, url, '"etag"'))
+        text = root.view.buffer.text
+
+        # an input not rendered, as a failed patch
+        form = bs4.Tag(name='form')
+        tag = bs4.Tag(name='input', attrs={'name': 'q'})
+        form.append(tag)
+        on_input = self.dispatcher._handlers[event.UpdateInput].handler
+        on_input(event.UpdateInput(url, tag))
+        # the form does not replace the page
+        self.assertEqual(self.commands(), [])
+        self.assertEqual(root.view.buffer.text, text)
+
+    def test_partial_cursor(self):
+        from canoe import event
+        from canoe.worker import parse_and_lex
+        from canoe.ui.root import Root
+        root = Root()
+        client = self.attach(root)
+        on_document = self.dispatcher._handlers[event.UpdateDocument].handler
+        first = parse_and_lex('<p>first</p>' * 20)
+        part = parse_and_lex('<p>part</p>' * 20)
+        whole = parse_and_lex('<p>part</p>' * 40)
+
+        on_document(event.UpdateDocument('http://host/a', first))
+        root.view.set_cursor_position(30)
+        # streamed. the user scrolls the partial document
+        client.on_request(event.OpenCommand('GET', 'http://host/b'))
+        client.on_partial(event.UpdateDocument('http://host/b', part, True))
+        self.assertEqual(root.view.buffer.cursor_position, 0)
+        root.view.set_cursor_position(50)
+        on_document(event.UpdateDocument('http://host/b', whole))
+        self.assertEqual(root.view.buffer.cursor_position, 50)
+        # the page left keeps its own position
+        self.assertEqual(root.history.entries[0].cursor_position, 30)
+
+        # a back fetched again restores the position
+        root.documents.drop(root.history.entries[0])
+        root.back(None)  # type: ignore
+        command, = self.commands()
+        client.on_request(command)
+        client.on_partial(event.UpdateDocument(
+            command.url, first, True, generation=command.generation))
+        on_document(event.UpdateDocument(
+            command.url, first, generation=command.generation))
+        self.assertEqual(root.view.buffer.cursor_position, 30)
+        self.assertEqual(root.history.entries[1].cursor_position, 50)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+import pathlib
+import sys
+
+HERE = pathlib.Path(__file__).absolute().parent
+sys.path.append(str(HERE.parent))
+
+
+class TestSearch(unittest.TestCase):
+
+    def test_index(self):
+        from canoe.ui.search import SearchIndex, fold
+        # İ is two characters in lower case
+        self.assertEqual(len(fold('İstanbul')), len('İstanbul'))
+        index = SearchIndex('Canoe river\nno match\nriver CANOE canoe')
+        self.assertEqual(len(index), 3)
+        self.assertEqual(index.row_col(0), (0, 0))
+        self.assertEqual(index.row_col(12), (1, 0))
+        self.assertEqual(index.count('canoe'), 3)
+        self.assertEqual(index.count(''), 0)
+        self.assertEqual(index.matches('canoe', 2), [(6, 11), (12, 17)])
+        self.assertEqual(index.matches('canoe', 1), [])
+        # the newline is not a match
+        self.assertEqual(index.matches('river\nno', 0), [])
+
+        first = index.next('canoe', 0)
+        self.assertEqual(first, 0)
+        second = index.next('canoe', first + 1)
+        assert second is not None
+        self.assertEqual(index.row_col(second), (2, 6))
+        # wrap around
+        self.assertEqual(index.next('canoe', len(index.text)), 0)
+        self.assertEqual(index.prev('canoe', 0), index.text.rfind('canoe'))
+        self.assertEqual(index.prev('canoe', second), 0)
+        self.assertIsNone(index.next('missing', 0))
+
+    def test_view(self):
+        import prompt_toolkit.key_binding
+        from canoe.worker import parse_and_lex
+        from canoe.ui.view_window import ViewWindow
+        view = ViewWindow(prompt_toolkit.key_binding.KeyBindings())
+        view.set_lex_result('http://host/', parse_and_lex(
+            ''.join(f'<p>line {i} <a href="/{i}">Link {i}</a></p>' for i in range(100))))
+        origin = view.buffer.text.index('line 50')
+        view.set_cursor_position(origin)
+        # typing
+        self.assertEqual(view.find('l', origin), 200)
+        self.assertEqual(view.find('link 7', origin), 11)
+        self.assertEqual(view.buffer.document.text_after_cursor[:7], 'Link 70')
+        view.search_next(None)  # type: ignore
+        self.assertEqual(view.buffer.document.text_after_cursor[:7], 'Link 71')
+        view.search_prev(None)  # type: ignore
+        view.search_prev(None)  # type: ignore
+        self.assertEqual(view.buffer.document.text_after_cursor[:7], 'Link 7\n')
+        # wrap around
+        view.search_prev(None)  # type: ignore
+        self.assertEqual(view.buffer.document.text_after_cursor[:7], 'Link 79')
+        # cancel
+        self.assertEqual(view.find('', origin), 0)
+        self.assertEqual(view.buffer.cursor_position, origin)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+import pathlib
+import sys
+import tempfile
+
+HERE = pathlib.Path(__file__).absolute().parent
+sys.path.append(str(HERE.parent))
+
+BODY = '''<title>snap</title><p>日本語 <a href="/a">a</a> <b>bold</b></p>
+<form action="/search"><p><input name="q" value="x"><input type="hidden" name="h" value="1"><input type="submit"></p></form>
+<p><a href="http://other/b">b</a></p>'''
+
+
+class TestSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = pathlib.Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_encode_decode(self):
+        from canoe.worker import parse_and_lex
+        from canoe.snapshot import encode, decode
+        from canoe.ui.beautifulsoup_lexer import Anchor, Input
+        url = 'http://host/dir/page'
+        result = parse_and_lex(BODY)
+        data = encode(url, '"etag"', result)
+        assert data
+        loaded = decode(data, url, '"etag"')
+        self.assertIsNone(loaded.soup)
+        self.assertEqual(loaded.text, result.text)
+        self.assertEqual(loaded.title, 'snap')
+        self.assertEqual(loaded.lines, result.lines)
+        self.assertEqual(loaded.focus_index.spans, result.focus_index.spans)
+        self.assertEqual(len(loaded.focus), len(result.focus))
+        # the hrefs as on the live page
+        anchor = loaded.focus[0]
+        assert isinstance(anchor, Anchor)
+        self.assertEqual(anchor.tag['href'], '/a')
+        self.assertEqual(loaded.focus[-1].tag['href'], 'http://other/b')
+        # the inputs share their form
+        text = loaded.focus[1]
+        assert isinstance(text, Input) and text.form
+        self.assertEqual(text.tag['value'], 'x')
+        self.assertEqual(len(text.form.find_all('input')), 3)
+        self.assertIs(loaded.focus[2].form, text.form)
+        self.assertEqual(text.form['action'], '/search')
+
+        with self.assertRaises(ValueError):
+            decode(data, url, '"other"')
+
+    def test_store(self):
+        from canoe.worker import parse_and_lex
+        from canoe.cache import HttpCache
+        from canoe.snapshot import SnapshotStore
+        cache = HttpCache(self.directory / 'http')
+        url = 'http://host/'
+        entry = cache.store(url, 200, {'etag': '"1"'}, BODY)
+        assert entry
+        store = SnapshotStore(self.directory / 'snapshot')
+        self.assertIsNone(store.load(url, entry))
+        self.assertTrue(store.store(url, entry, parse_and_lex(BODY)))
+        result = store.load(url, entry)
+        assert result
+        self.assertEqual(result.title, 'snap')
+        self.assertEqual((store.hits, store.misses), (1, 1))
+
+        # a new body has a new validator
+        entry = cache.store(url, 200, {'etag': '"2"'}, BODY)
+        assert entry
+        self.assertIsNone(store.load(url, entry))
+
+        # across sessions, the oldest is evicted first
+        store = SnapshotStore(self.directory / 'snapshot')
+        self.assertEqual(len(store.entries), 1)
+        store.store(url, entry, parse_and_lex(BODY))
+        size = store.total_bytes // 2
+        store = SnapshotStore(self.directory / 'snapshot', size + 1)
+        self.assertEqual(len(store.entries), 1)
+        self.assertIsNotNone(store.load(url, entry))
+
+
+if __name__ == '__main__':
+    unittest.main()
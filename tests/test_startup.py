@@ -0,0 +1,51 @@
+import unittest
+import io
+import pathlib
+import subprocess
+import sys
+
+HERE = pathlib.Path(__file__).absolute().parent
+sys.path.append(str(HERE.parent))
+
+
+class TestStartup(unittest.TestCase):
+
+    def test_profiler(self):
+        from canoe.startup import ImportProfiler, StartupTiming
+        # a small module that nothing else imports
+        sys.modules.pop('colorsys', None)
+        profiler = ImportProfiler()
+        profiler.install()
+        try:
+            import colorsys
+        finally:
+            profiler.uninstall()
+        self.assertIn('colorsys', profiler.records)
+        cumulative, self_time = profiler.records['colorsys']
+        self.assertGreaterEqual(cumulative, self_time)
+        # the module keeps the original loader
+        self.assertNotIn('Timed', type(colorsys.__loader__).__name__)
+
+        timing = StartupTiming()
+        first = timing.mark('first_frame')
+        self.assertEqual(timing.mark('first_frame'), first)
+        out = io.StringIO()
+        timing.report(profiler, out)
+        self.assertIn('first frame:', out.getvalue())
+        self.assertIn('colorsys', out.getvalue())
+
+    def test_first_frame(self):
+        # the heavy modules are not loaded for the first frame
+        code = '''
+import sys
+from canoe.startup import measure_first_frame
+measure_first_frame()
+print(' '.join(name for name in ('bs4', 'aiohttp', 'canoe.client', 'canoe.ui.beautifulsoup_lexer') if name in sys.modules))
+'''
+        output = subprocess.run([sys.executable, '-c', code], cwd=HERE.parent,
+                                capture_output=True, text=True, check=True).stdout
+        self.assertEqual(output.strip(), '')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+import asyncio
+import json
+import pathlib
+import sys
+import tempfile
+
+HERE = pathlib.Path(__file__).absolute().parent
+sys.path.append(str(HERE.parent))
+
+
+class TestTiming(unittest.TestCase):
+
+    def test_navigation(self):
+        import aiohttp.web
+        from tests.server import serve
+        from canoe.connection import ConnectionOptions, ConnectionStats, create_session
+        from canoe.limits import BodyReader
+        from canoe.timing import NavigationTiming, TimingLog
+        from canoe.worker import WorkerPool
+
+        async def page(request):
+            return aiohttp.web.Response(text='<title>a</title><p>a</p>', content_type='text/html')
+
+        async def run():
+            app = aiohttp.web.Application()
+            app.router.add_get('/', page)
+            async with serve(app, 'localhost') as base:
+                pool = WorkerPool('thread', 1)
+                session = create_session(ConnectionOptions(), ConnectionStats())
+                timings = []
+                for _ in range(2):
+                    timing = NavigationTiming(f'{base}/')
+                    async with session.get(timing.url, trace_request_ctx=timing) as response:
+                        with timing.measure('download'):
+                            body = await BodyReader(response).read_text_async()
+                    await pool.parse_and_lex_async(body, timing=timing)
+                    timing.finish()
+                    timings.append(timing)
+                await session.close()
+                pool.shutdown()
+            return timings
+
+        first, second = asyncio.run(run())
+        self.assertEqual(set(first.durations), {
+                         'dns', 'connect', 'ttfb', 'download', 'parse', 'lex'})
+        self.assertFalse(first.reused)
+        # warm connection
+        self.assertEqual(set(second.durations), {
+                         'ttfb', 'download', 'parse', 'lex'})
+        self.assertTrue(second.reused)
+        assert first.total is not None
+        self.assertGreaterEqual(first.total, sum(first.durations.values()) - first.durations['dns'])
+        self.assertIn('total:', str(first))
+
+        with tempfile.TemporaryDirectory() as d:
+            path = pathlib.Path(d) / 'timings.jsonl'
+            log = TimingLog(str(path))
+            log.write(first)
+            log.write(second)
+            lines = [json.loads(line)
+                     for line in path.read_text(encoding='utf-8').splitlines()]
+        self.assertEqual([line['reused'] for line in lines], [False, True])
+        self.assertEqual(lines[0]['durations'], first.durations)
+
+
+if __name__ == '__main__':
+    unittest.main()
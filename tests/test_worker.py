@@ -0,0 +1,61 @@
+import unittest
+import asyncio
+import pathlib
+import pickle
+import sys
+
+HERE = pathlib.Path(__file__).absolute().parent
+sys.path.append(str(HERE.parent))
+
+HTML = '''<html><head><title>title</title></head><body>
+<p>text <a href="/next">next</a></p>
+<form action="/search"><input name="q" value="v"><input type="submit" value="go"></form>
+</body></html>'''
+
+
+class TestWorker(unittest.TestCase):
+
+    def test_pickle(self):
+        from canoe.worker import parse_and_lex
+        result = pickle.loads(pickle.dumps(parse_and_lex(HTML)))
+        self.assertEqual(result.title, 'title')
+        self.assertEqual(len(result.focus), 3)
+        tags = set(id(tag) for tag in result.soup.find_all(True))
+        for f in result.focus:
+            self.assertIn(id(f.tag), tags)
+        self.assertIs(result.focus[1].form, result.soup.form)
+
+    def test_stream(self):
+        from canoe.worker import StreamParser, parse_and_lex
+        parser = StreamParser()
+        for i in range(0, len(HTML), 7):
+            parser.feed(HTML[i:i+7])
+            parser.lex()
+        result = parser.close()
+        self.assertEqual(result.text, parse_and_lex(HTML).text)
+
+    def test_pool(self):
+        from canoe.worker import WorkerPool, parse_and_lex
+
+        async def run(executor_type):
+            pool = WorkerPool(executor_type, 1)
+            try:
+                return await pool.parse_and_lex_async(HTML)
+            finally:
+                pool.shutdown()
+
+        expected = parse_and_lex(HTML)
+        for executor_type in ['thread', 'process']:
+            result = asyncio.run(run(executor_type))
+            self.assertEqual(result.text, expected.text)
+            self.assertEqual(result.lines, expected.lines)
+            self.assertEqual(result.focus_index.spans, expected.focus_index.spans)
+            self.assertEqual([f.tag.get('href') for f in result.focus],
+                             [f.tag.get('href') for f in expected.focus])
+            if executor_type == 'process':
+                # no soup to parse again in the main process
+                self.assertIsNone(result.soup)
+
+
+if __name__ == '__main__':
+    unittest.main()